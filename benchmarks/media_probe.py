@@ -0,0 +1,78 @@
+"""Memory benchmark of video metadata extraction for growing file sizes.
+
+Files are generated sparse (MP4 with moov after mdat, WebM with one huge Cluster), so even
+hundreds of gigabytes take no disk space. Peak memory and bytes read must stay flat.
+
+    python -m benchmarks.media_probe
+"""
+
+import argparse
+import asyncio
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from src.uploads import media
+from src.uploads.media import FileMediaReader, probe
+from tests.fixtures.media import ebml, mp4_ftyp, mp4_mdat_header, mp4_moov, webm_header
+
+GB = 1024 * 1024 * 1024
+
+
+def write_mp4(path: Path, size: int):
+    with path.open("wb") as f:
+        f.write(mp4_ftyp())
+        header = mp4_mdat_header(0)
+        moov = mp4_moov(duration=3600, width=1920, height=1080)
+        mdat_size = size - f.tell() - len(header) - len(moov)
+        f.write(mp4_mdat_header(mdat_size))
+        f.seek(mdat_size, 1)
+        f.write(moov)
+
+
+def write_webm(path: Path, size: int):
+    with path.open("wb") as f:
+        f.write(webm_header(duration=3600, width=1920, height=1080))
+        f.write(ebml(media.MKV_CLUSTER, unknown_size=True))
+        f.truncate(size)
+
+
+async def measure(path: Path) -> dict:
+    with path.open("rb") as f:
+        reader = FileMediaReader(f)
+        tracemalloc.start()
+        started = time.perf_counter()
+        metadata = await probe(reader)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    assert metadata.width == 1920, metadata
+    return {
+        "time_ms": elapsed * 1000,
+        "peak_kb": peak / 1024,
+        "fetches": reader.fetches,
+        "read_kb": reader.bytes_fetched / 1024,
+    }
+
+
+async def main(sizes_gb: list[float]):
+    print(f"{'format':<6} {'size':>10} {'time, ms':>10} {'peak, KB':>10} {'fetches':>8} {'read, KB':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for fmt, write in (("mp4", write_mp4), ("webm", write_webm)):
+            for size_gb in sizes_gb:
+                path = Path(directory) / f"video.{fmt}"
+                write(path, int(size_gb * GB))
+                result = await measure(path)
+                path.unlink()
+                print(
+                    f"{fmt:<6} {size_gb:>8g}GB {result['time_ms']:>10.2f} {result['peak_kb']:>10.1f} "
+                    f"{result['fetches']:>8} {result['read_kb']:>10.1f}"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-gb", type=float, nargs="+", default=[0.01, 1, 16, 256])
+    asyncio.run(main(parser.parse_args().sizes_gb))
@@ -0,0 +1,120 @@
+"""Throughput benchmark: single put_object vs parallel multipart upload.
+
+Runs against any S3 compatible endpoint. Without --endpoint-url a local moto server
+(`pip install "moto[server]"`) is started as a stand-in.
+
+    python -m benchmarks.s3_upload --size-mb 512 --concurrency 8
+    python -m benchmarks.s3_upload --endpoint-url http://localhost:9000 --access-key minio --secret-key minio123
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager, suppress
+from pathlib import Path
+
+from src.repository import S3Repository, create_s3_client
+
+MB = 1024 * 1024
+
+
+@contextmanager
+def moto_server():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    process = subprocess.Popen(
+        [sys.executable, "-m", "moto.server", "-p", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 15
+        while time.monotonic() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def make_payload(size: int) -> Path:
+    block = os.urandom(MB)
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".bin") as f:
+        for _ in range(size // MB):
+            f.write(block)
+    return Path(f.name)
+
+
+async def ensure_bucket(client, bucket: str):
+    with suppress(client.exceptions.BucketAlreadyOwnedByYou):
+        await client.create_bucket(Bucket=bucket)
+
+
+async def measure(repo: S3Repository, payload: Path, repeat: int) -> float:
+    timings = []
+    for i in range(repeat):
+        with payload.open("rb") as f:
+            started = time.perf_counter()
+            await repo.upload_file(f, f"benchmark/upload-{i}.bin")
+            timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+async def main(args: argparse.Namespace):
+    size = args.size_mb * MB
+    payload = make_payload(size)
+
+    try:
+        async with create_s3_client(args.access_key, args.secret_key, args.endpoint_url) as client:
+
+            def repo(threshold: int) -> S3Repository:
+                return S3Repository(
+                    client=client,
+                    endpoint_url=args.endpoint_url,
+                    bucket_name=args.bucket,
+                    multipart_threshold=threshold,
+                    multipart_chunk_size=args.chunk_mb * MB,
+                    multipart_concurrency=args.concurrency,
+                )
+
+            await ensure_bucket(client, args.bucket)
+            single_time = await measure(repo(threshold=sys.maxsize), payload, args.repeat)
+            multipart_time = await measure(repo(threshold=0), payload, args.repeat)
+    finally:
+        payload.unlink()
+
+    print(f"payload: {args.size_mb} MB, parts: {args.chunk_mb} MB x {args.concurrency} in flight")
+    print(f"put_object: {single_time:8.2f}s {args.size_mb / single_time:8.1f} MB/s")
+    print(f"multipart:  {multipart_time:8.2f}s {args.size_mb / multipart_time:8.1f} MB/s")
+    print(f"speedup:    {single_time / multipart_time:8.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoint-url")
+    parser.add_argument("--access-key", default="testing")
+    parser.add_argument("--secret-key", default="testing")
+    parser.add_argument("--bucket", default="lingoplay-benchmark")
+    parser.add_argument("--size-mb", type=int, default=256)
+    parser.add_argument("--chunk-mb", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.endpoint_url:
+        asyncio.run(main(args))
+    else:
+        with moto_server() as endpoint_url:
+            args.endpoint_url = endpoint_url
+            asyncio.run(main(args))
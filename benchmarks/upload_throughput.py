@@ -0,0 +1,282 @@
+"""End to end benchmark of `POST /uploads/videos`, driven in-process through httpx ASGI transport.
+
+Runs a matrix of file sizes and concurrency levels against storage backends and reports throughput,
+latency percentiles and peak RSS. Upload files are sparse, so gigabyte sizes take no disk space; every
+request gets a file with its own random head, so content deduplication does not skip storage writes.
+The database is a throwaway SQLite file. `s3` backend starts a local moto server unless --endpoint-url is given.
+
+    python -m benchmarks.upload_throughput --sizes-mb 1 64 1024 4096 --concurrency 1 4 16
+    python -m benchmarks.upload_throughput --backends s3 --endpoint-url http://localhost:9000 --baseline old.json
+"""
+
+import os
+import tempfile
+
+os.environ.setdefault("IS_TESTING", "1")
+os.environ.setdefault("PG_DATABASE_URI", "sqlite+aiosqlite://")
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-jwt-secret-key-0000000000")
+os.environ.setdefault("REFRESH_SECRET_KEY", "benchmark-refresh-secret-key-00000000")
+
+import argparse
+import asyncio
+import json
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
+from datetime import UTC, datetime
+from pathlib import Path
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from benchmarks.s3_upload import ensure_bucket, moto_server
+from src.database.core import Base, get_read_session, get_session
+from src.main import app
+from src.repository import LocalStorageRepository, S3Repository, create_s3_client, get_s3_repo
+from tests.fixtures.s3 import LocalFolderRepository
+
+MB = 1024 * 1024
+HEAD_SIZE = 4096
+REGRESSION_TOLERANCE = 0.1
+
+
+class PeakRssSampler:
+    """Samples resident memory of the process from a thread, so peaks are seen even while the event loop is blocked"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss())
+
+
+def current_rss() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS, and is never reset between cases
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q / 100 * (len(ordered) - 1)))]
+
+
+def make_sparse_file(directory: Path, size: int) -> Path:
+    path = directory / f"{uuid.uuid4().hex}.mp4"
+    with path.open("wb") as f:
+        f.write(os.urandom(min(HEAD_SIZE, size)))
+        f.truncate(size)
+    return path
+
+
+@asynccontextmanager
+async def storage(backend: str, args: argparse.Namespace, directory: Path):
+    if backend == "folder":
+        yield LocalFolderRepository(folder_path=directory / "folder")
+    elif backend == "local":
+        yield LocalStorageRepository(directory / "local")
+    else:
+        async with create_s3_client(args.access_key, args.secret_key, args.endpoint_url) as client:
+            await ensure_bucket(client, args.bucket)
+            yield S3Repository(client=client, endpoint_url=args.endpoint_url, bucket_name=args.bucket)
+
+
+@asynccontextmanager
+async def api_client(repository, directory: Path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{directory / 'benchmark.db'}")
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    async def override_session():
+        async with session_maker() as session:
+            yield session
+
+    async def override_s3_repo():
+        yield repository
+
+    app.dependency_overrides[get_session] = override_session
+    app.dependency_overrides[get_read_session] = override_session
+    app.dependency_overrides[get_s3_repo] = override_s3_repo
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://benchmark", timeout=None) as client:
+            user = {"email": "benchmark@example.com", "username": "benchmark", "password": "benchmark"}
+            await client.post("/auth/registrate", json=user)
+            login = await client.post("/auth/login", json={"email": user["email"], "password": user["password"]})
+            client.headers["Authorization"] = f"Bearer {login.json()['token']}"
+            game = await client.post("/uploads/games", json={"title": "Benchmark"})
+            yield client, game.json()["id"]
+    finally:
+        app.dependency_overrides.clear()
+        await engine.dispose()
+
+
+async def upload(client: AsyncClient, game_id: int, path: Path) -> float:
+    started = time.perf_counter()
+    with path.open("rb") as f:
+        response = await client.post(
+            "/uploads/videos",
+            files={"file": (path.name, f, "video/mp4")},
+            data={"title": path.stem, "game_id": str(game_id)},
+        )
+    elapsed = time.perf_counter() - started
+    if response.status_code != 201:
+        raise RuntimeError(f"Upload failed with {response.status_code}: {response.text}")
+    return elapsed
+
+
+async def run_case(client: AsyncClient, game_id: int, directory: Path, size: int, concurrency: int, repeat: int):
+    files = [[make_sparse_file(directory, size) for _ in range(concurrency)] for _ in range(repeat)]
+    latencies = []
+    try:
+        with PeakRssSampler() as rss:
+            started = time.perf_counter()
+            for batch in files:
+                latencies += await asyncio.gather(*(upload(client, game_id, path) for path in batch))
+            elapsed = time.perf_counter() - started
+    finally:
+        for path in (p for batch in files for p in batch):
+            path.unlink()
+
+    return {
+        "requests": len(latencies),
+        "throughput_mb_s": size * len(latencies) / MB / elapsed,
+        "latency_ms": {f"p{q}": percentile(latencies, q) * 1000 for q in (50, 95, 99)},
+        "peak_rss_mb": rss.peak / MB,
+    }
+
+
+def compare(results: list[dict], baseline_path: Path) -> list[str]:
+    """Cases whose throughput dropped or p95 latency grew by more than REGRESSION_TOLERANCE"""
+    baseline = {(c["backend"], c["size_mb"], c["concurrency"]): c for c in json.loads(baseline_path.read_text())["cases"]}
+    regressions = []
+    for case in results:
+        old = baseline.get((case["backend"], case["size_mb"], case["concurrency"]))
+        if old is None:
+            continue
+        name = f"{case['backend']} {case['size_mb']}MB x{case['concurrency']}"
+        if case["throughput_mb_s"] < old["throughput_mb_s"] * (1 - REGRESSION_TOLERANCE):
+            regressions.append(f"{name}: {old['throughput_mb_s']:.1f} -> {case['throughput_mb_s']:.1f} MB/s")
+        if case["latency_ms"]["p95"] > old["latency_ms"]["p95"] * (1 + REGRESSION_TOLERANCE):
+            regressions.append(f"{name}: p95 {old['latency_ms']['p95']:.1f} -> {case['latency_ms']['p95']:.1f} ms")
+    return regressions
+
+
+@contextmanager
+def s3_endpoint(args: argparse.Namespace):
+    if "s3" not in args.backends or args.endpoint_url:
+        yield
+        return
+    with moto_server() as endpoint_url:
+        args.endpoint_url = endpoint_url
+        yield
+
+
+@contextmanager
+def upload_limits(args: argparse.Namespace):
+    """Sets admission limits of the app's upload scheduler for the run.
+
+    All uploads come from one user, so with the app's defaults the per user limit would turn every case with
+    concurrency above it into a queueing test ending in 429s. By default both limits are lifted, given values measure
+    uploads behind admission control
+    """
+    scheduler = app.state.upload_scheduler
+    saved = scheduler.max_per_user, scheduler.max_inflight_bytes
+    scheduler.max_per_user = args.max_uploads_per_user or max(args.concurrency)
+    scheduler.max_inflight_bytes = int(args.max_inflight_mb * MB) if args.max_inflight_mb else sys.maxsize
+    try:
+        yield
+    finally:
+        scheduler.max_per_user, scheduler.max_inflight_bytes = saved
+
+
+def git_commit() -> str | None:
+    result = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=False)
+    return result.stdout.strip() or None
+
+
+async def main(args: argparse.Namespace) -> list[dict]:
+    results = []
+    print(f"{'backend':<8} {'size':>8} {'conc':>5} {'MB/s':>9} {'p50, ms':>9} {'p95, ms':>9} {'p99, ms':>9} {'RSS, MB':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        for backend in args.backends:
+            async with AsyncExitStack() as stack:
+                stack.enter_context(upload_limits(args))
+                repository = await stack.enter_async_context(storage(backend, args, directory))
+                client, game_id = await stack.enter_async_context(api_client(repository, directory))
+                for size_mb in args.sizes_mb:
+                    for concurrency in args.concurrency:
+                        case = await run_case(client, game_id, directory, int(size_mb * MB), concurrency, args.repeat)
+                        case = {"backend": backend, "size_mb": size_mb, "concurrency": concurrency, **case}
+                        results.append(case)
+                        latency = case["latency_ms"]
+                        print(
+                            f"{backend:<8} {size_mb:>6g}MB {concurrency:>5} {case['throughput_mb_s']:>9.1f} "
+                            f"{latency['p50']:>9.1f} {latency['p95']:>9.1f} {latency['p99']:>9.1f} "
+                            f"{case['peak_rss_mb']:>8.1f}"
+                        )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", choices=["folder", "local", "s3"], default=["folder", "s3"])
+    parser.add_argument("--sizes-mb", type=float, nargs="+", default=[1, 16, 256])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--repeat", type=int, default=3, help="batches of concurrent uploads per case")
+    parser.add_argument("--max-uploads-per-user", type=int, help="scheduler limit, by default the largest concurrency")
+    parser.add_argument("--max-inflight-mb", type=float, help="scheduler budget of request bodies, unlimited by default")
+    parser.add_argument("--endpoint-url")
+    parser.add_argument("--access-key", default="testing")
+    parser.add_argument("--secret-key", default="testing")
+    parser.add_argument("--bucket", default="lingoplay-benchmark")
+    parser.add_argument("--output", type=Path, help="JSON file for results, by default benchmarks/results/<time>.json")
+    parser.add_argument("--baseline", type=Path, help="previous results to compare with, exits with 1 on regression")
+    args = parser.parse_args()
+
+    with s3_endpoint(args):
+        cases = asyncio.run(main(args))
+
+    started_at = datetime.now(UTC)
+    output = args.output or Path(__file__).parent / "results" / f"upload_throughput-{started_at:%Y%m%dT%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    report = {
+        "benchmark": "upload_throughput",
+        "created_at": started_at.isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cases": cases,
+    }
+    output.write_text(json.dumps(report, indent=2))
+    print(f"results: {output}")
+
+    if args.baseline:
+        regressions = compare(cases, args.baseline)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
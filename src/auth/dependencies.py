@@ -10,7 +10,7 @@ from src import config
 from src.auth.repository import AuthRepository
 from src.auth.service import AuthService
 from src.database.core import get_session
-from src.users.dependencies import user_service
+from src.users.dependencies import user_read_service, user_service
 from src.users.models import LingoplayUsers
 from src.users.repository import UserRepository
 from src.users.service import UsersService
@@ -37,7 +37,18 @@ async def get_current_user(
     user_service: Annotated[UsersService, Depends(user_service)],
     credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)],
 ) -> LingoplayUsers:
-    token = credentials.credentials
+    return await _user_from_token(user_service, credentials.credentials)
+
+
+async def get_current_user_read(
+    user_service: Annotated[UsersService, Depends(user_read_service)],
+    credentials: Annotated[HTTPAuthorizationCredentials, Depends(security)],
+) -> LingoplayUsers:
+    """Current user of read only routes, loaded from the read replica"""
+    return await _user_from_token(user_service, credentials.credentials)
+
+
+async def _user_from_token(user_service: UsersService, token: str) -> LingoplayUsers:
     try:
         payload = jwt.decode(token, config.JWT_SECRET_KEY, algorithms=["HS256"])
         return await user_service.get(user_id=payload.get("id"))
@@ -48,3 +59,4 @@ async def get_current_user(
 
 
 CurrentUser = Annotated[LingoplayUsers, Depends(get_current_user)]
+ReadCurrentUser = Annotated[LingoplayUsers, Depends(get_current_user_read)]
@@ -40,10 +40,9 @@ class AuthService:
         return [access_jwt, refresh_jwt]
 
     async def save_token(self, user_id: int, refresh_token: str) -> UserTokens:
-        user_token = await self._tokens_rep.update_or_create(
+        return await self._tokens_rep.update_or_create(
             filters={"user_id": user_id}, values={"refresh_token": refresh_token}
         )
-        return user_token
 
     async def validate_refresh_token(self, token: str) -> dict:
         return await self._validate_token(token, config.REFRESH_SECRET_KEY)
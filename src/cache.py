@@ -0,0 +1,254 @@
+import asyncio
+import hashlib
+import os
+import re
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Awaitable, Callable
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+
+MAX_ENTRIES = 100_000
+CACHE_FILE_RE = re.compile(r"^[0-9a-f]{64}(\.[0-9a-f]{32}\.tmp)?$")
+
+
+@dataclass
+class CacheEntry:
+    """Cached object. Entry without `path` remembers that the object is too large to be cached"""
+
+    path: Path | None
+    size: int
+    etag: str | None
+    validated_at: float
+    content_type: str | None = None
+    last_modified: datetime | None = None
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    revalidations: int = 0
+    evictions: int = 0
+
+    def dict(self) -> dict:
+        return asdict(self)
+
+
+class DiskCache:
+    """LRU cache of whole objects on local disk within `max_bytes` budget.
+
+    The index is kept in memory, so files left in `directory` by previous run are removed on start.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.stats = CacheStats()
+
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._fills: dict[str, asyncio.Future] = {}
+        self._background_fills: dict[str, asyncio.Task] = {}
+
+        directory.mkdir(parents=True, exist_ok=True)
+        for path in directory.iterdir():
+            if CACHE_FILE_RE.match(path.name):
+                path.unlink()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> CacheEntry | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    async def put(self, key: str, body: AsyncIterator[bytes], entry: CacheEntry) -> CacheEntry:
+        """Writes object to temporary file and atomically moves it into the cache"""
+        path = self.directory / hashlib.sha256(key.encode()).hexdigest()
+        tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with tmp_path.open("wb") as f:
+                async for chunk in body:
+                    await asyncio.to_thread(f.write, chunk)
+            size = tmp_path.stat().st_size
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+        self.discard(key)
+        self._evict(size)
+        os.replace(tmp_path, path)
+
+        entry.path, entry.size = path, size
+        self._entries[key] = entry
+        self.used_bytes += size
+        return entry
+
+    def remember(self, key: str, entry: CacheEntry) -> CacheEntry:
+        """Adds entry without file, so the object is not checked again until revalidation"""
+        self.discard(key)
+        self._evict(0)
+        self._entries[key] = entry
+        return entry
+
+    def discard(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry.path is not None:
+            entry.path.unlink(missing_ok=True)
+            self.used_bytes -= entry.size
+
+    async def single_flight(self, key: str, fill: Callable[[], Awaitable[CacheEntry | None]]) -> CacheEntry | None:
+        """Runs `fill` once for concurrent callers of the same key, the rest wait for its result.
+
+        If the fill fails, waiters get None and should read the object bypassing the cache.
+        """
+        if (future := self._fills.get(key)) is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._fills[key] = future
+        try:
+            entry = await fill()
+            future.set_result(entry)
+            return entry
+        except BaseException:
+            future.set_result(None)
+            raise
+        finally:
+            del self._fills[key]
+
+    def fill_in_background(self, key: str, fill: Callable[[], Awaitable[CacheEntry | None]]):
+        """Starts `fill` in a task unless the key is already being filled. A failed fill leaves the object uncached"""
+        if key in self._fills or key in self._background_fills:
+            return
+        task = asyncio.create_task(self.single_flight(key, fill))
+        self._background_fills[key] = task
+        task.add_done_callback(lambda t: self._background_fill_done(key, t))
+
+    def _background_fill_done(self, key: str, task: asyncio.Task):
+        del self._background_fills[key]
+        if not task.cancelled():
+            task.exception()
+
+    def _evict(self, incoming: int):
+        while self._entries and (self.used_bytes + incoming > self.max_bytes or len(self._entries) >= MAX_ENTRIES):
+            self.discard(next(iter(self._entries)))
+            self.stats.evictions += 1
+
+
+@dataclass
+class QueryCacheStats:
+    hits: int = 0
+    misses: int = 0
+    invalidations: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        return self.hits / (self.hits + self.misses) if self.hits or self.misses else 0.0
+
+    def dict(self) -> dict:
+        return {**asdict(self), "hit_ratio": self.hit_ratio}
+
+
+class QueryCacheBackend(ABC):
+    """Storage of pickled repository read results, tagged with the tables they were read from.
+
+    Every table has a generation that `invalidate` bumps and repositories put into their keys, so results read before
+    a write can not be found after it, even if they were stored after it. A shared cache can keep generations as
+    counters next to the results and leave stale entries to expire.
+    """
+
+    stats: QueryCacheStats
+
+    @abstractmethod
+    async def generations(self, namespaces: tuple[str, ...]) -> tuple[int, ...]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get(self, key: str) -> bytes | None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, namespaces: tuple[str, ...]):
+        raise NotImplementedError
+
+    @abstractmethod
+    async def invalidate(self, namespaces: tuple[str, ...]):
+        raise NotImplementedError
+
+
+@dataclass
+class QueryCacheEntry:
+    value: bytes
+    namespaces: tuple[str, ...]
+    expires_at: float
+
+
+class MemoryQueryCache(QueryCacheBackend):
+    """In-process LRU of at most `max_entries` results, each one kept for `ttl` seconds.
+
+    Entries of invalidated tables are dropped right away. `used_bytes` counts pickled results and their keys
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.used_bytes = 0
+        self.stats = QueryCacheStats()
+
+        self._entries: OrderedDict[str, QueryCacheEntry] = OrderedDict()
+        self._keys: dict[str, set[str]] = {}
+        self._generations: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def generations(self, namespaces: tuple[str, ...]) -> tuple[int, ...]:
+        return tuple(self._generations.get(namespace, 0) for namespace in namespaces)
+
+    async def get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            self._discard(key)
+            entry = None
+        if entry is None:
+            self.stats.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return entry.value
+
+    async def set(self, key: str, value: bytes, namespaces: tuple[str, ...]):
+        self._discard(key)
+        while len(self._entries) >= self.max_entries:
+            self._discard(next(iter(self._entries)))
+            self.stats.evictions += 1
+
+        self._entries[key] = QueryCacheEntry(value, namespaces, time.monotonic() + self.ttl)
+        self.used_bytes += len(key) + len(value)
+        for namespace in namespaces:
+            self._keys.setdefault(namespace, set()).add(key)
+
+    async def invalidate(self, namespaces: tuple[str, ...]):
+        for namespace in namespaces:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            for key in self._keys.pop(namespace, set()):
+                self._discard(key)
+        self.stats.invalidations += 1
+
+    def _discard(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.used_bytes -= len(key) + len(entry.value)
+        for namespace in entry.namespaces:
+            if (keys := self._keys.get(namespace)) is not None:
+                keys.discard(key)
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -12,6 +13,27 @@ PG_PASSWORD: str = os.getenv("PG_PASSWORD")
 PG_TABLENAME: str = os.getenv("PG_TABLENAME")
 PG_DATABASE_URI: str = os.getenv("PG_DATABASE_URI")
 
+# Read replica for read only routes, optional. Users keep reading from the primary for READ_YOUR_WRITES_SECONDS
+# after their last write, longer than the replication lag is expected to be
+PG_REPLICA_DATABASE_URI: str | None = os.getenv("PG_REPLICA_DATABASE_URI") or None
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", 10))
+
+# Database engine. Pool settings are not used with SQLite
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", 30))
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", 30 * 60))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+# Prepared statements cached by asyncpg per connection, 0 when connecting through pgbouncer in transaction mode
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))
+# Rows per INSERT statement of bulk writes
+DB_BULK_BATCH_SIZE = int(os.getenv("DB_BULK_BATCH_SIZE", 500))
+SQL_ECHO = os.getenv("SQL_ECHO", "false").lower() in ("1", "true", "yes")
+# Share of statements logged by "src.database.sql" logger and threshold for always logging slow ones, 0 disables.
+# SIGUSR1 switches sampling on and off at runtime
+SQL_LOG_SAMPLE_RATE = float(os.getenv("SQL_LOG_SAMPLE_RATE", 0))
+SQL_LOG_SLOW_MS = float(os.getenv("SQL_LOG_SLOW_MS", 0))
+
 JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY")
 REFRESH_SECRET_KEY = os.getenv("REFRESH_SECRET_KEY")
 
@@ -23,4 +45,65 @@ S3_SECRET_KEY = os.getenv("S3_SECRET_KEY", "Sergey125!")
 S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL", "http://192.168.1.201:9002")
 S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME", "lingoplay")
 
+# "s3" or "local". Local backend keeps files on this node and does not need S3 compatible storage at all
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "s3")
+LOCAL_STORAGE_DIR = Path(os.getenv("LOCAL_STORAGE_DIR", ROOT_DIR / "storage"))
+LOCAL_STORAGE_COPY_CHUNK_SIZE = int(os.getenv("LOCAL_STORAGE_COPY_CHUNK_SIZE", 1024 * 1024))
+
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", 50))
+S3_KEEPALIVE_TIMEOUT = float(os.getenv("S3_KEEPALIVE_TIMEOUT", 60))
+S3_CONNECT_TIMEOUT = float(os.getenv("S3_CONNECT_TIMEOUT", 10))
+
+S3_MULTIPART_THRESHOLD = int(os.getenv("S3_MULTIPART_THRESHOLD", 64 * 1024 * 1024))
+S3_MULTIPART_CHUNK_SIZE = int(os.getenv("S3_MULTIPART_CHUNK_SIZE", 16 * 1024 * 1024))
+S3_MULTIPART_CONCURRENCY = int(os.getenv("S3_MULTIPART_CONCURRENCY", 4))
+S3_MULTIPART_MAX_ATTEMPTS = int(os.getenv("S3_MULTIPART_MAX_ATTEMPTS", 3))
+S3_PRESIGNED_URL_EXPIRES_SECONDS = int(os.getenv("S3_PRESIGNED_URL_EXPIRES_SECONDS", 3600))
+
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", 256 * 1024))
+STREAM_CACHE_CONTROL = os.getenv("STREAM_CACHE_CONTROL", "private, max-age=86400")
+
+# Local disk cache of stored objects, disabled when STORAGE_CACHE_MAX_BYTES is 0
+STORAGE_CACHE_DIR = Path(os.getenv("STORAGE_CACHE_DIR", Path(tempfile.gettempdir()) / "lingoplay-storage-cache"))
+STORAGE_CACHE_MAX_BYTES = int(os.getenv("STORAGE_CACHE_MAX_BYTES", 0))
+STORAGE_CACHE_MAX_OBJECT_SIZE = int(os.getenv("STORAGE_CACHE_MAX_OBJECT_SIZE", 512 * 1024 * 1024))
+STORAGE_CACHE_REVALIDATE_SECONDS = float(os.getenv("STORAGE_CACHE_REVALIDATE_SECONDS", 60))
+
+UPLOAD_SESSION_TTL_SECONDS = int(os.getenv("UPLOAD_SESSION_TTL_SECONDS", 24 * 60 * 60))
+UPLOAD_SESSION_CLEANUP_INTERVAL_SECONDS = int(os.getenv("UPLOAD_SESSION_CLEANUP_INTERVAL_SECONDS", 10 * 60))
+UPLOAD_SESSION_MIN_CHUNK_SIZE = int(os.getenv("UPLOAD_SESSION_MIN_CHUNK_SIZE", 5 * 1024 * 1024))
+UPLOAD_SESSION_MAX_CHUNK_SIZE = int(os.getenv("UPLOAD_SESSION_MAX_CHUNK_SIZE", 64 * 1024 * 1024))
+
+# Admission of uploads that go through the API: total size of request bodies being received at once and
+# number of simultaneous uploads of one user. Requests over the limits wait in queue up to UPLOAD_QUEUE_TIMEOUT_SECONDS
+# and then get 429 with Retry-After
+UPLOAD_MAX_INFLIGHT_BYTES = int(os.getenv("UPLOAD_MAX_INFLIGHT_BYTES", 2 * 1024 * 1024 * 1024))
+UPLOAD_MAX_PER_USER = int(os.getenv("UPLOAD_MAX_PER_USER", 2))
+UPLOAD_QUEUE_TIMEOUT_SECONDS = float(os.getenv("UPLOAD_QUEUE_TIMEOUT_SECONDS", 10))
+UPLOAD_RETRY_AFTER_SECONDS = int(os.getenv("UPLOAD_RETRY_AFTER_SECONDS", 30))
+
+SUBTITLES_MAX_SIZE = int(os.getenv("SUBTITLES_MAX_SIZE", 5 * 1024 * 1024))
+# Decoded cue indexes of subtitle tracks kept in memory for time range lookups
+SUBTITLES_CACHE_MAX_ENTRIES = int(os.getenv("SUBTITLES_CACHE_MAX_ENTRIES", 256))
+
+STORAGE_PURGE_INTERVAL_SECONDS = int(os.getenv("STORAGE_PURGE_INTERVAL_SECONDS", 60))
+STORAGE_PURGE_BATCH_SIZE = int(os.getenv("STORAGE_PURGE_BATCH_SIZE", 1000))
+STORAGE_PURGE_CONCURRENCY = int(os.getenv("STORAGE_PURGE_CONCURRENCY", 4))
+
+# Page size of list endpoints when the client does not ask for one, and the largest it may ask for
+PAGE_DEFAULT_LIMIT = int(os.getenv("PAGE_DEFAULT_LIMIT", 50))
+PAGE_MAX_LIMIT = int(os.getenv("PAGE_MAX_LIMIT", 200))
+
+# Matches of game title search that are ranked by relevance, the rest of them are never returned
+GAMES_SEARCH_MAX_CANDIDATES = int(os.getenv("GAMES_SEARCH_MAX_CANDIDATES", 1000))
+
+# Recount of video counters of games and users, which are kept in the same transactions as videos and should not drift
+VIDEO_COUNTS_RECONCILE_INTERVAL_SECONDS = int(os.getenv("VIDEO_COUNTS_RECONCILE_INTERVAL_SECONDS", 60 * 60))
+VIDEO_COUNTS_RECONCILE_BATCH_SIZE = int(os.getenv("VIDEO_COUNTS_RECONCILE_BATCH_SIZE", 1000))
+
+# In-process cache of repeated reads of users and games, disabled when QUERY_CACHE_MAX_ENTRIES is 0. Each worker has
+# its own, so writes made by other workers, or rows read from a lagging replica, may be served for QUERY_CACHE_TTL_SECONDS
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", 0))
+QUERY_CACHE_TTL_SECONDS = float(os.getenv("QUERY_CACHE_TTL_SECONDS", 5))
+
 IS_TESTING = bool(os.getenv("IS_TESTING", False))
@@ -1,16 +1,47 @@
 import re
 from typing import Annotated
 
-from fastapi import Depends
-from sqlalchemy import MetaData
+from fastapi import Depends, Request
+from sqlalchemy import MetaData, make_url
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, declared_attr
 
+from src import config
 from src.config import IS_TESTING, PG_DATABASE_URI
-
-engine = create_async_engine(PG_DATABASE_URI, echo=True)
+from src.database.replica import last_writes, request_user_id
+from src.database.sql_log import sql_logger
+
+
+def engine_options(url: str) -> dict:
+    """Keyword arguments of `create_async_engine` from settings. SQLite uses its own pool and takes none of them"""
+    url = make_url(url)
+    options = {"echo": config.SQL_ECHO}
+    if url.get_backend_name() == "sqlite":
+        return options
+
+    options.update(
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW,
+        pool_timeout=config.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=config.DB_POOL_RECYCLE_SECONDS,
+        pool_pre_ping=config.DB_POOL_PRE_PING,
+    )
+    if url.get_driver_name() == "asyncpg":
+        options["connect_args"] = {"prepared_statement_cache_size": config.DB_STATEMENT_CACHE_SIZE}
+    return options
+
+
+engine = create_async_engine(PG_DATABASE_URI, **engine_options(PG_DATABASE_URI))
+sql_logger.install(engine)
+
+# Optional read replica, without it reads go to the primary as well
+replica_engine = None
+if config.PG_REPLICA_DATABASE_URI:
+    replica_engine = create_async_engine(config.PG_REPLICA_DATABASE_URI, **engine_options(config.PG_REPLICA_DATABASE_URI))
+    sql_logger.install(replica_engine)
 
 new_session = async_sessionmaker(engine, expire_on_commit=False)
+new_read_session = async_sessionmaker(replica_engine or engine, expire_on_commit=False)
 
 
 async def get_session():
@@ -18,7 +49,15 @@ async def get_session():
         yield session
 
 
+async def get_read_session(request: Request):
+    """Session of read only routes, on the replica unless the user has just written something"""
+    session_maker = new_session if last_writes.recent(request_user_id(request.scope)) else new_read_session
+    async with session_maker() as session:
+        yield session
+
+
 DbSession = Annotated[AsyncSession, Depends(get_session)]
+DbReadSession = Annotated[AsyncSession, Depends(get_read_session)]
 
 
 def resolve_table_name(name):
@@ -0,0 +1,78 @@
+import time
+
+import jwt
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from src import config
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class LastWrites:
+    """Users who wrote within the last `window` seconds, with the time of their last write.
+
+    Kept in process memory, so with several workers a write is only seen by the worker that handled it.
+    """
+
+    def __init__(self, window: int = config.READ_YOUR_WRITES_SECONDS):
+        self.window = window
+        # Ordered by write time, the oldest first
+        self._written_at: dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._written_at)
+
+    def record(self, user_id: int):
+        now = time.monotonic()
+        self._written_at.pop(user_id, None)
+        self._written_at[user_id] = now
+        for oldest, written_at in list(self._written_at.items()):
+            if now - written_at < self.window:
+                break
+            del self._written_at[oldest]
+
+    def recent(self, user_id: int | None) -> bool:
+        written_at = self._written_at.get(user_id)
+        return written_at is not None and time.monotonic() - written_at < self.window
+
+
+last_writes = LastWrites()
+
+
+def request_user_id(scope: Scope) -> int | None:
+    """Id from the access token of the request, None without a valid one"""
+    scheme, _, token = Headers(scope=scope).get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer":
+        return None
+    try:
+        return jwt.decode(token, config.JWT_SECRET_KEY, algorithms=["HS256"]).get("id")
+    except jwt.InvalidTokenError:
+        return None
+
+
+class ReadYourWritesMiddleware:
+    """Records users who have just written.
+
+    Successful requests with other than safe methods mark the user of the access token in `last_writes`, and
+    `get_read_session` sends reads of such users to the primary, so replication lag never hides their own writes,
+    whichever client or device they read from.
+    """
+
+    def __init__(self, app: ASGIApp, last_writes: LastWrites = last_writes):
+        self.app = app
+        self.last_writes = last_writes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS or not self.last_writes.window:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_recording_write(message: Message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                user_id = request_user_id(scope)
+                if user_id is not None:
+                    self.last_writes.record(user_id)
+            await send(message)
+
+        await self.app(scope, receive, send_recording_write)
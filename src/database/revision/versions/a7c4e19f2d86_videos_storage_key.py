@@ -0,0 +1,69 @@
+"""Videos storage key instead of URL
+
+Revision ID: a7c4e19f2d86
+Revises: e6a3d95b2c71
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+from src import config
+
+# revision identifiers, used by Alembic.
+revision: str = "a7c4e19f2d86"
+down_revision: str | Sequence[str] | None = "e6a3d95b2c71"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+videos = sa.table(
+    "videos",
+    sa.column("id", sa.Integer),
+    sa.column("user_id", sa.Integer),
+    sa.column("path", sa.String),
+    sa.column("key", sa.String),
+)
+
+
+def key_from_url(url: str, user_id: int) -> str:
+    """Object keys start with "<user_id>/videos/", anything before it is endpoint and bucket of the URL"""
+    index = url.find(f"/{user_id}/videos/")
+    return url[index + 1 :] if index != -1 else url
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("videos", sa.Column("key", sa.String(), nullable=True))
+
+    connection = op.get_bind()
+    after_id = 0
+    while rows := connection.execute(
+        sa.select(videos.c.id, videos.c.user_id, videos.c.path)
+        .where(videos.c.id > after_id)
+        .order_by(videos.c.id)
+        .limit(BACKFILL_BATCH_SIZE)
+    ).all():
+        after_id = rows[-1].id
+        connection.execute(
+            sa.update(videos).where(videos.c.id == sa.bindparam("video_id")).values(key=sa.bindparam("video_key")),
+            [{"video_id": row.id, "video_key": key_from_url(row.path, row.user_id)} for row in rows],
+        )
+
+    op.alter_column("videos", "key", nullable=False)
+    op.create_index(op.f("ix_videos_key"), "videos", ["key"], unique=True)
+    op.drop_column("videos", "path")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.add_column("videos", sa.Column("path", sa.String(), nullable=True))
+    prefix = f"{config.S3_ENDPOINT_URL.rstrip('/')}/{config.S3_BUCKET_NAME}/"
+    op.execute(sa.update(videos).values(path=sa.literal(prefix) + videos.c.key))
+    op.alter_column("videos", "path", nullable=False)
+    op.create_unique_constraint(None, "videos", ["path"])
+    op.drop_index(op.f("ix_videos_key"), table_name="videos")
+    op.drop_column("videos", "key")
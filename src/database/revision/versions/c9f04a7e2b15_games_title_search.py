@@ -0,0 +1,67 @@
+"""Games title search
+
+Revision ID: c9f04a7e2b15
+Revises: b3e8d1f4a927
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c9f04a7e2b15"
+down_revision: str | Sequence[str] | None = "b3e8d1f4a927"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+GAMES_FTS_DDL = [
+    (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS games_fts USING fts5("
+        "title, content='games', content_rowid='id', tokenize='trigram')"
+    ),
+    (
+        "CREATE TRIGGER games_fts_insert AFTER INSERT ON games BEGIN "
+        "INSERT INTO games_fts(rowid, title) VALUES (new.id, new.title); END"
+    ),
+    (
+        "CREATE TRIGGER games_fts_delete AFTER DELETE ON games BEGIN "
+        "INSERT INTO games_fts(games_fts, rowid, title) VALUES ('delete', old.id, old.title); END"
+    ),
+    (
+        "CREATE TRIGGER games_fts_update AFTER UPDATE OF title ON games BEGIN "
+        "INSERT INTO games_fts(games_fts, rowid, title) VALUES ('delete', old.id, old.title); "
+        "INSERT INTO games_fts(rowid, title) VALUES (new.id, new.title); END"
+    ),
+    "INSERT INTO games_fts(games_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == "sqlite":
+        for statement in GAMES_FTS_DDL:
+            op.execute(sa.text(statement))
+        return
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        "ix_games_title_trgm",
+        "games",
+        ["title"],
+        unique=False,
+        postgresql_using="gin",
+        postgresql_ops={"title": "gin_trgm_ops"},
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == "sqlite":
+        for trigger in ("games_fts_insert", "games_fts_delete", "games_fts_update"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS games_fts")
+        return
+
+    op.drop_index("ix_games_title_trgm", table_name="games", postgresql_using="gin")
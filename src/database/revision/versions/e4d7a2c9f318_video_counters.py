@@ -0,0 +1,34 @@
+"""Video counters of games and users
+
+Revision ID: e4d7a2c9f318
+Revises: c9f04a7e2b15
+Create Date: 2026-10-18 23:00:00.000000
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e4d7a2c9f318"
+down_revision: str | Sequence[str] | None = "c9f04a7e2b15"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("games", sa.Column("videos_count", sa.Integer(), server_default="0", nullable=False))
+    op.add_column("lingoplay_users", sa.Column("videos_count", sa.Integer(), server_default="0", nullable=False))
+    op.execute("UPDATE games SET videos_count = (SELECT count(*) FROM videos WHERE videos.game_id = games.id)")
+    op.execute(
+        "UPDATE lingoplay_users SET videos_count = "
+        "(SELECT count(*) FROM videos WHERE videos.user_id = lingoplay_users.id)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("lingoplay_users", "videos_count")
+    op.drop_column("games", "videos_count")
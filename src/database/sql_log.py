@@ -0,0 +1,80 @@
+import logging
+import random
+import time
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src import config
+
+STARTED_KEY = "sql_log_started"
+# Sample rate used when SIGUSR1 switches sampling on and no rate is configured
+DEFAULT_TOGGLE_SAMPLE_RATE = 0.01
+
+
+class SqlLogger:
+    """Logs a random share of statements and every statement slower than `slow_ms`.
+
+    Records are written to "src.database.sql" logger with statement, duration and row count in `extra`, so a JSON
+    formatter can output them as fields. Both settings can be changed while the app is running, with both of them
+    at 0 the cursor event handlers return right away.
+    """
+
+    def __init__(self, sample_rate: float = 0, slow_ms: float = 0, logger: logging.Logger | None = None):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.logger = logger or logging.getLogger("src.database.sql")
+        self._toggle_rate = sample_rate or DEFAULT_TOGGLE_SAMPLE_RATE
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or self.slow_ms > 0
+
+    def install(self, engine: AsyncEngine):
+        event.listen(engine.sync_engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine.sync_engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(engine.sync_engine, "handle_error", self._handle_error)
+
+    def toggle(self):
+        """Switches sampling off, or back on with the last used rate"""
+        if self.sample_rate:
+            self._toggle_rate, self.sample_rate = self.sample_rate, 0
+        else:
+            self.sample_rate = self._toggle_rate
+        self.logger.warning("SQL statements sample rate is %s", self.sample_rate)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.enabled:
+            conn.info.setdefault(STARTED_KEY, []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get(STARTED_KEY)
+        if not started:
+            return
+
+        duration_ms = (time.perf_counter() - started.pop()) * 1000
+        slow = 0 < self.slow_ms <= duration_ms
+        if not slow and random.random() >= self.sample_rate:
+            return
+        self.logger.log(
+            logging.WARNING if slow else logging.INFO,
+            "SQL %.1f ms: %s",
+            duration_ms,
+            statement,
+            extra={
+                "sql": statement,
+                "duration_ms": round(duration_ms, 3),
+                "rows": cursor.rowcount,
+                "executemany": executemany,
+                "slow": slow,
+            },
+        )
+
+    def _handle_error(self, context):
+        """Drops start time of the failed statement, after_cursor_execute is not called for it"""
+        started = context.connection.info.get(STARTED_KEY) if context.connection is not None else None
+        if started:
+            started.pop()
+
+
+sql_logger = SqlLogger(config.SQL_LOG_SAMPLE_RATE, config.SQL_LOG_SLOW_MS)
@@ -27,3 +27,32 @@ class AlreadyExistsError(Exception):
         self.field = field
         self.value = value
         super().__init__(f"{model} with {field}='{value}' already exists.")
+
+
+class StorageError(BaseAppError):
+    """Базовая ошибка файлового хранилища."""
+
+
+class RangeNotSatisfiableError(StorageError):
+    def __init__(self, byte_range: str):
+        self.byte_range = byte_range
+        super().__init__(f"Range '{byte_range}' is not satisfiable.")
+
+
+class PresignedUploadsNotSupportedError(StorageError):
+    def __init__(self):
+        super().__init__("Хранилище не поддерживает прямую загрузку, используйте возобновляемую загрузку.")
+
+
+class InvalidCursorError(RepositoryError):
+    def __init__(self, cursor: str):
+        self.cursor = cursor
+        super().__init__(f"Некорректный курсор страницы: '{cursor}'.")
+
+
+class BulkWriteError(RepositoryError):
+    """Rows of bulk write that were rejected by the database, by their index among written rows"""
+
+    def __init__(self, errors: dict[int, RepositoryError]):
+        self.errors = errors
+        super().__init__(f"{len(errors)} rows were rejected, first at index {min(errors)}: {errors[min(errors)]}")
@@ -1,10 +1,81 @@
+import asyncio
+import signal
+from contextlib import AsyncExitStack, asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from src import config
 from src.api import api_router
+from src.cache import DiskCache
+from src.database.core import new_session
+from src.database.replica import ReadYourWritesMiddleware
+from src.database.sql_log import sql_logger
+from src.repository import create_s3_client, create_storage_repository
+from src.tasks import run_periodically
+from src.uploads.scheduler import UploadScheduler, UploadSchedulerMiddleware
+from src.uploads.tasks import cleanup_expired_upload_sessions, purge_deleted_files, reconcile_video_counts
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with AsyncExitStack() as stack:
+        s3_client = None
+        if config.STORAGE_BACKEND == "s3":
+            s3_client = await stack.enter_async_context(create_s3_client())
+        app.state.s3_client = s3_client
+        app.state.storage_cache = (
+            DiskCache(config.STORAGE_CACHE_DIR, config.STORAGE_CACHE_MAX_BYTES)
+            if config.STORAGE_CACHE_MAX_BYTES and config.STORAGE_BACKEND == "s3"
+            else None
+        )
+        # Background jobs delete through the cache as well, so purged files are not served from it
+        s3_repository = create_storage_repository(s3_client, app.state.storage_cache)
+
+        if hasattr(signal, "SIGUSR1"):
+            loop = asyncio.get_running_loop()
+            loop.add_signal_handler(signal.SIGUSR1, sql_logger.toggle)
+            stack.callback(loop.remove_signal_handler, signal.SIGUSR1)
+
+        background_jobs = [
+            asyncio.create_task(
+                run_periodically(
+                    config.UPLOAD_SESSION_CLEANUP_INTERVAL_SECONDS,
+                    cleanup_expired_upload_sessions,
+                    new_session,
+                    s3_repository,
+                )
+            ),
+            asyncio.create_task(
+                run_periodically(
+                    config.STORAGE_PURGE_INTERVAL_SECONDS,
+                    purge_deleted_files,
+                    new_session,
+                    s3_repository,
+                )
+            ),
+            asyncio.create_task(
+                run_periodically(
+                    config.VIDEO_COUNTS_RECONCILE_INTERVAL_SECONDS,
+                    reconcile_video_counts,
+                    new_session,
+                    s3_repository,
+                )
+            ),
+        ]
+        try:
+            yield
+        finally:
+            for job in background_jobs:
+                job.cancel()
+            await asyncio.gather(*background_jobs, return_exceptions=True)
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+app.state.upload_scheduler = UploadScheduler()
 
+app.add_middleware(UploadSchedulerMiddleware, scheduler=app.state.upload_scheduler)
+app.add_middleware(ReadYourWritesMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -1,21 +1,59 @@
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import logging
+import mimetypes
+import os
+import pickle
 import re
+import shutil
+import time
+import uuid
 from abc import ABC, abstractmethod
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, AsyncIterator
 from contextlib import asynccontextmanager
+from dataclasses import dataclass, fields
+from datetime import UTC, datetime
 from functools import wraps
+from pathlib import Path
 from typing import Annotated, overload
 
+from aiobotocore.config import AioConfig
 from aiobotocore.session import get_session
-from botocore.exceptions import ClientError
-from fastapi import Depends
-from sqlalchemy import delete, exists, insert, or_, select, update
+from botocore.exceptions import BotoCoreError, ClientError
+from fastapi import Depends, Request
+from sqlalchemy import delete, exists, insert, or_, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from types_aiobotocore_s3.client import S3Client
 
 from src import config
+from src.cache import CacheEntry, DiskCache, MemoryQueryCache, QueryCacheBackend
 from src.database.core import Base
-from src.errors import DatabaseCommitError, UniqueConstraintViolation
+from src.errors import (
+    BulkWriteError,
+    DatabaseCommitError,
+    InvalidCursorError,
+    PresignedUploadsNotSupportedError,
+    RangeNotSatisfiableError,
+    RepositoryError,
+    StorageError,
+    UniqueConstraintViolation,
+)
+
+logger = logging.getLogger(__name__)
+
+S3_DELETE_OBJECTS_MAX_KEYS = 1000
+
+# Shared by repositories that opt in with `cache = query_cache`, None when the cache is disabled
+query_cache = (
+    MemoryQueryCache(config.QUERY_CACHE_MAX_ENTRIES, config.QUERY_CACHE_TTL_SECONDS)
+    if config.QUERY_CACHE_MAX_ENTRIES
+    else None
+)
 
 
 class AbstractRepository(ABC):
@@ -44,11 +82,64 @@ class AbstractRepository(ABC):
         raise NotImplementedError
 
 
+SINGLE_BYTE_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def parse_byte_range(byte_range: str, size: int) -> tuple[int, int]:
+    """Resolves single range Range header value into inclusive (start, end) offsets of a file of `size` bytes"""
+    match = SINGLE_BYTE_RANGE_RE.match(byte_range.strip())
+    if not match or match.groups() == ("", ""):
+        raise RangeNotSatisfiableError(byte_range)
+
+    start, end = match.groups()
+    if start == "":
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+
+    if start >= size or start > end:
+        raise RangeNotSatisfiableError(byte_range)
+    return start, end
+
+
+@dataclass
+class FileStream:
+    """Body of stored file (or of its byte range) with metadata needed for HTTP response"""
+
+    body: AsyncIterator[bytes]
+    content_length: int
+    content_range: str | None = None
+    content_type: str | None = None
+    etag: str | None = None
+    last_modified: datetime | None = None
+    # Local file behind the body, lets the response hand it to the server for zero-copy sending
+    path: Path | None = None
+    offset: int = 0
+
+
+@dataclass
+class StoredObject:
+    """Single entry of bucket listing"""
+
+    key: str
+    size: int
+    etag: str | None = None
+    last_modified: datetime | None = None
+
+
 class AbstractS3Repository(ABC):
     @abstractmethod
     async def get_file():
         raise NotImplementedError
 
+    @abstractmethod
+    async def stream_file():
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_objects():
+        raise NotImplementedError
+
     @abstractmethod
     async def upload_file():
         raise NotImplementedError
@@ -57,19 +148,122 @@ class AbstractS3Repository(ABC):
     async def delete_file():
         raise NotImplementedError
 
+    @abstractmethod
+    async def delete_files():
+        raise NotImplementedError
+
+    @abstractmethod
+    async def head_file():
+        raise NotImplementedError
+
+    @abstractmethod
+    async def generate_upload_url():
+        raise NotImplementedError
+
+    @abstractmethod
+    async def create_multipart_upload():
+        raise NotImplementedError
+
+    @abstractmethod
+    async def generate_upload_part_urls():
+        raise NotImplementedError
+
+    @abstractmethod
+    async def upload_part():
+        raise NotImplementedError
+
+    @abstractmethod
+    async def complete_multipart_upload():
+        raise NotImplementedError
 
-async def get_s3_repo():
-    yield S3Repository(
-        access_key=config.S3_ACCESS_KEY,
-        secret_key=config.S3_SECRET_KEY,
-        endpoint_url=config.S3_ENDPOINT_URL,
-        bucket_name=config.S3_BUCKET_NAME,
+    @abstractmethod
+    async def abort_multipart_upload():
+        raise NotImplementedError
+
+    @abstractmethod
+    def object_url():
+        raise NotImplementedError
+
+    @abstractmethod
+    def object_key():
+        raise NotImplementedError
+
+
+@asynccontextmanager
+async def create_s3_client(
+    access_key: str = config.S3_ACCESS_KEY,
+    secret_key: str = config.S3_SECRET_KEY,
+    endpoint_url: str = config.S3_ENDPOINT_URL,
+) -> AsyncGenerator[S3Client, None]:
+    """Creates S3 client with its own connection pool. Meant to live for the whole application lifetime."""
+    client_config = AioConfig(
+        max_pool_connections=config.S3_MAX_POOL_CONNECTIONS,
+        connect_timeout=config.S3_CONNECT_TIMEOUT,
+        tcp_keepalive=True,
+        connector_args={"keepalive_timeout": config.S3_KEEPALIVE_TIMEOUT},
     )
+    async with get_session().create_client(
+        "s3",
+        aws_access_key_id=access_key,
+        aws_secret_access_key=secret_key,
+        endpoint_url=endpoint_url,
+        config=client_config,
+    ) as client:
+        yield client
+
+
+def create_storage_repository(s3_client: S3Client | None, cache: DiskCache | None = None) -> "AbstractS3Repository":
+    """Storage selected by STORAGE_BACKEND setting, read through `cache` when given.
+
+    `s3_client` is not used by local backend and may be None
+    """
+    if config.STORAGE_BACKEND == "local":
+        repository = LocalStorageRepository(config.LOCAL_STORAGE_DIR)
+    else:
+        repository = S3Repository(client=s3_client, endpoint_url=config.S3_ENDPOINT_URL, bucket_name=config.S3_BUCKET_NAME)
+    return CachedS3Repository(repository, cache) if cache is not None else repository
+
+
+async def get_s3_repo(request: Request):
+    yield create_storage_repository(request.app.state.s3_client, getattr(request.app.state, "storage_cache", None))
 
 
 S3Repo = Annotated[AbstractS3Repository, Depends(get_s3_repo)]
 
 
+@dataclass
+class Page:
+    """Rows of one page and opaque cursor of the next one, None on the last page"""
+
+    items: list
+    next_cursor: str | None = None
+
+
+def encode_cursor(values: list) -> str:
+    """Sort key values of the last row of a page as URL safe string"""
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: list) -> list:
+    """Sort key values of `encode_cursor`, each of the python type of its column"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError as e:
+        raise InvalidCursorError(cursor) from e
+
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise InvalidCursorError(cursor)
+    for value, column in zip(values, columns, strict=True):
+        if isinstance(value, bool) or not isinstance(value, column.type.python_type):
+            raise InvalidCursorError(cursor)
+    return values
+
+
+def dialect_insert(session: AsyncSession):
+    """`insert` of the session's database dialect, the one that supports ON CONFLICT clauses"""
+    return postgresql.insert if session.bind.dialect.name == "postgresql" else sqlite.insert
+
+
 def handle_integrity_errors(method):
     @wraps(method)
     async def wrapper(self, *args, **kwargs):
@@ -78,35 +272,66 @@ def handle_integrity_errors(method):
                 return await method(self, session, *args, **kwargs)
             except IntegrityError as e:
                 await session.rollback()
-                error_message = str(e.orig)
+                raise self._integrity_error(e, args[0] if args else kwargs) from e
+
+    return wrapper
 
-                field_name = self._extract_unique_field_from_message(error_message)
-                if field_name:
-                    source = args[0] if args else kwargs
-                    if isinstance(source, dict):
-                        value = source.get(field_name, "???")
-                    else:
-                        value = getattr(source, field_name, "???")
 
-                    raise UniqueConstraintViolation(field_name, value) from e
+async def invalidate_cached(*models: type[Base]):
+    """Drops cached reads of models that are written outside of their own repositories"""
+    if query_cache is not None:
+        await query_cache.invalidate(tuple(model.__table__.name for model in models))
 
-                raise DatabaseCommitError() from e
+
+def cached_query(method):
+    """Serves repeated calls of a read method with the same arguments from `cache` of the repository.
+
+    Results are kept pickled, so every call gets its own detached instances that no other request shares
+    """
+
+    @wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        if self.cache is None:
+            return await method(self, *args, **kwargs)
+
+        namespaces = self._cache_namespaces()
+        generations = await self.cache.generations(namespaces)
+        call = repr((type(self).__qualname__, method.__name__, args, sorted(kwargs.items())))
+        key = f"{':'.join(namespaces)}:{':'.join(map(str, generations))}:{hashlib.sha256(call.encode()).hexdigest()}"
+        if (value := await self.cache.get(key)) is not None:
+            return pickle.loads(value)
+
+        result = await method(self, *args, **kwargs)
+        await self.cache.set(key, pickle.dumps(result), namespaces)
+        return result
 
     return wrapper
 
 
 class AlchemyRepository(AbstractRepository):
     model = None
+    # Opt-in cache of read results, cleared by writes of this repository's model and of `cache_depends_on` models
+    cache: QueryCacheBackend | None = None
+    cache_depends_on: tuple[type[Base], ...] = ()
+    # Slotted dataclass that `filter_page` returns instead of whole instances, its fields name the columns to read
+    list_row: type | None = None
 
     def __init__(self, session: AsyncSession):
         self._session = session
 
+    @cached_query
     async def filter(self, first: bool = False, **kwargs) -> list[Base] | Base | None:
         async with self._session as session:
             stmt = select(self.model).filter_by(**kwargs)
             result = await session.execute(stmt)
             return result.scalars().first() if first else result.scalars().all()
 
+    @cached_query
+    async def filter_page(self, limit: int, cursor: str | None = None, order_by: str | None = None, **kwargs) -> Page:
+        async with self._session as session:
+            return await self._paginate(session, self._list_query().filter_by(**kwargs), limit, cursor, order_by)
+
+    @cached_query
     async def filter_or_(self, first: bool = False, **kwargs) -> list[Base] | Base | None:
         async with self._session as session:
             conditions = [getattr(self.model, key) == value for key, value in kwargs.items()]
@@ -126,49 +351,89 @@ class AlchemyRepository(AbstractRepository):
             stmt = insert(self.model).values(**data_or_instance).returning(self.model)
             res = await session.execute(stmt)
             await session.commit()
+            await self._invalidate_cache()
             return res.scalar_one()
         else:
             session.add(data_or_instance)
             await session.commit()
+            await self._invalidate_cache()
             await session.refresh(data_or_instance)
             return data_or_instance
 
+    async def create_many(self, rows: list[dict], batch_size: int = config.DB_BULK_BATCH_SIZE) -> list[Base]:
+        """Inserts rows with the same keys by multi-row INSERT ... RETURNING of `batch_size` rows, in one transaction.
+
+        Raises BulkWriteError with an error of `create_one` shape for every rejected row, nothing is inserted then
+        """
+        return await self._write_many(rows, batch_size, lambda session, batch: insert(self.model).values(batch))
+
+    async def upsert_many(
+        self,
+        rows: list[dict],
+        conflict_fields: list[str],
+        update_fields: list[str] | None = None,
+        batch_size: int = config.DB_BULK_BATCH_SIZE,
+    ) -> list[Base]:
+        """Inserts rows or updates existing ones by INSERT ... ON CONFLICT on `conflict_fields` unique index.
+
+        `update_fields` default to every written field but conflict ones. With an empty list existing rows are left
+        as they are and not returned. Of rows sharing a conflict key the last one is written. Raises BulkWriteError
+        with indices of `rows`
+        """
+        # Index in `rows` of every written row
+        indices = list({tuple(row[field] for field in conflict_fields): i for i, row in enumerate(rows)}.values())
+        rows = [rows[i] for i in indices]
+        if update_fields is None:
+            update_fields = [field for field in (rows[0] if rows else {}) if field not in conflict_fields]
+
+        def statement(session: AsyncSession, batch: list[dict]):
+            stmt = dialect_insert(session)(self.model).values(batch)
+            if not update_fields:
+                return stmt.on_conflict_do_nothing(index_elements=conflict_fields)
+            return stmt.on_conflict_do_update(
+                index_elements=conflict_fields, set_={field: stmt.excluded[field] for field in update_fields}
+            )
+
+        try:
+            return await self._write_many(rows, batch_size, statement)
+        except BulkWriteError as e:
+            raise BulkWriteError({indices[i]: error for i, error in e.errors.items()}) from None
+
     async def update_by(self, **kwargs) -> int:
         async with self._session as session:
             stmt = update(self.model).filter_by(**kwargs)
             result = await session.execute(stmt)
             await session.commit()
+            await self._invalidate_cache()
             return result.rowcount
 
-    async def update_or_create(self, filters: dict, values: dict):
-        async with self._session as session:
-            instance = await self.filter(**filters, first=True)
-
-            if instance:
-                stmt = update(self.model).filter_by(**filters).values(**values).returning(self.model)
-                result = await session.execute(stmt)
-                await session.commit()
-                updated_instance = result.scalar_one()
-                return updated_instance, False
+    async def update_or_create(self, filters: dict, values: dict) -> Base:
+        """Inserts row of filters and values, or sets values of the row matching filters, by single
+        INSERT ... ON CONFLICT DO UPDATE ... RETURNING.
 
+        Fields of `filters` must be covered by a unique index. Concurrent calls with the same filters never fail on the
+        unique constraint, the last one wins
+        """
+        async with self._session as session:
+            stmt = dialect_insert(session)(self.model).values(**filters, **values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(filters), set_={field: stmt.excluded[field] for field in values or filters}
+            )
             try:
-                create_data = {**filters, **values}
-                stmt = insert(self.model).values(**create_data).returning(self.model)
-                result = await session.execute(stmt)
+                instance = (await session.scalars(self._returning(stmt))).one()
                 await session.commit()
-                new_instance = result.scalar_one()
-                return new_instance, True
-            except IntegrityError:
+            except IntegrityError as e:
                 await session.rollback()
-                result = await session.execute(select(self.model).filter_by(**filters))
-                instance = result.scalar_one()
-                return instance, False
+                raise self._integrity_error(e, {**filters, **values}) from e
+            await self._invalidate_cache()
+            return instance
 
     async def delete_by(self, **kwargs) -> int:
         async with self._session as session:
             stmt = delete(self.model).filter_by(**kwargs)
             result = await session.execute(stmt)
             await session.commit()
+            await self._invalidate_cache()
             return result.rowcount
 
     async def exists(self, **kwargs) -> bool:
@@ -177,6 +442,90 @@ class AlchemyRepository(AbstractRepository):
             result = await session.execute(stmt)
             return result.scalar()
 
+    async def _write_many(self, rows: list[dict], batch_size: int, statement) -> list[Base]:
+        """Runs `statement(session, batch)` for batches of rows and returns written instances.
+
+        Every batch runs in its own savepoint. When a batch fails its rows are retried one by one to find which of
+        them the database rejects, and the whole write is rolled back once all batches are checked
+        """
+        async with self._session as session:
+            written, errors = [], {}
+            for offset in range(0, len(rows), batch_size):
+                batch = rows[offset : offset + batch_size]
+                try:
+                    async with session.begin_nested():
+                        written += (await session.scalars(self._returning(statement(session, batch)))).all()
+                except IntegrityError:
+                    errors.update(await self._row_errors(session, batch, offset, statement))
+
+            if errors:
+                await session.rollback()
+                raise BulkWriteError(errors)
+            await session.commit()
+            await self._invalidate_cache()
+            return written
+
+    async def _row_errors(
+        self, session: AsyncSession, batch: list[dict], offset: int, statement
+    ) -> dict[int, RepositoryError]:
+        errors = {}
+        for i, row in enumerate(batch, offset):
+            try:
+                async with session.begin_nested():
+                    await session.execute(statement(session, [row]))
+            except IntegrityError as e:
+                errors[i] = self._integrity_error(e, row)
+        return errors
+
+    def _cache_namespaces(self) -> tuple[str, ...]:
+        return tuple(model.__table__.name for model in (self.model, *self.cache_depends_on))
+
+    async def _invalidate_cache(self):
+        if self.cache is not None:
+            await self.cache.invalidate((self.model.__table__.name,))
+
+    def _list_query(self):
+        if self.list_row is None:
+            return select(self.model)
+        return select(*(getattr(self.model, field.name) for field in fields(self.list_row)))
+
+    def _list_rows(self, result) -> list:
+        return [self.list_row(*row) for row in result]
+
+    def _returning(self, stmt):
+        return stmt.returning(self.model).execution_options(populate_existing=True)
+
+    async def _paginate(
+        self, session: AsyncSession, query, limit: int, cursor: str | None = None, order_by: str | None = None
+    ) -> Page:
+        """Keyset page of query ordered by (order_by, id), of instances or of `list_row` when query selects columns.
+
+        The next page starts right after the sort key of the previous page's last row, so with an index on the same
+        columns every page costs the same however far it is, unlike OFFSET. Raises InvalidCursorError
+        """
+        columns = [getattr(self.model, order_by)] if order_by else []
+        columns.append(self.model.id)
+        if cursor is not None:
+            query = query.where(tuple_(*columns) > tuple_(*decode_cursor(cursor, columns)))
+
+        result = await session.execute(query.order_by(*columns).limit(limit + 1))
+        rows = result.scalars().all() if self._selects_model(query) else self._list_rows(result)
+        if len(rows) <= limit:
+            return Page(items=list(rows))
+        rows = rows[:limit]
+        return Page(items=list(rows), next_cursor=encode_cursor([getattr(rows[-1], c.key) for c in columns]))
+
+    def _selects_model(self, query) -> bool:
+        return [column["expr"] for column in query.column_descriptions] == [self.model]
+
+    def _integrity_error(self, error: IntegrityError, source: dict | Base) -> RepositoryError:
+        """UniqueConstraintViolation with the offending field of written dict or instance, or DatabaseCommitError"""
+        field_name = self._extract_unique_field_from_message(str(error.orig))
+        if field_name:
+            value = source.get(field_name, "???") if isinstance(source, dict) else getattr(source, field_name, "???")
+            return UniqueConstraintViolation(field_name, value)
+        return DatabaseCommitError()
+
     def _extract_unique_field_from_message(self, message: str) -> str | None:
         match = re.search(r"UNIQUE constraint failed: [\w_]+\.(\w+)", message)
         if match:
@@ -194,45 +543,571 @@ class AlchemyRepository(AbstractRepository):
 
 
 class S3Repository(AbstractS3Repository):
-    def __init__(self, access_key: str, secret_key: str, endpoint_url: str, bucket_name: str):
-        self.config = {
-            "aws_access_key_id": access_key,
-            "aws_secret_access_key": secret_key,
-            "endpoint_url": endpoint_url,
-        }
+    def __init__(
+        self,
+        client: S3Client,
+        endpoint_url: str,
+        bucket_name: str,
+        multipart_threshold: int = config.S3_MULTIPART_THRESHOLD,
+        multipart_chunk_size: int = config.S3_MULTIPART_CHUNK_SIZE,
+        multipart_concurrency: int = config.S3_MULTIPART_CONCURRENCY,
+        multipart_max_attempts: int = config.S3_MULTIPART_MAX_ATTEMPTS,
+    ):
+        self._client = client
+        self.endpoint_url = endpoint_url
         self.bucket_name = bucket_name
-        self.session = get_session()
 
-    @asynccontextmanager
-    async def _get_client(self) -> AsyncGenerator[S3Client, None]:
-        async with self.session.create_client("s3", **self.config) as client:
-            yield client
+        self.multipart_threshold = multipart_threshold
+        self.multipart_chunk_size = multipart_chunk_size
+        self.multipart_concurrency = multipart_concurrency
+        self.multipart_max_attempts = multipart_max_attempts
 
     async def get_file(self, key: str):
-        async with self._get_client() as client:
-            response = await client.get_object(Bucket=self.bucket_name, Key=key)
-            return await response["Body"].read()
+        response = await self._client.get_object(Bucket=self.bucket_name, Key=key)
+        return await response["Body"].read()
 
-    async def get_all(self):
-        async with self._get_client() as client:
-            response = await client.list_objects_v2(Bucket=self.bucket_name)
-            return [item["Key"] for item in response.get("Contents", [])]
+    async def stream_file(
+        self, key: str, byte_range: str | None = None, chunk_size: int = config.STREAM_CHUNK_SIZE
+    ) -> FileStream:
+        """Opens object for streaming. `byte_range` is HTTP Range header value and is passed to S3 as is"""
+        params = {"Bucket": self.bucket_name, "Key": key}
+        if byte_range is not None:
+            params["Range"] = byte_range
+
+        try:
+            response = await self._client.get_object(**params)
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "InvalidRange":
+                raise RangeNotSatisfiableError(byte_range) from e
+            raise
+
+        return FileStream(
+            body=self._iter_body(response["Body"], chunk_size),
+            content_length=response["ContentLength"],
+            content_range=response.get("ContentRange"),
+            content_type=response.get("ContentType"),
+            etag=response.get("ETag"),
+            last_modified=response.get("LastModified"),
+        )
+
+    async def get_all(self, prefix: str = "") -> list[str]:
+        return [obj.key async for obj in self.iter_objects(prefix)]
+
+    async def iter_objects(self, prefix: str = "", page_size: int = 1000) -> AsyncIterator[StoredObject]:
+        """Lazily walks all objects under `prefix` following continuation tokens, one page in memory at a time"""
+        paginator = self._client.get_paginator("list_objects_v2")
+        pages = paginator.paginate(Bucket=self.bucket_name, Prefix=prefix, PaginationConfig={"PageSize": page_size})
+        async for page in pages:
+            for item in page.get("Contents", []):
+                yield StoredObject(
+                    key=item["Key"],
+                    size=item["Size"],
+                    etag=item.get("ETag"),
+                    last_modified=item.get("LastModified"),
+                )
 
     async def upload_file(self, file_obj, object_name: str) -> str:
         try:
-            async with self._get_client() as client:
-                await client.put_object(Bucket=self.bucket_name, Key=object_name, Body=file_obj)
-            return f"{self.config['endpoint_url'].rstrip('/')}/{self.bucket_name}/{object_name}"
+            if self._remaining_size(file_obj) >= self.multipart_threshold:
+                await self._upload_multipart(file_obj, object_name)
+            else:
+                await self._client.put_object(Bucket=self.bucket_name, Key=object_name, Body=file_obj)
+            return self.object_url(object_name)
         except ClientError as e:
             print(f"Error uploading file: {e}")
 
     async def delete_file(self, object_name: str):
         try:
-            async with self._get_client() as client:
-                await client.delete_object(Bucket=self.bucket_name, Key=object_name)
+            await self._client.delete_object(Bucket=self.bucket_name, Key=object_name)
         except ClientError as e:
             print(f"Error deleting file: {e}")
 
+    async def delete_files(self, keys: list[str]) -> list[str]:
+        """Deletes objects with one request per 1000 keys. Returns keys that were not deleted"""
+        failed = []
+        for start in range(0, len(keys), S3_DELETE_OBJECTS_MAX_KEYS):
+            batch = keys[start : start + S3_DELETE_OBJECTS_MAX_KEYS]
+            try:
+                response = await self._client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+                )
+            except ClientError as e:
+                logger.error("Failed to delete %d objects starting at '%s': %s", len(batch), batch[0], e)
+                failed.extend(batch)
+                continue
+            errors = response.get("Errors", [])
+            if errors:
+                logger.error(
+                    "Failed to delete %d objects, first '%s': %s", len(errors), errors[0]["Key"], errors[0].get("Code")
+                )
+            failed.extend(error["Key"] for error in errors)
+        return failed
+
+    async def head_file(self, key: str) -> dict | None:
+        try:
+            response = await self._client.head_object(Bucket=self.bucket_name, Key=key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return {"size": response["ContentLength"], "etag": response["ETag"]}
+
+    async def generate_upload_url(self, key: str, expires_in: int = config.S3_PRESIGNED_URL_EXPIRES_SECONDS) -> str:
+        return await self._client.generate_presigned_url(
+            "put_object",
+            Params={"Bucket": self.bucket_name, "Key": key},
+            ExpiresIn=expires_in,
+        )
+
+    async def create_multipart_upload(self, key: str) -> str:
+        response = await self._client.create_multipart_upload(Bucket=self.bucket_name, Key=key)
+        return response["UploadId"]
+
+    async def generate_upload_part_urls(
+        self, key: str, upload_id: str, parts_count: int, expires_in: int = config.S3_PRESIGNED_URL_EXPIRES_SECONDS
+    ) -> list[str]:
+        return [
+            await self._client.generate_presigned_url(
+                "upload_part",
+                Params={"Bucket": self.bucket_name, "Key": key, "UploadId": upload_id, "PartNumber": part_number},
+                ExpiresIn=expires_in,
+            )
+            for part_number in range(1, parts_count + 1)
+        ]
+
+    async def complete_multipart_upload(self, key: str, upload_id: str, parts: list[dict] | None = None) -> bool:
+        """Completes multipart upload. Without explicit `parts` the uploaded parts are listed from storage.
+
+        Returns False if no parts were uploaded yet.
+        """
+        if parts is None:
+            paginator = self._client.get_paginator("list_parts")
+            parts = [
+                {"ETag": part["ETag"], "PartNumber": part["PartNumber"]}
+                async for page in paginator.paginate(Bucket=self.bucket_name, Key=key, UploadId=upload_id)
+                for part in page.get("Parts", [])
+            ]
+        if not parts:
+            return False
+
+        await self._client.complete_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": parts},
+        )
+        return True
+
+    async def abort_multipart_upload(self, key: str, upload_id: str):
+        await self._client.abort_multipart_upload(Bucket=self.bucket_name, Key=key, UploadId=upload_id)
+
+    def object_url(self, key: str) -> str:
+        return f"{self.endpoint_url.rstrip('/')}/{self.bucket_name}/{key}"
+
+    def object_key(self, url: str) -> str:
+        return url.removeprefix(self.object_url(""))
+
+    async def _upload_multipart(self, file_obj, object_name: str):
+        """Uploads file in parts, keeping at most `multipart_concurrency` parts in memory and in flight.
+
+        The multipart upload is aborted on any failure, so no orphaned parts are left in the bucket.
+        """
+        upload_id = await self.create_multipart_upload(object_name)
+
+        semaphore = asyncio.Semaphore(self.multipart_concurrency)
+        tasks: list[asyncio.Task] = []
+
+        async def upload_bounded_part(part_number: int, body: bytes) -> dict:
+            try:
+                return await self.upload_part(object_name, upload_id, part_number, body)
+            finally:
+                semaphore.release()
+
+        try:
+            part_number = 1
+            while True:
+                await semaphore.acquire()
+                if any(task.done() and task.exception() for task in tasks):
+                    semaphore.release()
+                    break
+
+                body = await asyncio.to_thread(file_obj.read, self.multipart_chunk_size)
+                if not body:
+                    semaphore.release()
+                    break
+
+                tasks.append(asyncio.create_task(upload_bounded_part(part_number, body)))
+                part_number += 1
+
+            parts = await asyncio.gather(*tasks)
+            await self.complete_multipart_upload(object_name, upload_id, list(parts))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.abort_multipart_upload(object_name, upload_id)
+            raise
+
+    async def upload_part(self, object_name: str, upload_id: str, part_number: int, body: bytes) -> dict:
+        """Uploads single part with retries. Returns part description for `complete_multipart_upload`"""
+        for attempt in range(1, self.multipart_max_attempts + 1):
+            try:
+                response = await self._client.upload_part(
+                    Bucket=self.bucket_name,
+                    Key=object_name,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    Body=body,
+                )
+                return {"ETag": response["ETag"], "PartNumber": part_number}
+            except (BotoCoreError, ClientError):
+                if attempt == self.multipart_max_attempts:
+                    raise
+                await asyncio.sleep(0.5 * 2 ** (attempt - 1))
+
+    @staticmethod
+    async def _iter_body(body, chunk_size: int) -> AsyncIterator[bytes]:
+        try:
+            async for chunk in body.iter_chunks(chunk_size):
+                yield chunk
+        finally:
+            body.close()
+
+    @staticmethod
+    def _remaining_size(file_obj) -> int:
+        position = file_obj.tell()
+        file_obj.seek(0, os.SEEK_END)
+        size = file_obj.tell()
+        file_obj.seek(position)
+        return size - position
+
     @property
     def url(self):
-        return self.config.get("endpoint_url")
+        return self.endpoint_url
+
+
+class CachedS3Repository(AbstractS3Repository):
+    """Serves reads of objects up to `max_object_size` from local disk cache. Everything else goes to `repository`.
+
+    Cached object is trusted for `revalidate_after` seconds, then its ETag is checked with HEAD request.
+    Range reads never wait for the whole object: on miss the range comes from `repository` and the cache is filled
+    in background. Writes through this repository invalidate cached keys right away.
+    """
+
+    def __init__(
+        self,
+        repository: AbstractS3Repository,
+        cache: DiskCache,
+        max_object_size: int = config.STORAGE_CACHE_MAX_OBJECT_SIZE,
+        revalidate_after: float = config.STORAGE_CACHE_REVALIDATE_SECONDS,
+    ):
+        self._repository = repository
+        self._cache = cache
+        self.max_object_size = max_object_size
+        self.revalidate_after = revalidate_after
+
+    async def get_file(self, key: str) -> bytes:
+        entry = await self._cached_entry(key)
+        if entry is not None:
+            try:
+                return await asyncio.to_thread(entry.path.read_bytes)
+            except FileNotFoundError:
+                pass
+        return await self._repository.get_file(key)
+
+    async def stream_file(
+        self, key: str, byte_range: str | None = None, chunk_size: int = config.STREAM_CHUNK_SIZE
+    ) -> FileStream:
+        entry = await self._cached_entry(key, wait=byte_range is None)
+        if entry is not None:
+            try:
+                file_obj = entry.path.open("rb")
+            except FileNotFoundError:
+                entry = None
+        if entry is None:
+            return await self._repository.stream_file(key, byte_range, chunk_size)
+
+        try:
+            start, end = parse_byte_range(byte_range, entry.size) if byte_range else (0, entry.size - 1)
+        except RangeNotSatisfiableError:
+            file_obj.close()
+            raise
+
+        return FileStream(
+            body=self._iter_file(file_obj, start, end, chunk_size),
+            content_length=end - start + 1,
+            content_range=f"bytes {start}-{end}/{entry.size}" if byte_range else None,
+            content_type=entry.content_type,
+            etag=entry.etag,
+            last_modified=entry.last_modified,
+        )
+
+    def iter_objects(self, prefix: str = "", page_size: int = 1000) -> AsyncIterator[StoredObject]:
+        return self._repository.iter_objects(prefix, page_size)
+
+    async def upload_file(self, file_obj, object_name: str) -> str:
+        self._cache.discard(object_name)
+        return await self._repository.upload_file(file_obj, object_name)
+
+    async def delete_file(self, object_name: str):
+        self._cache.discard(object_name)
+        await self._repository.delete_file(object_name)
+
+    async def delete_files(self, keys: list[str]) -> list[str]:
+        for key in keys:
+            self._cache.discard(key)
+        return await self._repository.delete_files(keys)
+
+    async def head_file(self, key: str) -> dict | None:
+        return await self._repository.head_file(key)
+
+    async def generate_upload_url(self, key: str, expires_in: int = config.S3_PRESIGNED_URL_EXPIRES_SECONDS) -> str:
+        self._cache.discard(key)
+        return await self._repository.generate_upload_url(key, expires_in)
+
+    async def create_multipart_upload(self, key: str) -> str:
+        return await self._repository.create_multipart_upload(key)
+
+    async def generate_upload_part_urls(
+        self, key: str, upload_id: str, parts_count: int, expires_in: int = config.S3_PRESIGNED_URL_EXPIRES_SECONDS
+    ) -> list[str]:
+        return await self._repository.generate_upload_part_urls(key, upload_id, parts_count, expires_in)
+
+    async def upload_part(self, object_name: str, upload_id: str, part_number: int, body: bytes) -> dict:
+        return await self._repository.upload_part(object_name, upload_id, part_number, body)
+
+    async def complete_multipart_upload(self, key: str, upload_id: str, parts: list[dict] | None = None) -> bool:
+        self._cache.discard(key)
+        return await self._repository.complete_multipart_upload(key, upload_id, parts)
+
+    async def abort_multipart_upload(self, key: str, upload_id: str):
+        await self._repository.abort_multipart_upload(key, upload_id)
+
+    def object_url(self, key: str) -> str:
+        return self._repository.object_url(key)
+
+    def object_key(self, url: str) -> str:
+        return self._repository.object_key(url)
+
+    async def _cached_entry(self, key: str, wait: bool = True) -> CacheEntry | None:
+        """Returns cached entry with file, filling the cache on miss. None means read from `repository`.
+
+        Without `wait` the cache is filled or revalidated in background and None is returned right away.
+        """
+        entry = self._cache.get(key)
+        if entry is not None and time.monotonic() - entry.validated_at < self.revalidate_after:
+            if entry.path is None:
+                return None
+            self._cache.stats.hits += 1
+            return entry
+
+        if not wait:
+            self._cache.fill_in_background(key, lambda: self._fill(key, entry))
+            return None
+
+        entry = await self._cache.single_flight(key, lambda: self._fill(key, entry))
+        return entry if entry is not None and entry.path is not None else None
+
+    async def _fill(self, key: str, entry: CacheEntry | None) -> CacheEntry | None:
+        stored = await self._repository.head_file(key)
+        if stored is None:
+            self._cache.discard(key)
+            return None
+
+        if entry is not None and entry.etag == stored["etag"]:
+            entry.validated_at = time.monotonic()
+            self._cache.stats.revalidations += 1
+            if entry.path is not None:
+                self._cache.stats.hits += 1
+            return entry
+
+        self._cache.stats.misses += 1
+        new_entry = CacheEntry(path=None, size=stored["size"], etag=stored["etag"], validated_at=time.monotonic())
+        if stored["size"] > min(self.max_object_size, self._cache.max_bytes):
+            return self._cache.remember(key, new_entry)
+
+        stream = await self._repository.stream_file(key)
+        new_entry.etag = stream.etag or new_entry.etag
+        new_entry.content_type = stream.content_type
+        new_entry.last_modified = stream.last_modified
+        return await self._cache.put(key, stream.body, new_entry)
+
+    @staticmethod
+    async def _iter_file(file_obj, start: int, end: int, chunk_size: int) -> AsyncIterator[bytes]:
+        try:
+            file_obj.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await asyncio.to_thread(file_obj.read, min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            file_obj.close()
+
+
+class LocalStorageRepository(AbstractS3Repository):
+    """Keeps objects as files under `root` for single node installs.
+
+    Writes go to a temporary file in the target directory and are moved in place with atomic rename, so readers
+    never see partial files. Streams carry the file path, so responses can send it without copying through Python.
+    Presigned uploads are not possible, clients upload through resumable upload sessions instead.
+    """
+
+    _multipart_dir_name = ".multipart"
+
+    def __init__(self, root: Path, copy_chunk_size: int = config.LOCAL_STORAGE_COPY_CHUNK_SIZE):
+        self.root = root.resolve()
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.copy_chunk_size = copy_chunk_size
+
+    async def get_file(self, key: str) -> bytes:
+        return await asyncio.to_thread(self._path(key).read_bytes)
+
+    async def stream_file(
+        self, key: str, byte_range: str | None = None, chunk_size: int = config.STREAM_CHUNK_SIZE
+    ) -> FileStream:
+        path = self._path(key)
+        stat = await asyncio.to_thread(path.stat)
+        start, end = parse_byte_range(byte_range, stat.st_size) if byte_range else (0, stat.st_size - 1)
+
+        return FileStream(
+            body=self._iter_file(path, start, end - start + 1, chunk_size),
+            content_length=end - start + 1,
+            content_range=f"bytes {start}-{end}/{stat.st_size}" if byte_range else None,
+            content_type=mimetypes.guess_type(key)[0],
+            etag=self._etag(stat),
+            last_modified=datetime.fromtimestamp(stat.st_mtime, UTC),
+            path=path,
+            offset=start,
+        )
+
+    async def iter_objects(self, prefix: str = "", page_size: int = 1000) -> AsyncIterator[StoredObject]:
+        walker = os.walk(self.root)
+        while (entry := await asyncio.to_thread(next, walker, None)) is not None:
+            root, dirs, files = entry
+            dirs[:] = sorted(d for d in dirs if d != self._multipart_dir_name)
+            for name in sorted(files):
+                path = Path(root) / name
+                key = path.relative_to(self.root).as_posix()
+                if not key.startswith(prefix) or name.endswith(".tmp"):
+                    continue
+                stat = path.stat()
+                yield StoredObject(
+                    key=key,
+                    size=stat.st_size,
+                    etag=self._etag(stat),
+                    last_modified=datetime.fromtimestamp(stat.st_mtime, UTC),
+                )
+
+    async def upload_file(self, file_obj, object_name: str) -> str:
+        await asyncio.to_thread(self._write_atomic, self._path(object_name), [file_obj])
+        return self.object_url(object_name)
+
+    async def delete_file(self, object_name: str):
+        self._path(object_name).unlink(missing_ok=True)
+
+    async def delete_files(self, keys: list[str]) -> list[str]:
+        failed = []
+        for key in keys:
+            try:
+                self._path(key).unlink(missing_ok=True)
+            except OSError:
+                failed.append(key)
+        return failed
+
+    async def head_file(self, key: str) -> dict | None:
+        try:
+            stat = self._path(key).stat()
+        except FileNotFoundError:
+            return None
+        return {"size": stat.st_size, "etag": self._etag(stat)}
+
+    async def generate_upload_url(self, key: str, expires_in: int = 0) -> str:
+        raise PresignedUploadsNotSupportedError()
+
+    async def generate_upload_part_urls(self, key: str, upload_id: str, parts_count: int, expires_in: int = 0):
+        raise PresignedUploadsNotSupportedError()
+
+    async def create_multipart_upload(self, key: str) -> str:
+        upload_id = uuid.uuid4().hex
+        self._parts_dir(upload_id).mkdir(parents=True)
+        return upload_id
+
+    async def upload_part(self, object_name: str, upload_id: str, part_number: int, body: bytes) -> dict:
+        part_path = self._parts_dir(upload_id) / str(part_number)
+        await asyncio.to_thread(self._write_atomic, part_path, [io.BytesIO(body)])
+        return {"ETag": self._etag(part_path.stat()), "PartNumber": part_number}
+
+    async def complete_multipart_upload(self, key: str, upload_id: str, parts: list[dict] | None = None) -> bool:
+        parts_dir = self._parts_dir(upload_id)
+        if parts is None:
+            numbers = sorted(int(p.name) for p in parts_dir.iterdir() if p.name.isdigit())
+        else:
+            numbers = [part["PartNumber"] for part in parts]
+        if not numbers:
+            return False
+
+        def concatenate():
+            files = [(parts_dir / str(n)).open("rb") for n in numbers]
+            try:
+                self._write_atomic(self._path(key), files)
+            finally:
+                for f in files:
+                    f.close()
+
+        await asyncio.to_thread(concatenate)
+        shutil.rmtree(parts_dir, ignore_errors=True)
+        return True
+
+    async def abort_multipart_upload(self, key: str, upload_id: str):
+        shutil.rmtree(self._parts_dir(upload_id), ignore_errors=True)
+
+    def object_url(self, key: str) -> str:
+        return f"{self.root.as_uri()}/{key}"
+
+    def object_key(self, url: str) -> str:
+        return url.removeprefix(self.object_url(""))
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if not path.is_relative_to(self.root) or path == self.root:
+            raise StorageError(f"Key '{key}' points outside of storage")
+        return path
+
+    def _parts_dir(self, upload_id: str) -> Path:
+        return self._path(f"{self._multipart_dir_name}/{upload_id}")
+
+    def _write_atomic(self, path: Path, sources: list):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with tmp_path.open("wb") as f:
+                for source in sources:
+                    shutil.copyfileobj(source, f, self.copy_chunk_size)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    @staticmethod
+    async def _iter_file(path: Path, offset: int, length: int, chunk_size: int) -> AsyncIterator[bytes]:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            while length > 0:
+                chunk = await asyncio.to_thread(os.pread, fd, min(chunk_size, length), offset)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                length -= len(chunk)
+                yield chunk
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def _etag(stat: os.stat_result) -> str:
+        return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
@@ -0,0 +1,71 @@
+import asyncio
+import os
+from collections.abc import Mapping
+from pathlib import Path
+
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from src import config
+
+
+class FileRangeResponse(Response):
+    """Sends `length` bytes of local file starting at `offset`.
+
+    Uses ASGI zero-copy extensions when the server advertises them: `http.response.zerocopysend` (sendfile of any
+    range) or `http.response.pathsend` (whole file). Otherwise the file is read in chunks with `os.pread`.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        offset: int,
+        length: int,
+        status_code: int = 200,
+        headers: Mapping[str, str] | None = None,
+        media_type: str | None = None,
+        chunk_size: int = config.STREAM_CHUNK_SIZE,
+    ):
+        self.path = path
+        self.offset = offset
+        self.length = length
+        self.status_code = status_code
+        self.media_type = media_type
+        self.chunk_size = chunk_size
+        self.background = None
+        self.init_headers(headers)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        extensions = scope.get("extensions", {})
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+
+        if scope["method"] == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+        elif "http.response.zerocopysend" in extensions:
+            with self.path.open("rb") as f:
+                await send(
+                    {"type": "http.response.zerocopysend", "file": f, "offset": self.offset, "count": self.length}
+                )
+        elif "http.response.pathsend" in extensions and self.offset == 0 and self._is_whole_file():
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+        else:
+            await self._send_chunks(send)
+
+    async def _send_chunks(self, send: Send):
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            offset, remaining = self.offset, self.length
+            while remaining > 0:
+                chunk = await asyncio.to_thread(os.pread, fd, min(self.chunk_size, remaining), offset)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0 or self.length == 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            os.close(fd)
+
+    def _is_whole_file(self) -> bool:
+        return self.path.stat().st_size == self.length
@@ -0,0 +1,15 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+async def run_periodically(interval: float, func: Callable[..., Awaitable], *args, **kwargs):
+    """Runs background job every `interval` seconds until cancelled. Failures are logged and do not stop the loop."""
+    while True:
+        try:
+            await func(*args, **kwargs)
+        except Exception:
+            logger.exception("Background job %s failed", func.__name__)
+        await asyncio.sleep(interval)
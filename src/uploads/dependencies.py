@@ -3,14 +3,39 @@ from typing import Annotated
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.core import get_session
-from src.repository import S3Repo
-from src.uploads.repository import GamesRepository, VideoRepository
+from src.database.core import get_read_session, get_session
+from src.repository import AbstractS3Repository, S3Repo
+from src.uploads.repository import (
+    GamesRepository,
+    StorageTombstonesRepository,
+    SubtitlesRepository,
+    UploadSessionsRepository,
+    VideoRepository,
+    VocabularyRepository,
+)
 from src.uploads.service import UploadsService
 
 
 async def uploads_service(session: Annotated[AsyncSession, Depends(get_session)], s3_repository: S3Repo):
-    return UploadsService(videos_repo=VideoRepository(session, s3_repository), games_repo=GamesRepository(session))
+    return create_uploads_service(session, s3_repository)
+
+
+async def uploads_read_service(session: Annotated[AsyncSession, Depends(get_read_session)], s3_repository: S3Repo):
+    """Uploads service of read only routes, on the read replica"""
+    return create_uploads_service(session, s3_repository)
+
+
+def create_uploads_service(session: AsyncSession, s3_repository: AbstractS3Repository) -> UploadsService:
+    """Uploads service of routes and background jobs"""
+    return UploadsService(
+        videos_repo=VideoRepository(session, s3_repository),
+        games_repo=GamesRepository(session),
+        upload_sessions_repo=UploadSessionsRepository(session),
+        tombstones_repo=StorageTombstonesRepository(session),
+        subtitles_repo=SubtitlesRepository(session),
+        vocabulary_repo=VocabularyRepository(session),
+    )
 
 
 UploadsServ = Annotated[UploadsService, Depends(uploads_service)]
+UploadsReadServ = Annotated[UploadsService, Depends(uploads_read_service)]
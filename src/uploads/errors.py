@@ -3,3 +3,48 @@
 class VideoAlreadyUploadedError(Exception):
     def __init__(self, name: str):
         super().__init__(f"Видео с названием '{name}' уже загружено")
+
+
+class VideoNotFoundError(Exception):
+    def __init__(self, video_id: int):
+        super().__init__(f"Видео с id={video_id} не найдено")
+
+
+class GameNotFoundError(Exception):
+    def __init__(self, game_id: int):
+        super().__init__(f"Игра с id={game_id} не найдена")
+
+
+class VideoNotUploadedError(Exception):
+    def __init__(self, video_id: int):
+        super().__init__(f"Файл видео с id={video_id} ещё не загружен в хранилище")
+
+
+class UploadSessionNotFoundError(Exception):
+    def __init__(self, upload_id: str):
+        super().__init__(f"Сессия загрузки '{upload_id}' не найдена или истекла")
+
+
+class UploadOffsetMismatchError(Exception):
+    def __init__(self, offset: int):
+        self.offset = offset
+        super().__init__(f"Ожидалось смещение {offset}")
+
+
+class InvalidUploadChunkError(Exception):
+    """Кусок файла не подходит под текущую сессию загрузки."""
+
+
+class UploadLimitExceededError(Exception):
+    def __init__(self, retry_after: int):
+        self.retry_after = retry_after
+        super().__init__(f"Слишком много загрузок одновременно, повторите через {retry_after} с")
+
+
+class InvalidSubtitlesError(Exception):
+    """Файл субтитров не удалось разобрать."""
+
+
+class SubtitlesNotFoundError(Exception):
+    def __init__(self, video_id: int):
+        super().__init__(f"У видео с id={video_id} нет субтитров")
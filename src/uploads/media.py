@@ -0,0 +1,314 @@
+"""Streaming extraction of video metadata from MP4 and WebM/Matroska containers.
+
+Only container headers are read: MP4 boxes are walked by their headers (so `mdat` is skipped no matter
+where `moov` is), WebM elements are read until the first Cluster. Reads go through a single read-ahead
+window, so memory does not depend on file size and ranged storage reads stay few.
+"""
+
+import asyncio
+import os
+import struct
+from abc import ABC, abstractmethod
+from collections.abc import AsyncGenerator
+from dataclasses import asdict, dataclass
+
+from src.repository import AbstractS3Repository
+
+READ_BLOCK_SIZE = 64 * 1024
+MAX_STRING_SIZE = 64
+
+MP4_TRACK_PATH = (b"minf", b"stbl", b"stsd")
+
+EBML_HEADER = 0x1A45DFA3
+EBML_DOC_TYPE = 0x4282
+MKV_SEGMENT = 0x18538067
+MKV_INFO = 0x1549A966
+MKV_TIMECODE_SCALE = 0x2AD7B1
+MKV_DURATION = 0x4489
+MKV_TRACKS = 0x1654AE6B
+MKV_TRACK_ENTRY = 0xAE
+MKV_TRACK_TYPE = 0x83
+MKV_CODEC_ID = 0x86
+MKV_VIDEO = 0xE0
+MKV_PIXEL_WIDTH = 0xB0
+MKV_PIXEL_HEIGHT = 0xBA
+MKV_CLUSTER = 0x1F43B675
+MKV_VIDEO_TRACK_TYPE = 1
+
+
+class MediaParseError(ValueError):
+    """Файл не похож на корректный MP4 или WebM контейнер."""
+
+
+@dataclass
+class VideoMetadata:
+    container: str | None = None
+    codec: str | None = None
+    duration: float | None = None
+    width: int | None = None
+    height: int | None = None
+
+    def dict(self) -> dict:
+        return asdict(self)
+
+
+class MediaReader(ABC):
+    """Random access reader over a file that keeps only one read-ahead window in memory"""
+
+    def __init__(self, size: int, block_size: int = READ_BLOCK_SIZE):
+        self.size = size
+        self.block_size = block_size
+        self.fetches = 0
+        self.bytes_fetched = 0
+
+        self._window_start = 0
+        self._window = b""
+
+    async def read(self, offset: int, length: int) -> bytes:
+        length = max(0, min(length, self.size - offset))
+        if length == 0:
+            return b""
+
+        window_end = self._window_start + len(self._window)
+        if not (self._window_start <= offset and offset + length <= window_end):
+            self._window = await self._fetch(offset, min(max(length, self.block_size), self.size - offset))
+            self._window_start = offset
+            self.fetches += 1
+            self.bytes_fetched += len(self._window)
+
+        start = offset - self._window_start
+        return self._window[start : start + length]
+
+    @abstractmethod
+    async def _fetch(self, offset: int, length: int) -> bytes:
+        raise NotImplementedError
+
+
+class FileMediaReader(MediaReader):
+    """Reads from a local file object, e.g. spooled UploadFile. Does not restore file position."""
+
+    def __init__(self, file_obj, block_size: int = READ_BLOCK_SIZE):
+        self._file = file_obj
+        file_obj.seek(0, os.SEEK_END)
+        super().__init__(file_obj.tell(), block_size)
+
+    async def _fetch(self, offset: int, length: int) -> bytes:
+        return await asyncio.to_thread(self._read_at, offset, length)
+
+    def _read_at(self, offset: int, length: int) -> bytes:
+        self._file.seek(offset)
+        return self._file.read(length)
+
+
+class StorageMediaReader(MediaReader):
+    """Reads stored object with ranged requests"""
+
+    def __init__(self, s3_repository: AbstractS3Repository, key: str, size: int, block_size: int = READ_BLOCK_SIZE):
+        super().__init__(size, block_size)
+        self._s3_repository = s3_repository
+        self._key = key
+
+    async def _fetch(self, offset: int, length: int) -> bytes:
+        stream = await self._s3_repository.stream_file(self._key, f"bytes={offset}-{offset + length - 1}")
+        return b"".join([chunk async for chunk in stream.body])
+
+
+async def probe(reader: MediaReader) -> VideoMetadata:
+    """Extracts metadata from MP4 or WebM. Unknown or broken files give empty metadata."""
+    head = await reader.read(0, 12)
+    try:
+        if head[4:8] == b"ftyp":
+            return await probe_mp4(reader)
+        if head[:4] == EBML_HEADER.to_bytes(4, "big"):
+            return await probe_webm(reader)
+    except (MediaParseError, struct.error, UnicodeDecodeError):
+        pass
+    return VideoMetadata()
+
+
+# MP4
+async def probe_mp4(reader: MediaReader) -> VideoMetadata:
+    moov = await _find_box(reader, 0, reader.size, b"moov")
+    if moov is None:
+        raise MediaParseError("moov box not found")
+
+    metadata = VideoMetadata(container="mp4")
+    async for box_type, start, end in _iter_boxes(reader, *moov):
+        if box_type == b"mvhd":
+            header = await _read_full_box(reader, start, end, 32)
+            if header[0] == 1:
+                timescale, duration = struct.unpack(">IQ", header[20:32])
+            else:
+                timescale, duration = struct.unpack(">II", header[12:20])
+            if timescale:
+                metadata.duration = duration / timescale
+        elif box_type == b"trak" and metadata.codec is None:
+            await _parse_mp4_video_track(reader, start, end, metadata)
+
+    return metadata
+
+
+async def _parse_mp4_video_track(reader: MediaReader, start: int, end: int, metadata: VideoMetadata):
+    mdia = await _find_box(reader, start, end, b"mdia")
+    if mdia is None:
+        return
+
+    hdlr = await _find_box(reader, *mdia, b"hdlr")
+    if hdlr is None or await reader.read(hdlr[0] + 8, 4) != b"vide":
+        return
+
+    stsd = mdia
+    for box_type in MP4_TRACK_PATH:
+        stsd = await _find_box(reader, *stsd, box_type)
+        if stsd is None:
+            return
+    metadata.codec = (await reader.read(stsd[0] + 12, 4)).decode("latin-1")
+
+    tkhd = await _find_box(reader, start, end, b"tkhd")
+    if tkhd is not None:
+        header = await _read_full_box(reader, *tkhd, 92)
+        offset = 88 if header[0] == 1 else 76
+        width, height = struct.unpack(">II", header[offset : offset + 8])
+        metadata.width, metadata.height = width >> 16, height >> 16
+
+
+async def _read_full_box(reader: MediaReader, start: int, end: int, length: int) -> bytes:
+    """Up to `length` bytes of full box payload, which starts with version byte. Raises MediaParseError if it is empty"""
+    payload = await reader.read(start, min(length, end - start))
+    if not payload:
+        raise MediaParseError(f"Empty box at {start}")
+    return payload
+
+
+async def _find_box(reader: MediaReader, start: int, end: int, box_type: bytes) -> tuple[int, int] | None:
+    async for current_type, payload_start, box_end in _iter_boxes(reader, start, end):
+        if current_type == box_type:
+            return payload_start, box_end
+    return None
+
+
+async def _iter_boxes(reader: MediaReader, start: int, end: int) -> AsyncGenerator[tuple[bytes, int, int], None]:
+    """Yields (type, payload start, box end) of boxes between `start` and `end` reading only their headers"""
+    offset = start
+    while offset + 8 <= end:
+        header = await reader.read(offset, 16)
+        size, box_type = struct.unpack(">I4s", header[:8])
+        header_size = 8
+        if size == 1:
+            size = struct.unpack(">Q", header[8:16])[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+
+        if size < header_size or offset + size > end:
+            raise MediaParseError(f"Broken {box_type!r} box at {offset}")
+
+        yield box_type, offset + header_size, offset + size
+        offset += size
+
+
+# WebM / Matroska
+async def probe_webm(reader: MediaReader) -> VideoMetadata:
+    metadata = VideoMetadata()
+    async for element_id, start, end in _iter_elements(reader, 0, reader.size):
+        if element_id == EBML_HEADER:
+            async for child_id, child_start, child_end in _iter_elements(reader, start, end):
+                if child_id == EBML_DOC_TYPE:
+                    metadata.container = await _read_string(reader, child_start, child_end)
+        elif element_id == MKV_SEGMENT:
+            await _parse_segment(reader, start, end, metadata)
+            break
+
+    if metadata.container is None:
+        raise MediaParseError("EBML DocType not found")
+    return metadata
+
+
+async def _parse_segment(reader: MediaReader, start: int, end: int, metadata: VideoMetadata):
+    timecode_scale = 1_000_000
+    duration = None
+
+    async for element_id, element_start, element_end in _iter_elements(reader, start, end):
+        if element_id == MKV_INFO:
+            async for child_id, child_start, child_end in _iter_elements(reader, element_start, element_end):
+                if child_id == MKV_TIMECODE_SCALE:
+                    timecode_scale = await _read_uint(reader, child_start, child_end)
+                elif child_id == MKV_DURATION:
+                    duration = await _read_float(reader, child_start, child_end)
+        elif element_id == MKV_TRACKS:
+            async for child_id, child_start, child_end in _iter_elements(reader, element_start, element_end):
+                if child_id == MKV_TRACK_ENTRY and metadata.codec is None:
+                    await _parse_webm_track(reader, child_start, child_end, metadata)
+        elif element_id == MKV_CLUSTER:
+            break
+
+    if duration is not None:
+        metadata.duration = duration * timecode_scale / 1_000_000_000
+
+
+async def _parse_webm_track(reader: MediaReader, start: int, end: int, metadata: VideoMetadata):
+    track = {}
+    async for element_id, element_start, element_end in _iter_elements(reader, start, end):
+        if element_id == MKV_TRACK_TYPE:
+            track["type"] = await _read_uint(reader, element_start, element_end)
+        elif element_id == MKV_CODEC_ID:
+            track["codec"] = await _read_string(reader, element_start, element_end)
+        elif element_id == MKV_VIDEO:
+            async for child_id, child_start, child_end in _iter_elements(reader, element_start, element_end):
+                if child_id == MKV_PIXEL_WIDTH:
+                    track["width"] = await _read_uint(reader, child_start, child_end)
+                elif child_id == MKV_PIXEL_HEIGHT:
+                    track["height"] = await _read_uint(reader, child_start, child_end)
+
+    if track.get("type") == MKV_VIDEO_TRACK_TYPE:
+        metadata.codec = track.get("codec")
+        metadata.width = track.get("width")
+        metadata.height = track.get("height")
+
+
+async def _iter_elements(reader: MediaReader, start: int, end: int) -> AsyncGenerator[tuple[int, int, int], None]:
+    """Yields (id, data start, data end) of EBML elements. Element of unknown size spans till `end`"""
+    offset = start
+    while offset < end:
+        element_id, id_length = await _read_vint(reader, offset, keep_marker=True)
+        size, size_length = await _read_vint(reader, offset + id_length, keep_marker=False)
+        data_start = offset + id_length + size_length
+
+        if size is None:
+            yield element_id, data_start, end
+            return
+
+        yield element_id, data_start, min(data_start + size, end)
+        offset = data_start + size
+
+
+async def _read_vint(reader: MediaReader, offset: int, keep_marker: bool) -> tuple[int | None, int]:
+    first = await reader.read(offset, 1)
+    if not first or first[0] == 0:
+        raise MediaParseError(f"Broken EBML variable size integer at {offset}")
+
+    length = 9 - first[0].bit_length()
+    data = await reader.read(offset, length)
+    if len(data) < length:
+        raise MediaParseError(f"Truncated EBML variable size integer at {offset}")
+
+    value = int.from_bytes(data, "big")
+    if keep_marker:
+        return value, length
+
+    value &= (1 << (7 * length)) - 1
+    return (None if value == (1 << (7 * length)) - 1 else value), length
+
+
+async def _read_uint(reader: MediaReader, start: int, end: int) -> int:
+    return int.from_bytes(await reader.read(start, min(end - start, 8)), "big")
+
+
+async def _read_float(reader: MediaReader, start: int, end: int) -> float:
+    data = await reader.read(start, end - start)
+    return struct.unpack(">f" if len(data) == 4 else ">d", data)[0]
+
+
+async def _read_string(reader: MediaReader, start: int, end: int) -> str:
+    data = await reader.read(start, min(end - start, MAX_STRING_SIZE))
+    return data.rstrip(b"\x00").decode("utf-8")
@@ -1,7 +1,23 @@
+from datetime import datetime
+from enum import StrEnum
 from typing import TYPE_CHECKING
 
-from sqlalchemy import ForeignKey
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import (
+    DDL,
+    JSON,
+    BigInteger,
+    DateTime,
+    ForeignKey,
+    Index,
+    LargeBinary,
+    UniqueConstraint,
+    column,
+    event,
+    func,
+    select,
+    table,
+)
+from sqlalchemy.orm import Mapped, column_property, mapped_column, relationship
 
 from src.database.core import Base
 from src.models import PrimaryKey
@@ -10,26 +26,151 @@ if TYPE_CHECKING:
     from src.users.models import LingoplayUsers
 
 
+class VideoStatus(StrEnum):
+    PENDING = "pending"
+    UPLOADED = "uploaded"
+
+
 class Games(Base):
+    __table_args__ = (
+        Index("ix_games_title_id", "title", "id"),
+        # Title search on PostgreSQL, SQLite searches games_fts table instead
+        Index(
+            "ix_games_title_trgm",
+            "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
+
     id: Mapped[PrimaryKey]
     title: Mapped[str] = mapped_column()
+    # Kept by VideoRepository in the same transaction as videos, checked by `reconcile_video_counts` job
+    videos_count: Mapped[int] = mapped_column(default=0, server_default="0")
 
     videos: Mapped[list["Videos"]] = relationship(back_populates="game")
     users: Mapped[list["LingoplayUsers"]] = relationship(back_populates="games", secondary="lingoplay_users_games")
 
 
+# SQLite full text index of game titles kept in sync by triggers. Trigram tokenizer matches any substring of three
+# characters or longer, case insensitive
+GAMES_FTS_DDL = [
+    (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS games_fts USING fts5("
+        "title, content='games', content_rowid='id', tokenize='trigram')"
+    ),
+    (
+        "CREATE TRIGGER games_fts_insert AFTER INSERT ON games BEGIN "
+        "INSERT INTO games_fts(rowid, title) VALUES (new.id, new.title); END"
+    ),
+    (
+        "CREATE TRIGGER games_fts_delete AFTER DELETE ON games BEGIN "
+        "INSERT INTO games_fts(games_fts, rowid, title) VALUES ('delete', old.id, old.title); END"
+    ),
+    (
+        "CREATE TRIGGER games_fts_update AFTER UPDATE OF title ON games BEGIN "
+        "INSERT INTO games_fts(games_fts, rowid, title) VALUES ('delete', old.id, old.title); "
+        "INSERT INTO games_fts(rowid, title) VALUES (new.id, new.title); END"
+    ),
+]
+games_fts = table("games_fts", column("rowid"), column("games_fts"), column("rank"))
+
+for statement in GAMES_FTS_DDL:
+    event.listen(Games.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(Games.__table__, "before_drop", DDL("DROP TABLE IF EXISTS games_fts").execute_if(dialect="sqlite"))
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"))
+
+
 class LingoplayUsersGames(Base):
     user_id: Mapped[int] = mapped_column(ForeignKey("lingoplay_users.id", ondelete="CASCADE"), primary_key=True)
     game_id: Mapped[int] = mapped_column(ForeignKey("games.id", ondelete="CASCADE"), primary_key=True)
 
 
 class Videos(Base):
+    # Pages of user videos are read in id order
+    __table_args__ = (Index("ix_videos_user_id_id", "user_id", "id"),)
+
     id: Mapped[PrimaryKey]
     title: Mapped[str] = mapped_column(index=True)
-    path: Mapped[str] = mapped_column(unique=True)
+    key: Mapped[str] = mapped_column(unique=True, index=True)
+    status: Mapped[str] = mapped_column(default=VideoStatus.UPLOADED.value, server_default=VideoStatus.UPLOADED.value)
+    upload_id: Mapped[str | None] = mapped_column()
+
+    size: Mapped[int | None] = mapped_column(BigInteger)
+    container: Mapped[str | None] = mapped_column()
+    codec: Mapped[str | None] = mapped_column()
+    duration: Mapped[float | None] = mapped_column()
+    width: Mapped[int | None] = mapped_column()
+    height: Mapped[int | None] = mapped_column()
 
     user_id: Mapped[int] = mapped_column(ForeignKey("lingoplay_users.id", ondelete="CASCADE"), nullable=False)
     user: Mapped["LingoplayUsers"] = relationship(back_populates="videos")
 
     game_id: Mapped[int | None] = mapped_column(ForeignKey("games.id", ondelete="SET NULL"))
     game: Mapped[Games] = relationship(back_populates="videos")
+
+    blob_id: Mapped[int | None] = mapped_column(ForeignKey("video_blobs.id"))
+    blob: Mapped["VideoBlobs | None"] = relationship(lazy="joined")
+
+
+class VideoBlobs(Base):
+    """Content addressed stored file, shared by all videos with the same content"""
+
+    id: Mapped[PrimaryKey]
+    sha256: Mapped[str] = mapped_column(unique=True, index=True)
+    key: Mapped[str] = mapped_column(unique=True)
+    size: Mapped[int] = mapped_column(BigInteger)
+    ref_count: Mapped[int] = mapped_column(default=1)
+
+
+# Key the file of a video is stored under, the blob's for deduplicated uploads. Read by list pages only
+Videos.storage_key = column_property(
+    func.coalesce(select(VideoBlobs.key).where(VideoBlobs.id == Videos.blob_id).scalar_subquery(), Videos.key),
+    deferred=True,
+)
+
+
+class UploadSessions(Base):
+    id: Mapped[str] = mapped_column(primary_key=True)
+    size: Mapped[int] = mapped_column(BigInteger)
+    offset: Mapped[int] = mapped_column(BigInteger, default=0)
+    parts: Mapped[list[dict]] = mapped_column(JSON, default=list)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("lingoplay_users.id", ondelete="CASCADE"), nullable=False)
+    video_id: Mapped[int] = mapped_column(ForeignKey("videos.id", ondelete="CASCADE"), nullable=False)
+
+
+class Subtitles(Base):
+    """Subtitle track of video. Cues are stored only as serialized `CueIndex`, the source file is not kept"""
+
+    __table_args__ = (UniqueConstraint("video_id", "language"),)
+
+    id: Mapped[PrimaryKey]
+    language: Mapped[str] = mapped_column()
+    cues_count: Mapped[int] = mapped_column()
+    cue_index: Mapped[bytes] = mapped_column(LargeBinary, deferred=True)
+
+    video_id: Mapped[int] = mapped_column(ForeignKey("videos.id", ondelete="CASCADE"), index=True)
+
+
+class VocabularyPostings(Base):
+    """Postings of one token in one subtitle track, see `src.uploads.vocabulary` for encoding"""
+
+    __table_args__ = (Index("ix_vocabulary_postings_user_id_token", "user_id", "token", "video_id", "subtitles_id"),)
+
+    id: Mapped[PrimaryKey]
+    token: Mapped[str] = mapped_column()
+    postings: Mapped[bytes] = mapped_column(LargeBinary)
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("lingoplay_users.id", ondelete="CASCADE"))
+    video_id: Mapped[int] = mapped_column(ForeignKey("videos.id", ondelete="CASCADE"))
+    subtitles_id: Mapped[int] = mapped_column(ForeignKey("subtitles.id", ondelete="CASCADE"), index=True)
+
+
+class StorageTombstones(Base):
+    """Key of stored file that is no longer referenced and waits to be deleted from storage"""
+
+    id: Mapped[PrimaryKey]
+    key: Mapped[str] = mapped_column(index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
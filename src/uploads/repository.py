@@ -1,66 +1,428 @@
+import asyncio
+import hashlib
+import os
+import uuid
+from collections import Counter
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+from datetime import UTC, datetime
 from pathlib import Path
 
-from sqlalchemy import exists, select
+from sqlalchemy import bindparam, delete, exists, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
-from src.errors import AlreadyExistsError
-from src.repository import AbstractS3Repository, AlchemyRepository
-from src.uploads.models import Games, Videos
-from src.uploads.schemas import GameCreate, VideoCreate
+from src import config
+from src.errors import AlreadyExistsError, RecordNotFound, StorageError
+from src.repository import (
+    AbstractS3Repository,
+    AlchemyRepository,
+    FileStream,
+    Page,
+    cached_query,
+    invalidate_cached,
+    query_cache,
+)
+from src.uploads.media import FileMediaReader, StorageMediaReader, probe
+from src.uploads.models import (
+    Games,
+    StorageTombstones,
+    Subtitles,
+    UploadSessions,
+    VideoBlobs,
+    Videos,
+    VideoStatus,
+    VocabularyPostings,
+    games_fts,
+)
+from src.uploads.schemas import GameCreate, VideoCreate, VideoReserve
 from src.users.models import LingoplayUsers
 
+HASH_CHUNK_SIZE = 1024 * 1024
+TRIGRAM_LENGTH = 3
+VOCABULARY_FETCH_SIZE = 500
+
+
+@dataclass(slots=True)
+class VideoRow:
+    """Columns of a video in list pages, without upload state. `storage_key` is the key its file is stored under"""
+
+    id: int
+    user_id: int
+    game_id: int | None
+    key: str
+    title: str
+    status: str
+    size: int | None
+    container: str | None
+    codec: str | None
+    duration: float | None
+    width: int | None
+    height: int | None
+    storage_key: str
+
+
+@dataclass(slots=True)
+class GameRow:
+    """Columns of a game in list pages, without users"""
+
+    id: int
+    title: str
+    videos_count: int
+
+
+class HashingReader:
+    """File object that computes SHA-256 of the bytes read through it, so an upload hashes the file in the same pass.
+
+    Bytes read again after seeking back are hashed once. `hexdigest` reads whatever the reader skipped.
+    """
+
+    def __init__(self, file_obj):
+        self._file = file_obj
+        self._digest = hashlib.sha256()
+        self._hashed = 0
+
+    def __getattr__(self, name: str):
+        return getattr(self._file, name)
+
+    def read(self, size: int = -1) -> bytes:
+        position = self._file.tell()
+        data = self._file.read(size)
+        if position <= self._hashed < position + len(data):
+            self._digest.update(data[self._hashed - position :])
+            self._hashed = position + len(data)
+        return data
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def hexdigest(self) -> str:
+        self._file.seek(self._hashed)
+        while self.read(HASH_CHUNK_SIZE):
+            pass
+        return self._digest.hexdigest()
+
 
 class VideoRepository(AlchemyRepository):
     model = Videos
+    list_row = VideoRow
     _dir_name = "videos"
+    _blobs_dir_name = "blobs"
 
     def __init__(self, session: AsyncSession, s3_repository: AbstractS3Repository):
         super().__init__(session)
         self._s3_repository = s3_repository
 
     async def create_one(self, data: VideoCreate) -> Videos:
-        path = f"{data.user_id}/{self._dir_name}/{data.title}/{data.title}{Path(data.file.filename).suffix}"
+        key = self._object_key(data.user_id, data.title, data.file.filename)
+
+        if await self.exists(key=key):
+            raise AlreadyExistsError(self.model.__tablename__, "key", key)
 
-        if await self.exists(path=path):
-            raise AlreadyExistsError(self.model.__tablename__, "path", path)
+        if not await self._game_exists(data.game_id):
+            raise RecordNotFound(Games.__tablename__)
 
-        url = await self._s3_repository.upload_file(data.file.file, path)
+        reader = FileMediaReader(data.file.file)
+        metadata = await probe(reader)
+        data.file.file.seek(0)
+
+        # Content is hashed while it is uploaded, so the blob gets a fresh key. A duplicate is dropped afterwards
+        file_obj = HashingReader(data.file.file)
+        blob_key = self._blob_key(uuid.uuid4().hex)
+        if await self._s3_repository.upload_file(file_obj, blob_key) is None:
+            raise StorageError(f"Failed to upload '{blob_key}'")
 
         async with self._session as session:
-            result = await session.execute(select(Games).where(Games.id == data.game_id))
-            game = result.scalars().one()
+            try:
+                sha256 = await asyncio.to_thread(file_obj.hexdigest)
+                blob = await self._link_blob(session, sha256, blob_key, reader.size)
+                if blob.key != blob_key:
+                    session.add(StorageTombstones(key=blob_key))
+
+                video = Videos(
+                    user_id=data.user_id,
+                    key=key,
+                    title=data.title,
+                    game_id=data.game_id,
+                    blob=blob,
+                    size=reader.size,
+                    **metadata.dict(),
+                )
+                session.add(video)
+                await self._change_video_counts(session, [(data.user_id, data.game_id)], 1)
+                await session.commit()
+            except BaseException:
+                # Nothing references the uploaded file
+                await self._s3_repository.delete_file(blob_key)
+                raise
+            await invalidate_cached(Games, LingoplayUsers)
+            await session.refresh(video)
+            return video
+
+    async def reserve_one(self, data: VideoReserve, multipart: bool = False) -> Videos:
+        """Creates pending video whose file will be uploaded by the client directly to storage"""
+        key = self._object_key(data.user_id, data.title, data.filename)
+
+        if await self.exists(key=key):
+            raise AlreadyExistsError(self.model.__tablename__, "key", key)
 
-            video = Videos(user_id=data.user_id, path=url, title=data.title, game=game)
+        await self._revive_key(key)
+        upload_id = await self._s3_repository.create_multipart_upload(key) if multipart else None
+
+        async with self._session as session:
+            video = Videos(
+                user_id=data.user_id,
+                key=key,
+                title=data.title,
+                game_id=data.game_id,
+                status=VideoStatus.PENDING.value,
+                upload_id=upload_id,
+            )
             session.add(video)
+            await self._change_video_counts(session, [(data.user_id, data.game_id)], 1)
             await session.commit()
+            await invalidate_cached(Games, LingoplayUsers)
             await session.refresh(video)
             return video
 
-    async def exists(self, path: str):
+    def object_url(self, video: Videos | VideoRow) -> str:
+        return self._s3_repository.object_url(self._storage_key(video))
+
+    async def get_upload_url(self, video: Videos) -> str:
+        return await self._s3_repository.generate_upload_url(video.key)
+
+    async def get_upload_part_urls(self, video: Videos, parts_count: int) -> list[str]:
+        return await self._s3_repository.generate_upload_part_urls(video.key, video.upload_id, parts_count)
+
+    async def stream_file(self, video: Videos, byte_range: str | None = None) -> FileStream:
+        return await self._s3_repository.stream_file(self._storage_key(video), byte_range)
+
+    async def upload_part(self, video: Videos, part_number: int, body: bytes) -> dict:
+        return await self._s3_repository.upload_part(video.key, video.upload_id, part_number, body)
+
+    async def complete_one(self, video: Videos, parts: list[dict] | None = None) -> Videos | None:
+        """Checks that the file reached storage and marks video as uploaded. Returns None if it did not."""
+        key = video.key
+
+        if video.upload_id is not None and not await self._s3_repository.complete_multipart_upload(
+            key, video.upload_id, parts
+        ):
+            return None
+
+        stored = await self._s3_repository.head_file(key)
+        if stored is None:
+            return None
+
+        metadata = await probe(StorageMediaReader(self._s3_repository, key, stored["size"]))
+
+        async with self._session as session:
+            stmt = (
+                update(Videos)
+                .where(Videos.id == video.id)
+                .values(status=VideoStatus.UPLOADED.value, upload_id=None, size=stored["size"], **metadata.dict())
+                .returning(Videos)
+            )
+            result = await session.execute(stmt)
+            await session.commit()
+            return result.scalar_one()
+
+    async def discard_one(self, video: Videos):
+        """Deletes video that never finished uploading together with its unfinished multipart upload"""
+        if video.upload_id is not None:
+            await self._s3_repository.abort_multipart_upload(video.key, video.upload_id)
+        async with self._session as session:
+            result = await session.execute(delete(Videos).where(Videos.id == video.id))
+            if result.rowcount:
+                await self._change_video_counts(session, [(video.user_id, video.game_id)], -1)
+            await session.commit()
+        await invalidate_cached(Games, LingoplayUsers)
+
+    async def delete_for_user(self, user_id: int, video_id: int | None = None) -> int:
+        """Deletes all (or one) videos of user and tombstones stored files that are no longer referenced.
+
+        Files themselves are deleted from storage later in batches by `purge_deleted_files` job.
+        """
+        conditions = [Videos.user_id == user_id]
+        if video_id is not None:
+            conditions.append(Videos.id == video_id)
+
+        async with self._session as session:
+            result = await session.execute(select(Videos).where(*conditions))
+            videos = result.scalars().all()
+            if not videos:
+                return 0
+
+            keys = [v.key for v in videos if v.blob_id is None]
+            await self._release_blobs(session, Counter(v.blob_id for v in videos if v.blob_id is not None))
+
+            user_videos = select(Videos.id).where(*conditions)
+            await session.execute(delete(UploadSessions).where(UploadSessions.video_id.in_(user_videos)))
+            await session.execute(delete(VocabularyPostings).where(VocabularyPostings.video_id.in_(user_videos)))
+            await session.execute(delete(Subtitles).where(Subtitles.video_id.in_(user_videos)))
+            await session.execute(delete(Videos).where(*conditions))
+            await self._change_video_counts(session, [(v.user_id, v.game_id) for v in videos], -1)
+            result = await session.execute(delete(VideoBlobs).where(VideoBlobs.ref_count <= 0).returning(VideoBlobs.key))
+            keys.extend(result.scalars().all())
+
+            if keys:
+                await session.execute(insert(StorageTombstones), [{"key": key} for key in keys])
+            await session.commit()
+        await invalidate_cached(Games, LingoplayUsers)
+
+        for video in videos:
+            if video.upload_id is not None:
+                await self._s3_repository.abort_multipart_upload(video.key, video.upload_id)
+        return len(videos)
+
+    async def reconcile_video_counts(self, batch_size: int = config.VIDEO_COUNTS_RECONCILE_BATCH_SIZE) -> int:
+        """Recounts videos of games and users and fixes counters that drifted, returns how many were fixed.
+
+        Rows are locked batch by batch before counting, so a video written meanwhile either waits for the batch or is
+        already committed and counted, and the counter it changes is never overwritten with a stale count
+        """
+        fixed = 0
+        for model, owner_id in ((Games, Videos.game_id), (LingoplayUsers, Videos.user_id)):
+            actual = select(func.count(Videos.id)).where(owner_id == model.id).scalar_subquery()
+            after_id = 0
+            while True:
+                async with self._session as session:
+                    batch = select(model.id).where(model.id > after_id).order_by(model.id).limit(batch_size)
+                    ids = (await session.scalars(batch.with_for_update())).all()
+                    if not ids:
+                        break
+                    stmt = update(model).where(model.id.in_(ids), model.videos_count != actual)
+                    result = await session.execute(stmt.values(videos_count=actual))
+                    await session.commit()
+                fixed += result.rowcount
+                after_id = ids[-1]
+
+        if fixed:
+            await invalidate_cached(Games, LingoplayUsers)
+        return fixed
+
+    async def delete_stored_files(self, keys: list[str]) -> list[str]:
+        """Returns keys that could not be deleted"""
+        return await self._s3_repository.delete_files(keys)
+
+    async def live_keys(self, keys: list[str]) -> set[str]:
+        """Keys among `keys` that were written again after being tombstoned"""
+        async with self._session as session:
+            blob_keys = await session.execute(select(VideoBlobs.key).where(VideoBlobs.key.in_(keys)))
+            video_keys = await session.execute(select(Videos.key).where(Videos.key.in_(keys)))
+            return set(blob_keys.scalars().all()) | set(video_keys.scalars().all())
+
+    async def exists(self, key: str):
         async with self._session as session:
-            stmt = select(exists().where(Videos.path.like(f"%{path}")))
+            stmt = select(exists().where(Videos.key == key))
             result = await session.execute(stmt)
             return result.scalar()
 
+    async def _revive_key(self, key: str):
+        """Cancels pending deletion of the key that is about to be written again"""
+        async with self._session as session:
+            await session.execute(delete(StorageTombstones).where(StorageTombstones.key == key))
+            await session.commit()
+
+    @staticmethod
+    async def _change_video_counts(session: AsyncSession, videos: list[tuple[int, int | None]], delta: int):
+        """Adds `delta` to video counters of the user and the game of every (user_id, game_id) pair.
+
+        Counters are updated in id order, so concurrent transactions lock the rows in the same order
+        """
+        for model, ids in ((LingoplayUsers, [u for u, _ in videos]), (Games, [g for _, g in videos if g is not None])):
+            if not ids:
+                continue
+            table = model.__table__
+            stmt = (
+                update(table)
+                .where(table.c.id == bindparam("row_id"))
+                .values(videos_count=table.c.videos_count + bindparam("delta"))
+            )
+            counts = sorted(Counter(ids).items())
+            await session.execute(stmt, [{"row_id": row_id, "delta": n * delta} for row_id, n in counts])
+
+    @staticmethod
+    async def _release_blobs(session: AsyncSession, released: Counter):
+        if not released:
+            return
+        blobs = VideoBlobs.__table__
+        stmt = (
+            update(blobs)
+            .where(blobs.c.id == bindparam("blob_id"))
+            .values(ref_count=blobs.c.ref_count - bindparam("released"))
+        )
+        await session.execute(stmt, [{"blob_id": blob_id, "released": n} for blob_id, n in released.items()])
+
+    async def _game_exists(self, game_id: int) -> bool:
+        async with self._session as session:
+            result = await session.execute(select(exists().where(Games.id == game_id)))
+            return result.scalar()
+
+    async def _link_blob(self, session: AsyncSession, sha256: str, key: str, size: int) -> VideoBlobs:
+        """Takes reference to existing blob with the same content or registers just uploaded one"""
+        increment = (
+            update(VideoBlobs)
+            .where(VideoBlobs.sha256 == sha256)
+            .values(ref_count=VideoBlobs.ref_count + 1)
+            .returning(VideoBlobs)
+        )
+        blob = (await session.execute(increment)).scalars().first()
+        if blob is not None:
+            return blob
+
+        try:
+            async with session.begin_nested():
+                blob = VideoBlobs(sha256=sha256, key=key, size=size, ref_count=1)
+                session.add(blob)
+            return blob
+        except IntegrityError:
+            # Same content was registered by concurrent upload
+            return (await session.execute(increment)).scalars().one()
+
+    def _storage_key(self, video: Videos | VideoRow) -> str:
+        if isinstance(video, VideoRow):
+            return video.storage_key
+        if video.blob_id is not None:
+            return video.blob.key
+        return video.key
+
+    def _object_key(self, user_id: int, title: str, filename: str) -> str:
+        return f"{user_id}/{self._dir_name}/{title}/{title}{Path(filename).suffix}"
+
+    def _blob_key(self, name: str) -> str:
+        return f"{self._blobs_dir_name}/{name[:2]}/{name}"
+
 
 class GamesRepository(AlchemyRepository):
     model = Games
+    cache = query_cache
+    # Games may be read with their users
+    cache_depends_on = (LingoplayUsers,)
+    list_row = GameRow
 
     async def create_one(self, user: LingoplayUsers, game_data: GameCreate):
         game = Games(title=game_data.title)
         game.users.append(user)
         return await super().create_one(game)
 
+    @cached_query
     async def filter(
         self,
         user_id: int | None = None,
         title: str | None = None,
         id: int | None = None,
         first: bool = False,
+        limit: int | None = None,
+        load_users: bool = False,
     ) -> list[Games] | Games | None:
         async with self._session as session:
-            query = select(self.model).options(selectinload(Games.users))
+            query = select(self.model)
+            if load_users:
+                query = query.options(selectinload(Games.users))
 
             if user_id is not None:
                 query = query.join(Games.users).where(LingoplayUsers.id == user_id)
@@ -69,9 +431,212 @@ class GamesRepository(AlchemyRepository):
                 query = query.where(Games.id == id)
 
             if title is not None:
-                query = query.where(Games.title.ilike(f"%{title}%"))
+                query = self._search(session, query, title, scoped=user_id is not None)
+
+            if limit is not None:
+                query = query.limit(limit)
 
             result = await session.execute(query)
             scalars = result.scalars()
 
             return scalars.first() if first else scalars.all()
+
+    @cached_query
+    async def filter_page(
+        self, limit: int, cursor: str | None = None, user_id: int | None = None, title: str | None = None
+    ) -> Page:
+        """GameRow of games ordered by title. Search by `title` gives a single page of the `limit` most relevant
+        games
+        """
+        async with self._session as session:
+            query = self._list_query()
+            if user_id is not None:
+                query = query.join(Games.users).where(LingoplayUsers.id == user_id)
+            if title is None:
+                return await self._paginate(session, query, limit, cursor, order_by="title")
+
+            result = await session.execute(self._search(session, query, title, user_id is not None).limit(limit))
+            return Page(items=self._list_rows(result))
+
+    @staticmethod
+    def _search(session: AsyncSession, query, title: str, scoped: bool = False):
+        """Restricts query to games with `title` in their title, most relevant first.
+
+        Catalog search uses trigram GIN index and similarity ranking on PostgreSQL, games_fts table and bm25 on
+        SQLite. Only the first GAMES_SEARCH_MAX_CANDIDATES matches are ranked, so a frequent word costs about as much
+        as a rare one. Search `scoped` to a user's few games scans them, as do SQLite queries shorter than a trigram
+        """
+        contains = Games.title.icontains(title, autoescape=True)
+        dialect = session.bind.dialect.name
+        if dialect == "postgresql":
+            if not scoped:
+                candidates = select(Games.id).where(contains).limit(config.GAMES_SEARCH_MAX_CANDIDATES)
+                query = query.where(Games.id.in_(candidates))
+            return query.where(contains).order_by(func.similarity(Games.title, title).desc(), Games.id)
+
+        if dialect == "sqlite" and not scoped and len(title) >= TRIGRAM_LENGTH:
+            phrase = '"{}"'.format(title.replace('"', '""'))
+            candidates = (
+                select(games_fts.c.rowid, games_fts.c.rank)
+                .where(games_fts.c.games_fts.op("MATCH")(phrase))
+                .limit(config.GAMES_SEARCH_MAX_CANDIDATES)
+                .subquery()
+            )
+            return query.join(candidates, candidates.c.rowid == Games.id).order_by(candidates.c.rank, Games.id)
+        return query.where(contains).order_by(Games.title, Games.id)
+
+
+class UploadSessionsRepository(AlchemyRepository):
+    model = UploadSessions
+
+    async def get_active(self, id: str, user_id: int) -> UploadSessions | None:
+        async with self._session as session:
+            stmt = select(UploadSessions).where(
+                UploadSessions.id == id,
+                UploadSessions.user_id == user_id,
+                UploadSessions.expires_at > datetime.now(UTC),
+            )
+            result = await session.execute(stmt)
+            return result.scalars().first()
+
+    async def get_expired(self) -> list[UploadSessions]:
+        async with self._session as session:
+            stmt = select(UploadSessions).where(UploadSessions.expires_at <= datetime.now(UTC))
+            result = await session.execute(stmt)
+            return result.scalars().all()
+
+    async def advance(
+        self, upload_session: UploadSessions, offset: int, parts: list[dict], expires_at: datetime
+    ) -> UploadSessions | None:
+        """Moves session to new offset. Returns None if another request has already moved it"""
+        async with self._session as session:
+            stmt = (
+                update(UploadSessions)
+                .where(UploadSessions.id == upload_session.id, UploadSessions.offset == upload_session.offset)
+                .values(offset=offset, parts=parts, expires_at=expires_at)
+                .returning(UploadSessions)
+            )
+            result = await session.execute(stmt)
+            await session.commit()
+            return result.scalars().first()
+
+
+class SubtitlesRepository(AlchemyRepository):
+    model = Subtitles
+
+    async def replace(
+        self,
+        user_id: int,
+        video_id: int,
+        language: str,
+        cues_count: int,
+        cue_index: bytes,
+        postings: dict[str, bytes],
+    ) -> Subtitles:
+        """Saves track of video in language with its vocabulary postings, replacing previous track.
+
+        New track always gets new id.
+        """
+        async with self._session as session:
+            previous = select(Subtitles.id).where(Subtitles.video_id == video_id, Subtitles.language == language)
+            await session.execute(delete(VocabularyPostings).where(VocabularyPostings.subtitles_id.in_(previous)))
+            await session.execute(delete(Subtitles).where(Subtitles.id.in_(previous)))
+
+            track = Subtitles(video_id=video_id, language=language, cues_count=cues_count, cue_index=cue_index)
+            session.add(track)
+            await session.flush()
+            if postings:
+                rows = [
+                    {"user_id": user_id, "video_id": video_id, "subtitles_id": track.id, "token": token, "postings": data}
+                    for token, data in postings.items()
+                ]
+                await session.execute(insert(VocabularyPostings.__table__), rows)
+            await session.commit()
+            return track
+
+    async def get_track(self, video_id: int, language: str | None = None) -> Subtitles | None:
+        """Track without cue index. Without language the first uploaded track is returned"""
+        async with self._session as session:
+            stmt = select(Subtitles).where(Subtitles.video_id == video_id).order_by(Subtitles.id)
+            if language is not None:
+                stmt = stmt.where(Subtitles.language == language)
+            result = await session.execute(stmt)
+            return result.scalars().first()
+
+    async def get_cue_index(self, track_id: int) -> bytes | None:
+        async with self._session as session:
+            result = await session.execute(select(Subtitles.cue_index).where(Subtitles.id == track_id))
+            return result.scalar()
+
+
+class VocabularyRepository(AlchemyRepository):
+    model = VocabularyPostings
+
+    async def iter_tracks(self, user_id: int, tokens: list[str]) -> AsyncIterator[tuple[int, dict[str, bytes]]]:
+        """Yields (video_id, encoded postings by token) of user tracks that have any of tokens, ordered by video.
+
+        Rows are streamed, so the caller can stop early without fetching postings of the remaining tracks. For several
+        tokens only tracks that have the rarest of them are read.
+        """
+        stmt = (
+            select(
+                VocabularyPostings.subtitles_id,
+                VocabularyPostings.video_id,
+                VocabularyPostings.token,
+                VocabularyPostings.postings,
+            )
+            .where(VocabularyPostings.user_id == user_id, VocabularyPostings.token.in_(tokens))
+            .order_by(VocabularyPostings.video_id, VocabularyPostings.subtitles_id)
+            .execution_options(yield_per=VOCABULARY_FETCH_SIZE)
+        )
+        async with self._session as session:
+            if len(tokens) > 1:
+                counts = await session.execute(
+                    select(VocabularyPostings.token, func.count())
+                    .where(VocabularyPostings.user_id == user_id, VocabularyPostings.token.in_(tokens))
+                    .group_by(VocabularyPostings.token)
+                )
+                tracks_with_token = dict(counts.all())
+                if len(tracks_with_token) < len(tokens):
+                    return
+                rarest = min(tracks_with_token, key=tracks_with_token.get)
+                stmt = stmt.where(
+                    VocabularyPostings.subtitles_id.in_(
+                        select(VocabularyPostings.subtitles_id).where(
+                            VocabularyPostings.user_id == user_id, VocabularyPostings.token == rarest
+                        )
+                    )
+                )
+
+            track_id, video_id, postings = None, None, {}
+            result = await session.stream(stmt)
+            async for partition in result.partitions():
+                for row in partition:
+                    if row.subtitles_id != track_id:
+                        if postings:
+                            yield video_id, postings
+                        track_id, video_id, postings = row.subtitles_id, row.video_id, {}
+                    postings[row.token] = row.postings
+            if postings:
+                yield video_id, postings
+
+
+class StorageTombstonesRepository(AlchemyRepository):
+    model = StorageTombstones
+
+    async def get_batch(self, after_id: int, limit: int) -> list[StorageTombstones]:
+        async with self._session as session:
+            stmt = (
+                select(StorageTombstones)
+                .where(StorageTombstones.id > after_id)
+                .order_by(StorageTombstones.id)
+                .limit(limit)
+            )
+            result = await session.execute(stmt)
+            return result.scalars().all()
+
+    async def delete_ids(self, ids: list[int]) -> int:
+        async with self._session as session:
+            result = await session.execute(delete(StorageTombstones).where(StorageTombstones.id.in_(ids)))
+            await session.commit()
+            return result.rowcount
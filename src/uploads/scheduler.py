@@ -0,0 +1,177 @@
+import asyncio
+import json
+import re
+from collections import defaultdict, deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+import jwt
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from src import config
+from src.uploads.errors import UploadLimitExceededError
+
+# Requests whose body is a video file, the rest of the API is not scheduled
+SCHEDULED_UPLOADS = [
+    ("POST", re.compile(r"^/uploads/videos$")),
+    ("PATCH", re.compile(r"^/uploads/videos/resumable/[^/]+$")),
+]
+
+
+@dataclass
+class _Waiter:
+    user_id: int
+    size: int
+    future: asyncio.Future = field(repr=False)
+
+
+class UploadScheduler:
+    """Admits uploads within global budget of in-flight bytes and per user limit of concurrent uploads.
+
+    Requests that do not fit wait in FIFO queue. Waiter blocked only by the limit of its own user does not hold up
+    the others, waiter blocked by the byte budget does, so large uploads are not starved by a stream of small ones.
+    Upload larger than the whole budget is admitted alone.
+    """
+
+    def __init__(
+        self,
+        max_inflight_bytes: int = config.UPLOAD_MAX_INFLIGHT_BYTES,
+        max_per_user: int = config.UPLOAD_MAX_PER_USER,
+        queue_timeout: float = config.UPLOAD_QUEUE_TIMEOUT_SECONDS,
+        retry_after: int = config.UPLOAD_RETRY_AFTER_SECONDS,
+    ):
+        self.max_inflight_bytes = max_inflight_bytes
+        self.max_per_user = max_per_user
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+
+        self.inflight_bytes = 0
+        self._uploads: defaultdict[int, int] = defaultdict(int)
+        self._queue: deque[_Waiter] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def uploads_of(self, user_id: int) -> int:
+        return self._uploads.get(user_id, 0)
+
+    @asynccontextmanager
+    async def slot(self, user_id: int, size: int) -> AsyncIterator[None]:
+        """Holds place for upload of `size` bytes. Raises UploadLimitExceededError if it was not given in time"""
+        await self.acquire(user_id, size)
+        try:
+            yield
+        finally:
+            self.release(user_id, size)
+
+    async def acquire(self, user_id: int, size: int):
+        waiter = _Waiter(user_id, size, asyncio.get_running_loop().create_future())
+        self._queue.append(waiter)
+        self._wake()
+        if waiter.future.done():
+            return
+        if self.queue_timeout <= 0:
+            self._queue.remove(waiter)
+            raise UploadLimitExceededError(self.retry_after)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+        except TimeoutError:
+            if not waiter.future.done():
+                self._abandon(waiter)
+                raise UploadLimitExceededError(self.retry_after) from None
+        except BaseException:
+            if waiter.future.done():
+                self.release(user_id, size)
+            else:
+                self._abandon(waiter)
+            raise
+
+    def release(self, user_id: int, size: int):
+        self.inflight_bytes -= size
+        self._uploads[user_id] -= 1
+        if not self._uploads[user_id]:
+            del self._uploads[user_id]
+        self._wake()
+
+    def _abandon(self, waiter: _Waiter):
+        waiter.future.cancel()
+        self._queue.remove(waiter)
+        self._wake()
+
+    def _fits(self, user_id: int, size: int) -> bool:
+        if self.uploads_of(user_id) >= self.max_per_user:
+            return False
+        return self.inflight_bytes == 0 or self.inflight_bytes + size <= self.max_inflight_bytes
+
+    def _take(self, user_id: int, size: int):
+        self.inflight_bytes += size
+        self._uploads[user_id] += 1
+
+    def _wake(self):
+        for waiter in list(self._queue):
+            if self.uploads_of(waiter.user_id) >= self.max_per_user:
+                continue
+            if not self._fits(waiter.user_id, waiter.size):
+                break
+            self._queue.remove(waiter)
+            self._take(waiter.user_id, waiter.size)
+            waiter.future.set_result(None)
+
+
+class UploadSchedulerMiddleware:
+    """Runs upload requests through UploadScheduler before their body is received.
+
+    Size of the upload is taken from Content-Length, user from the access token. Requests without valid token are
+    passed as is and rejected by the endpoint itself.
+    """
+
+    def __init__(self, app: ASGIApp, scheduler: UploadScheduler, default_size: int = config.UPLOAD_SESSION_MAX_CHUNK_SIZE):
+        self.app = app
+        self.scheduler = scheduler
+        self.default_size = default_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not self._is_upload(scope):
+            await self.app(scope, receive, send)
+            return
+
+        headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+        user_id = self._user_id(headers.get("authorization"))
+        if user_id is None:
+            await self.app(scope, receive, send)
+            return
+
+        size = int(headers["content-length"]) if headers.get("content-length", "").isdigit() else self.default_size
+        try:
+            async with self.scheduler.slot(user_id, size):
+                await self.app(scope, receive, send)
+        except UploadLimitExceededError as e:
+            await self._reject(send, e)
+
+    @staticmethod
+    def _is_upload(scope: Scope) -> bool:
+        return any(scope["method"] == method and path.match(scope["path"]) for method, path in SCHEDULED_UPLOADS)
+
+    @staticmethod
+    def _user_id(authorization: str | None) -> int | None:
+        scheme, _, token = (authorization or "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return None
+        try:
+            return jwt.decode(token, config.JWT_SECRET_KEY, algorithms=["HS256"]).get("id")
+        except jwt.InvalidTokenError:
+            return None
+
+    @staticmethod
+    async def _reject(send: Send, error: UploadLimitExceededError):
+        body = json.dumps({"detail": [{"msg": str(error)}]}, ensure_ascii=False).encode()
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(error.retry_after).encode()),
+        ]
+        await send({"type": "http.response.start", "status": 429, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
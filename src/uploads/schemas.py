@@ -1,5 +1,7 @@
+from datetime import datetime
+
 from fastapi import UploadFile
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class VideoCreate(BaseModel):
@@ -9,17 +11,84 @@ class VideoCreate(BaseModel):
     game_id: int
 
 
+class VideoReserve(BaseModel):
+    user_id: int
+    title: str
+    game_id: int
+    filename: str
+    size: int
+
+
+class VideoUploadRequest(BaseModel):
+    title: str
+    game_id: int
+    filename: str
+    size: int = Field(gt=0)
+
+
+class VideoUploadTicket(BaseModel):
+    video_id: int
+    upload_url: str | None = None
+    part_urls: list[str] | None = None
+    part_size: int | None = None
+    expires_in: int
+
+
+class UploadSessionGet(BaseModel):
+    id: str
+    video_id: int
+    offset: int
+    size: int
+    expires_at: datetime
+    completed: bool = False
+
+
 class VideoWriteDb(BaseModel):
     user_id: int
-    path: str
+    key: str
     title: str
 
 class VideoGet(VideoWriteDb):
     id: int
+    path: str | None = None
     game_id: int
+    status: str
+    size: int | None = None
+    container: str | None = None
+    codec: str | None = None
+    duration: float | None = None
+    width: int | None = None
+    height: int | None = None
 
 class VideosList(BaseModel):
     list: list[VideoGet]
+    next_cursor: str | None = None
+
+
+class SubtitlesGet(BaseModel):
+    id: int
+    video_id: int
+    language: str
+    cues_count: int
+
+
+class CueGet(BaseModel):
+    start: float
+    end: float
+    text: str
+
+
+class CuesList(BaseModel):
+    list: list[CueGet]
+
+
+class VocabularyMatch(BaseModel):
+    video_id: int
+    start: float
+
+
+class VocabularyMatchesList(BaseModel):
+    list: list[VocabularyMatch]
 
 
 class GameCreate(BaseModel):
@@ -28,7 +97,34 @@ class GameCreate(BaseModel):
 
 class GameGet(GameCreate):
     id: int
+    videos_count: int = 0
 
 
 class GamesList(BaseModel):
     list: list[GameGet]
+    next_cursor: str | None = None
+    # Videos of the current user, in lists of their own games
+    user_videos_count: int | None = None
+
+
+class StorageCacheStats(BaseModel):
+    enabled: bool
+    hits: int = 0
+    misses: int = 0
+    revalidations: int = 0
+    evictions: int = 0
+    entries: int = 0
+    used_bytes: int = 0
+    max_bytes: int = 0
+
+
+class QueryCacheStats(BaseModel):
+    enabled: bool
+    hits: int = 0
+    misses: int = 0
+    hit_ratio: float = 0
+    invalidations: int = 0
+    evictions: int = 0
+    entries: int = 0
+    used_bytes: int = 0
+    max_entries: int = 0
@@ -1,30 +1,287 @@
-from src.errors import AlreadyExistsError
-from src.repository import AbstractRepository
-from src.uploads.errors import VideoAlreadyUploadedError
-from src.uploads.schemas import GameCreate, GameGet, GamesList, VideoCreate, VideoGet, VideosList
+import asyncio
+import math
+import uuid
+from contextlib import aclosing
+from datetime import UTC, datetime, timedelta
+
+from src import config
+from src.errors import AlreadyExistsError, PresignedUploadsNotSupportedError, RecordNotFound
+from src.repository import AbstractRepository, FileStream, Page
+from src.uploads.errors import (
+    GameNotFoundError,
+    InvalidUploadChunkError,
+    SubtitlesNotFoundError,
+    UploadOffsetMismatchError,
+    UploadSessionNotFoundError,
+    VideoAlreadyUploadedError,
+    VideoNotFoundError,
+    VideoNotUploadedError,
+)
+from src.uploads.models import Videos, VideoStatus
+from src.uploads.schemas import (
+    CueGet,
+    CuesList,
+    GameCreate,
+    GameGet,
+    GamesList,
+    SubtitlesGet,
+    UploadSessionGet,
+    VideoCreate,
+    VideoGet,
+    VideoReserve,
+    VideosList,
+    VideoUploadTicket,
+    VocabularyMatch,
+    VocabularyMatchesList,
+)
+from src.uploads.subtitles import CueIndex, cue_indexes, parse_subtitles
+from src.uploads.vocabulary import build_postings, decode_postings, match_phrase, tokenize
 from src.users.models import LingoplayUsers
 
+S3_MAX_PARTS_COUNT = 10_000
+
 
 class UploadsService:
-    def __init__(self, videos_repo: AbstractRepository, games_repo: AbstractRepository):
+    def __init__(
+        self,
+        videos_repo: AbstractRepository,
+        games_repo: AbstractRepository,
+        upload_sessions_repo: AbstractRepository,
+        tombstones_repo: AbstractRepository,
+        subtitles_repo: AbstractRepository,
+        vocabulary_repo: AbstractRepository,
+    ):
         self._videos_repo = videos_repo
         self._games_repo = games_repo
+        self._upload_sessions_repo = upload_sessions_repo
+        self._tombstones_repo = tombstones_repo
+        self._subtitles_repo = subtitles_repo
+        self._vocabulary_repo = vocabulary_repo
 
     # Videos
+    def _video_get(self, video: Videos) -> VideoGet:
+        video_get = VideoGet.model_validate(video, from_attributes=True)
+        return video_get.model_copy(update={"path": self._videos_repo.object_url(video)})
+
     async def add_video(self, video_create: VideoCreate) -> VideoGet:
         try:
             video = await self._videos_repo.create_one(video_create)
-            return VideoGet.model_validate(video, from_attributes=True)
+            return self._video_get(video)
         except AlreadyExistsError as e:
             raise VideoAlreadyUploadedError(video_create.title) from e
+        except RecordNotFound as e:
+            raise GameNotFoundError(video_create.game_id) from e
+
+    async def reserve_video(self, video_reserve: VideoReserve) -> VideoUploadTicket:
+        multipart = video_reserve.size >= config.S3_MULTIPART_THRESHOLD
+        try:
+            video = await self._videos_repo.reserve_one(video_reserve, multipart=multipart)
+        except AlreadyExistsError as e:
+            raise VideoAlreadyUploadedError(video_reserve.title) from e
+
+        expires_in = config.S3_PRESIGNED_URL_EXPIRES_SECONDS
+        try:
+            if not multipart:
+                upload_url = await self._videos_repo.get_upload_url(video)
+                return VideoUploadTicket(video_id=video.id, upload_url=upload_url, expires_in=expires_in)
+
+            part_size = max(config.S3_MULTIPART_CHUNK_SIZE, math.ceil(video_reserve.size / S3_MAX_PARTS_COUNT))
+            part_urls = await self._videos_repo.get_upload_part_urls(video, math.ceil(video_reserve.size / part_size))
+            return VideoUploadTicket(video_id=video.id, part_urls=part_urls, part_size=part_size, expires_in=expires_in)
+        except PresignedUploadsNotSupportedError:
+            await self._videos_repo.discard_one(video)
+            raise
+
+    async def complete_video(self, user: LingoplayUsers, video_id: int) -> VideoGet:
+        video = await self._videos_repo.filter(user_id=user.id, id=video_id, first=True)
+        if video is None:
+            raise VideoNotFoundError(video_id)
+
+        if video.status == VideoStatus.PENDING:
+            video = await self._videos_repo.complete_one(video)
+            if video is None:
+                raise VideoNotUploadedError(video_id)
+
+        return self._video_get(video)
+
+    # Resumable uploads
+    async def start_upload_session(self, video_reserve: VideoReserve) -> UploadSessionGet:
+        try:
+            video = await self._videos_repo.reserve_one(video_reserve, multipart=True)
+        except AlreadyExistsError as e:
+            raise VideoAlreadyUploadedError(video_reserve.title) from e
+
+        upload_session = await self._upload_sessions_repo.create_one(
+            {
+                "id": uuid.uuid4().hex,
+                "user_id": video_reserve.user_id,
+                "video_id": video.id,
+                "size": video_reserve.size,
+                "offset": 0,
+                "parts": [],
+                "expires_at": self._session_expires_at(),
+            }
+        )
+        return UploadSessionGet.model_validate(upload_session, from_attributes=True)
+
+    async def get_upload_session(self, user: LingoplayUsers, upload_id: str) -> UploadSessionGet:
+        upload_session = await self._upload_sessions_repo.get_active(upload_id, user.id)
+        if upload_session is None:
+            raise UploadSessionNotFoundError(upload_id)
+        return UploadSessionGet.model_validate(upload_session, from_attributes=True)
+
+    async def append_upload_chunk(
+        self, user: LingoplayUsers, upload_id: str, offset: int, chunk: bytes
+    ) -> UploadSessionGet:
+        """Uploads chunk as the next multipart part. The last chunk completes the upload."""
+        upload_session = await self._upload_sessions_repo.get_active(upload_id, user.id)
+        if upload_session is None:
+            raise UploadSessionNotFoundError(upload_id)
+
+        if offset != upload_session.offset:
+            raise UploadOffsetMismatchError(upload_session.offset)
+
+        end = offset + len(chunk)
+        if not chunk or end > upload_session.size:
+            raise InvalidUploadChunkError(f"Кусок должен заканчиваться не дальше {upload_session.size} байта")
+        if end < upload_session.size and len(chunk) < config.UPLOAD_SESSION_MIN_CHUNK_SIZE:
+            raise InvalidUploadChunkError(f"Кусок должен быть не меньше {config.UPLOAD_SESSION_MIN_CHUNK_SIZE} байт")
+
+        video = await self._videos_repo.filter(id=upload_session.video_id, first=True)
+        part = await self._videos_repo.upload_part(video, len(upload_session.parts) + 1, chunk)
+        parts = [*upload_session.parts, part]
+
+        if end < upload_session.size:
+            advanced = await self._upload_sessions_repo.advance(upload_session, end, parts, self._session_expires_at())
+            if advanced is None:
+                raise UploadOffsetMismatchError(upload_session.offset)
+            return UploadSessionGet.model_validate(advanced, from_attributes=True)
+
+        if await self._videos_repo.complete_one(video, parts=parts) is None:
+            raise VideoNotUploadedError(video.id)
+        await self._upload_sessions_repo.delete_by(id=upload_session.id)
+
+        completed = UploadSessionGet.model_validate(upload_session, from_attributes=True)
+        return completed.model_copy(update={"offset": end, "completed": True})
+
+    async def cleanup_expired_upload_sessions(self) -> int:
+        """Aborts expired upload sessions and removes their unfinished videos"""
+        expired = await self._upload_sessions_repo.get_expired()
+        for upload_session in expired:
+            video = await self._videos_repo.filter(id=upload_session.video_id, first=True)
+            await self._upload_sessions_repo.delete_by(id=upload_session.id)
+            if video is not None and video.status == VideoStatus.PENDING:
+                await self._videos_repo.discard_one(video)
+        return len(expired)
+
+    @staticmethod
+    def _session_expires_at() -> datetime:
+        return datetime.now(UTC) + timedelta(seconds=config.UPLOAD_SESSION_TTL_SECONDS)
 
     async def get_user_video(self, user: LingoplayUsers, video_id: int) -> VideoGet:
         video = await self._videos_repo.filter(user_id=user.id, id=video_id, first=True)
-        return VideoGet.model_validate(video, from_attributes=True)
+        return self._video_get(video)
+
+    async def stream_user_video(self, user: LingoplayUsers, video_id: int, byte_range: str | None) -> FileStream:
+        video = await self._videos_repo.filter(user_id=user.id, id=video_id, first=True)
+        if video is None or video.status != VideoStatus.UPLOADED:
+            raise VideoNotFoundError(video_id)
+        return await self._videos_repo.stream_file(video, byte_range)
+
+    async def delete_user_video(self, user: LingoplayUsers, video_id: int):
+        if not await self._videos_repo.delete_for_user(user.id, video_id):
+            raise VideoNotFoundError(video_id)
+
+    async def purge_deleted_files(
+        self, batch_size: int = config.STORAGE_PURGE_BATCH_SIZE, concurrency: int = config.STORAGE_PURGE_CONCURRENCY
+    ) -> int:
+        """Deletes tombstoned files from storage, `concurrency` batches of `batch_size` keys at a time.
+
+        Keys that failed to delete keep their tombstones and are retried on the next run.
+        """
+        purged = 0
+        after_id = 0
+        while tombstones := await self._tombstones_repo.get_batch(after_id, batch_size * concurrency):
+            after_id = tombstones[-1].id
+
+            live_keys = await self._videos_repo.live_keys([t.key for t in tombstones])
+            keys = list({t.key for t in tombstones if t.key not in live_keys})
+            batches = [keys[i : i + batch_size] for i in range(0, len(keys), batch_size)]
+            failed = await asyncio.gather(*(self._videos_repo.delete_stored_files(batch) for batch in batches))
+            failed_keys = {key for batch in failed for key in batch}
+
+            done = [t.id for t in tombstones if t.key not in failed_keys]
+            if done:
+                await self._tombstones_repo.delete_ids(done)
+            purged += len(done)
+        return purged
+
+    async def reconcile_video_counts(self) -> int:
+        """Fixes video counters of games and users that drifted from actual counts, returns how many were fixed"""
+        return await self._videos_repo.reconcile_video_counts()
 
-    async def get_user_videos(self, user: LingoplayUsers) -> VideosList:
-        videos = await self._videos_repo.filter(user_id=user.id)
-        return VideosList.model_validate({"list": [VideoGet.model_validate(v, from_attributes=True) for v in videos]})
+    async def get_user_videos(
+        self, user: LingoplayUsers, limit: int = config.PAGE_DEFAULT_LIMIT, cursor: str | None = None
+    ) -> VideosList:
+        """Page of user videos in upload order. Raises InvalidCursorError"""
+        page = await self._videos_repo.filter_page(limit, cursor, user_id=user.id)
+        return VideosList(list=[self._video_get(v) for v in page.items], next_cursor=page.next_cursor)
+
+    # Subtitles
+    async def add_subtitles(self, user: LingoplayUsers, video_id: int, language: str, data: bytes) -> SubtitlesGet:
+        """Parses SRT or WebVTT track once and stores its cue index. Raises InvalidSubtitlesError"""
+        video = await self._videos_repo.filter(user_id=user.id, id=video_id, first=True)
+        if video is None:
+            raise VideoNotFoundError(video_id)
+
+        cues = await asyncio.to_thread(parse_subtitles, data)
+        index = await asyncio.to_thread(CueIndex.from_cues, cues)
+        postings = await asyncio.to_thread(build_postings, index)
+        track = await self._subtitles_repo.replace(user.id, video_id, language, len(index), index.to_bytes(), postings)
+        cue_indexes.put(track.id, index)
+        return SubtitlesGet.model_validate(track, from_attributes=True)
+
+    async def get_cues(
+        self, user: LingoplayUsers, video_id: int, start: float, end: float, language: str | None = None
+    ) -> CuesList:
+        """Cues of video subtitles shown at some moment between `start` and `end` seconds"""
+        video = await self._videos_repo.filter(user_id=user.id, id=video_id, first=True)
+        if video is None:
+            raise VideoNotFoundError(video_id)
+        track = await self._subtitles_repo.get_track(video_id, language)
+        if track is None:
+            raise SubtitlesNotFoundError(video_id)
+
+        index = cue_indexes.get(track.id)
+        if index is None:
+            index = CueIndex.from_bytes(await self._subtitles_repo.get_cue_index(track.id))
+            cue_indexes.put(track.id, index)
+
+        cues = index.overlapping(round(start * 1000), round(end * 1000))
+        return CuesList(list=[CueGet(start=c.start / 1000, end=c.end / 1000, text=c.text) for c in cues])
+
+    async def search_vocabulary(self, user: LingoplayUsers, query: str, limit: int = 100) -> VocabularyMatchesList:
+        """Moments of user videos where the word or phrase is spoken, by the inverted index of their subtitles"""
+        tokens = tokenize(query)
+        if not tokens:
+            return VocabularyMatchesList(list=[])
+
+        # Tracks come ordered by video, so postings of videos after the first `limit` matches are not even fetched
+        matches = set()
+        last_video_id = None
+        async with aclosing(self._vocabulary_repo.iter_tracks(user.id, list(set(tokens)))) as tracks:
+            async for video_id, postings in tracks:
+                if len(matches) >= limit and video_id != last_video_id:
+                    break
+                if any(token not in postings for token in tokens):
+                    continue
+                if starts := match_phrase([decode_postings(postings[token]) for token in tokens]):
+                    matches.update((video_id, start) for start in starts)
+                    last_video_id = video_id
+
+        return VocabularyMatchesList(
+            list=[VocabularyMatch(video_id=video_id, start=start / 1000) for video_id, start in sorted(matches)[:limit]]
+        )
 
     # Games
     async def add_game(self, user: LingoplayUsers, game_data: GameCreate) -> GameGet:
@@ -35,10 +292,19 @@ class UploadsService:
         game = await self._games_repo.filter(user_id=user.id, id=game_id, first=True)
         return GameGet.model_validate(game, from_attributes=True)
 
-    async def search_user_games(self, user: LingoplayUsers, **kwargs) -> GamesList:
-        games = await self._games_repo.filter(user_id=user.id, **kwargs)
-        return GamesList.model_validate({"list": [GameGet.model_validate(g, from_attributes=True) for g in games]})
+    async def search_user_games(
+        self, user: LingoplayUsers, limit: int = config.PAGE_DEFAULT_LIMIT, cursor: str | None = None, **kwargs
+    ) -> GamesList:
+        page = await self._games_repo.filter_page(limit, cursor, user_id=user.id, **kwargs)
+        return self._games_list(page, user_videos_count=user.videos_count)
+
+    async def search_all_games(
+        self, limit: int = config.PAGE_DEFAULT_LIMIT, cursor: str | None = None, **kwargs
+    ) -> GamesList:
+        page = await self._games_repo.filter_page(limit, cursor, **kwargs)
+        return self._games_list(page)
 
-    async def search_all_games(self, **kwargs) -> GamesList:
-        games = await self._games_repo.filter(**kwargs)
-        return GamesList.model_validate({"list": [GameGet.model_validate(g, from_attributes=True) for g in games]})
+    @staticmethod
+    def _games_list(page: Page, user_videos_count: int | None = None) -> GamesList:
+        games = [GameGet.model_validate(g, from_attributes=True) for g in page.items]
+        return GamesList(list=games, next_cursor=page.next_cursor, user_videos_count=user_videos_count)
@@ -0,0 +1,154 @@
+import re
+import struct
+import sys
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from src import config
+from src.uploads.errors import InvalidSubtitlesError
+
+TIMESTAMP = r"(?:(\d+):)?(\d{1,2}):(\d{2})[,.](\d{1,3})"
+TIMING_RE = re.compile(rf"^\s*{TIMESTAMP}\s*-->\s*{TIMESTAMP}")
+INDEX_MAGIC = b"CUE1"
+INDEX_HEADER = struct.Struct("<4sI")
+# SRT files made on Windows for Russian subtitles are often in cp1251
+ENCODINGS = ("utf-8-sig", "cp1251")
+
+
+@dataclass
+class Cue:
+    start: int
+    end: int
+    text: str
+
+
+class CueIndex:
+    """Cues of subtitle track sorted by start, kept in flat arrays.
+
+    `max_ends[i]` is the largest end among the first i + 1 cues, so it never decreases and the first cue that can
+    overlap a window is found by binary search even when long cues overlap short ones. Times are in milliseconds,
+    texts are concatenated UTF-8 addressed by `text_offsets`.
+    """
+
+    def __init__(self, starts: array, ends: array, max_ends: array, text_offsets: array, text: bytes):
+        self.starts = starts
+        self.ends = ends
+        self.max_ends = max_ends
+        self.text_offsets = text_offsets
+        self.text = text
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    @classmethod
+    def from_cues(cls, cues: list[Cue]) -> "CueIndex":
+        cues = sorted(cues, key=lambda c: (c.start, c.end))
+        starts, ends, max_ends, text_offsets = array("q"), array("q"), array("q"), array("Q", [0])
+        text = bytearray()
+        max_end = -1
+        for cue in cues:
+            max_end = max(max_end, cue.end)
+            starts.append(cue.start)
+            ends.append(cue.end)
+            max_ends.append(max_end)
+            text += cue.text.encode()
+            text_offsets.append(len(text))
+        return cls(starts, ends, max_ends, text_offsets, bytes(text))
+
+    def overlapping(self, start: int, end: int) -> list[Cue]:
+        """Cues that are shown at some moment of [start, end]"""
+        lo = bisect_right(self.max_ends, start)
+        hi = bisect_right(self.starts, end)
+        return [self.cue(i) for i in range(lo, hi) if self.ends[i] > start]
+
+    def to_bytes(self) -> bytes:
+        arrays = [self.starts, self.ends, self.max_ends, self.text_offsets]
+        if sys.byteorder == "big":
+            arrays = [_swapped(a) for a in arrays]
+        return b"".join([INDEX_HEADER.pack(INDEX_MAGIC, len(self)), *(a.tobytes() for a in arrays), self.text])
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "CueIndex":
+        magic, count = INDEX_HEADER.unpack_from(data)
+        if magic != INDEX_MAGIC:
+            raise ValueError("Not a cue index")
+
+        offset = INDEX_HEADER.size
+        arrays = []
+        for typecode, length in (("q", count), ("q", count), ("q", count), ("Q", count + 1)):
+            values = array(typecode)
+            size = values.itemsize * length
+            values.frombytes(data[offset : offset + size])
+            if sys.byteorder == "big":
+                values.byteswap()
+            arrays.append(values)
+            offset += size
+        return cls(*arrays, text=data[offset:])
+
+    def cue(self, i: int) -> Cue:
+        text = self.text[self.text_offsets[i] : self.text_offsets[i + 1]].decode()
+        return Cue(start=self.starts[i], end=self.ends[i], text=text)
+
+
+class CueIndexCache:
+    """Decoded cue indexes of recently requested tracks. Tracks are immutable, replaced track gets new id"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._indexes: OrderedDict[int, CueIndex] = OrderedDict()
+
+    def get(self, track_id: int) -> CueIndex | None:
+        index = self._indexes.get(track_id)
+        if index is not None:
+            self._indexes.move_to_end(track_id)
+        return index
+
+    def put(self, track_id: int, index: CueIndex):
+        self._indexes[track_id] = index
+        self._indexes.move_to_end(track_id)
+        while len(self._indexes) > self.max_entries:
+            self._indexes.popitem(last=False)
+
+
+cue_indexes = CueIndexCache(config.SUBTITLES_CACHE_MAX_ENTRIES)
+
+
+def parse_subtitles(data: bytes) -> list[Cue]:
+    """Parses SRT or WebVTT track. Blocks without timing line (WEBVTT header, NOTE, STYLE, REGION) are skipped"""
+    content = _decode(data).replace("\r\n", "\n").replace("\r", "\n")
+
+    cues = []
+    for block in re.split(r"\n\s*\n", content):
+        lines = block.strip("\n").split("\n")
+        for i, line in enumerate(lines):
+            if match := TIMING_RE.match(line):
+                start, end = _milliseconds(*match.groups()[:4]), _milliseconds(*match.groups()[4:])
+                if end < start:
+                    raise InvalidSubtitlesError(f"Субтитр заканчивается раньше, чем начинается: '{line.strip()}'")
+                cues.append(Cue(start=start, end=end, text="\n".join(lines[i + 1 :]).strip()))
+                break
+
+    if not cues:
+        raise InvalidSubtitlesError("Файл не похож на субтитры SRT или WebVTT")
+    return cues
+
+
+def _decode(data: bytes) -> str:
+    for encoding in ENCODINGS:
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    raise InvalidSubtitlesError("Не удалось определить кодировку субтитров")
+
+
+def _milliseconds(hours: str | None, minutes: str, seconds: str, fraction: str) -> int:
+    return ((int(hours or 0) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(fraction.ljust(3, "0"))
+
+
+def _swapped(values: array) -> array:
+    values = array(values.typecode, values)
+    values.byteswap()
+    return values
@@ -0,0 +1,26 @@
+import logging
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from src.repository import AbstractS3Repository
+from src.uploads.dependencies import create_uploads_service
+
+logger = logging.getLogger(__name__)
+
+
+async def cleanup_expired_upload_sessions(session_maker: async_sessionmaker, s3_repository: AbstractS3Repository) -> int:
+    async with session_maker() as session:
+        return await create_uploads_service(session, s3_repository).cleanup_expired_upload_sessions()
+
+
+async def purge_deleted_files(session_maker: async_sessionmaker, s3_repository: AbstractS3Repository) -> int:
+    async with session_maker() as session:
+        return await create_uploads_service(session, s3_repository).purge_deleted_files()
+
+
+async def reconcile_video_counts(session_maker: async_sessionmaker, s3_repository: AbstractS3Repository) -> int:
+    async with session_maker() as session:
+        fixed = await create_uploads_service(session, s3_repository).reconcile_video_counts()
+    if fixed:
+        logger.warning("Fixed %d drifted video counters", fixed)
+    return fixed
@@ -1,12 +1,43 @@
+from email.utils import format_datetime
 from typing import Annotated
 
-from fastapi import APIRouter, File, Form, HTTPException, UploadFile, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, File, Form, Header, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from src.auth.dependencies import CurrentUser
-from src.uploads.dependencies import UploadsServ
-from src.uploads.errors import VideoAlreadyUploadedError
-from src.uploads.schemas import GameCreate, GameGet, GamesList, VideoCreate, VideoGet, VideosList
+from src import config
+from src.auth.dependencies import CurrentUser, ReadCurrentUser
+from src.errors import InvalidCursorError, PresignedUploadsNotSupportedError, RangeNotSatisfiableError
+from src.repository import SINGLE_BYTE_RANGE_RE, query_cache
+from src.responses import FileRangeResponse
+from src.uploads.dependencies import UploadsReadServ, UploadsServ
+from src.uploads.errors import (
+    GameNotFoundError,
+    InvalidSubtitlesError,
+    InvalidUploadChunkError,
+    SubtitlesNotFoundError,
+    UploadOffsetMismatchError,
+    UploadSessionNotFoundError,
+    VideoAlreadyUploadedError,
+    VideoNotFoundError,
+    VideoNotUploadedError,
+)
+from src.uploads.schemas import (
+    CuesList,
+    GameCreate,
+    GameGet,
+    GamesList,
+    QueryCacheStats,
+    StorageCacheStats,
+    SubtitlesGet,
+    UploadSessionGet,
+    VideoCreate,
+    VideoGet,
+    VideoReserve,
+    VideosList,
+    VideoUploadRequest,
+    VideoUploadTicket,
+    VocabularyMatchesList,
+)
 
 router = APIRouter()
 
@@ -32,27 +63,272 @@ async def upload_video(
             status_code=status.HTTP_409_CONFLICT,
             detail=[{"msg": str(e)}],
         ) from e
+    except GameNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=[{"msg": str(e)}]) from e
 
 
-@router.get("/videos", response_model=VideosList)
-async def get_user_videos(
+@router.post("/videos/presigned", response_model=VideoUploadTicket, status_code=status.HTTP_201_CREATED)
+async def reserve_video_upload(
+    upload_request: VideoUploadRequest,
     current_user: CurrentUser,
     uploads_service: UploadsServ,
+) -> VideoUploadTicket:
+    """Reserve new video and get presigned URLs to upload its file directly to storage"""
+    data = VideoReserve(user_id=current_user.id, **upload_request.model_dump())
+
+    try:
+        return await uploads_service.reserve_video(data)
+    except VideoAlreadyUploadedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=[{"msg": str(e)}],
+        ) from e
+    except PresignedUploadsNotSupportedError as e:
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=[{"msg": str(e)}]) from e
+
+
+@router.post("/videos/{video_id}/complete", response_model=VideoGet)
+async def complete_video_upload(
+    video_id: int,
+    current_user: CurrentUser,
+    uploads_service: UploadsServ,
+) -> VideoGet:
+    """Finalize video whose file was uploaded directly to storage"""
+    try:
+        return await uploads_service.complete_video(user=current_user, video_id=video_id)
+    except VideoNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=[{"msg": str(e)}]) from e
+    except VideoNotUploadedError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=[{"msg": str(e)}]) from e
+
+
+@router.post("/videos/resumable", response_model=UploadSessionGet, status_code=status.HTTP_201_CREATED)
+async def start_resumable_upload(
+    upload_request: VideoUploadRequest,
+    current_user: CurrentUser,
+    uploads_service: UploadsServ,
+) -> UploadSessionGet:
+    """Start resumable video upload. The file is then sent in chunks with PATCH"""
+    data = VideoReserve(user_id=current_user.id, **upload_request.model_dump())
+
+    try:
+        return await uploads_service.start_upload_session(data)
+    except VideoAlreadyUploadedError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=[{"msg": str(e)}],
+        ) from e
+
+
+@router.get("/videos/resumable/{upload_id}", response_model=UploadSessionGet)
+async def get_resumable_upload(
+    upload_id: str,
+    response: Response,
+    current_user: CurrentUser,
+    uploads_service: UploadsServ,
+) -> UploadSessionGet:
+    """Get offset from which the client should resume uploading"""
+    try:
+        upload_session = await uploads_service.get_upload_session(user=current_user, upload_id=upload_id)
+    except UploadSessionNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=[{"msg": str(e)}]) from e
+
+    response.headers["Upload-Offset"] = str(upload_session.offset)
+    return upload_session
+
+
+@router.patch("/videos/resumable/{upload_id}", response_model=UploadSessionGet)
+async def append_resumable_upload(
+    upload_id: str,
+    request: Request,
+    response: Response,
+    upload_offset: Annotated[int, Header()],
+    current_user: CurrentUser,
+    uploads_service: UploadsServ,
+) -> UploadSessionGet:
+    """Append next chunk of the file. The chunk must start at the current session offset"""
+    chunk = bytearray()
+    async for data in request.stream():
+        chunk.extend(data)
+        if len(chunk) > config.UPLOAD_SESSION_MAX_CHUNK_SIZE:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=[{"msg": f"Кусок больше {config.UPLOAD_SESSION_MAX_CHUNK_SIZE} байт"}],
+            )
+
+    try:
+        upload_session = await uploads_service.append_upload_chunk(current_user, upload_id, upload_offset, bytes(chunk))
+    except UploadSessionNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=[{"msg": str(e)}]) from e
+    except UploadOffsetMismatchError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=[{"msg": str(e)}],
+            headers={"Upload-Offset": str(e.offset)},
+        ) from e
+    except InvalidUploadChunkError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=[{"msg": str(e)}]) from e
+
+    response.headers["Upload-Offset"] = str(upload_session.offset)
+    return upload_session
+
+
+@router.get("/videos", response_model=VideosList)
+async def get_user_videos(
+    current_user: ReadCurrentUser,
+    uploads_service: UploadsReadServ,
+    limit: Annotated[int, Query(ge=1, le=config.PAGE_MAX_LIMIT)] = config.PAGE_DEFAULT_LIMIT,
+    cursor: str | None = None,
 ) -> VideosList:
-    """Get all videos uploaded by current user"""
-    return await uploads_service.get_user_videos(user=current_user)
+    """Get videos uploaded by current user page by page, `next_cursor` of response points to the next page"""
+    try:
+        return await uploads_service.get_user_videos(user=current_user, limit=limit, cursor=cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=[{"msg": str(e)}]) from e
 
 
 @router.get("/videos/{video_id}", response_model=VideoGet)
 async def get_user_video(
     video_id: int,
-    current_user: CurrentUser,
-    uploads_service: UploadsServ,
+    current_user: ReadCurrentUser,
+    uploads_service: UploadsReadServ,
 ) -> VideoGet:
     """Get specific video of current user by ID"""
     return await uploads_service.get_user_video(user=current_user, video_id=video_id)
 
 
+@router.delete("/videos/{video_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_user_video(
+    video_id: int,
+    current_user: CurrentUser,
+    uploads_service: UploadsServ,
+):
+    """Delete video of current user. Its file is removed from storage in background"""
+    try:
+        await uploads_service.delete_user_video(user=current_user, video_id=video_id)
+    except VideoNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=[{"msg": str(e)}]) from e
+
+
+@router.get("/videos/{video_id}/stream", response_class=StreamingResponse)
+async def stream_user_video(
+    video_id: int,
+    current_user: ReadCurrentUser,
+    uploads_service: UploadsReadServ,
+    range_header: Annotated[str | None, Header(alias="Range")] = None,
+) -> StreamingResponse:
+    """Stream file of specific video of current user. Supports single byte range requests for seeking"""
+    if range_header is not None and not SINGLE_BYTE_RANGE_RE.match(range_header.strip()):
+        range_header = None
+
+    try:
+        stream = await uploads_service.stream_user_video(current_user, video_id, range_header)
+    except VideoNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=[{"msg": str(e)}]) from e
+    except RangeNotSatisfiableError as e:
+        raise HTTPException(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE, detail=[{"msg": str(e)}]) from e
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(stream.content_length),
+        "Cache-Control": config.STREAM_CACHE_CONTROL,
+    }
+    if stream.content_range:
+        headers["Content-Range"] = stream.content_range
+    if stream.etag:
+        headers["ETag"] = stream.etag
+    if stream.last_modified:
+        headers["Last-Modified"] = format_datetime(stream.last_modified, usegmt=True)
+
+    status_code = status.HTTP_206_PARTIAL_CONTENT if stream.content_range else status.HTTP_200_OK
+    media_type = stream.content_type or "video/mp4"
+    if stream.path is not None:
+        return FileRangeResponse(
+            stream.path, stream.offset, stream.content_length, status_code, headers=headers, media_type=media_type
+        )
+    return StreamingResponse(stream.body, status_code=status_code, media_type=media_type, headers=headers)
+
+
+@router.post("/videos/{video_id}/subtitles", response_model=SubtitlesGet, status_code=status.HTTP_201_CREATED)
+async def upload_video_subtitles(
+    video_id: int,
+    file: Annotated[UploadFile, File()],
+    current_user: CurrentUser,
+    uploads_service: UploadsServ,
+    language: Annotated[str, Form()] = "und",
+) -> SubtitlesGet:
+    """Attach SRT or WebVTT subtitle track to video. Track in the same language is replaced"""
+    data = await file.read(config.SUBTITLES_MAX_SIZE + 1)
+    if len(data) > config.SUBTITLES_MAX_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=[{"msg": f"Файл субтитров больше {config.SUBTITLES_MAX_SIZE} байт"}],
+        )
+
+    try:
+        return await uploads_service.add_subtitles(current_user, video_id, language, data)
+    except VideoNotFoundError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=[{"msg": str(e)}]) from e
+    except InvalidSubtitlesError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=[{"msg": str(e)}]) from e
+
+
+@router.get("/videos/{video_id}/cues", response_model=CuesList)
+async def get_video_cues(
+    video_id: int,
+    current_user: ReadCurrentUser,
+    uploads_service: UploadsReadServ,
+    start: Annotated[float, Query(alias="from", ge=0)],
+    end: Annotated[float, Query(alias="to", ge=0)],
+    language: str | None = None,
+) -> CuesList:
+    """Get subtitle cues shown between `from` and `to` seconds of the video"""
+    try:
+        return await uploads_service.get_cues(current_user, video_id, start, end, language)
+    except (VideoNotFoundError, SubtitlesNotFoundError) as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=[{"msg": str(e)}]) from e
+
+
+@router.get("/vocabulary", response_model=VocabularyMatchesList)
+async def search_vocabulary(
+    current_user: ReadCurrentUser,
+    uploads_service: UploadsReadServ,
+    q: Annotated[str, Query(min_length=1)],
+    limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+) -> VocabularyMatchesList:
+    """Find moments of current user videos where the word or phrase is spoken in subtitles"""
+    return await uploads_service.search_vocabulary(current_user, q, limit)
+
+
+@router.get("/storage/cache", response_model=StorageCacheStats)
+async def get_storage_cache_stats(request: Request, current_user: ReadCurrentUser) -> StorageCacheStats:
+    """Get hit, miss and eviction counters of local disk cache of stored videos"""
+    cache = getattr(request.app.state, "storage_cache", None)
+    if cache is None:
+        return StorageCacheStats(enabled=False)
+    return StorageCacheStats(
+        enabled=True,
+        entries=len(cache),
+        used_bytes=cache.used_bytes,
+        max_bytes=cache.max_bytes,
+        **cache.stats.dict(),
+    )
+
+
+@router.get("/storage/query-cache", response_model=QueryCacheStats)
+async def get_query_cache_stats(current_user: ReadCurrentUser) -> QueryCacheStats:
+    """Get hit ratio and memory use of the in-process cache of users and games reads"""
+    if query_cache is None:
+        return QueryCacheStats(enabled=False)
+    return QueryCacheStats(
+        enabled=True,
+        entries=len(query_cache),
+        used_bytes=query_cache.used_bytes,
+        max_entries=query_cache.max_entries,
+        **query_cache.stats.dict(),
+    )
+
+
 @router.post("/games", response_model=GameGet, status_code=status.HTTP_201_CREATED)
 async def add_game(
     game_create: GameCreate,
@@ -65,22 +341,27 @@ async def add_game(
 
 @router.get("/games", response_model=GamesList)
 async def get_games(
-    current_user: CurrentUser,
-    uploads_service: UploadsServ,
+    current_user: ReadCurrentUser,
+    uploads_service: UploadsReadServ,
     all: bool = False,
     title: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=config.PAGE_MAX_LIMIT)] = config.PAGE_DEFAULT_LIMIT,
+    cursor: str | None = None,
 ) -> GamesList:
-    """Get games — either user-specific or all, with optional filtering"""
-    if all:
-        return await uploads_service.search_all_games(title=title)
-    return await uploads_service.search_user_games(user=current_user, title=title)
+    """Get games — either user-specific or all, with optional filtering, page by page ordered by title"""
+    try:
+        if all:
+            return await uploads_service.search_all_games(title=title, limit=limit, cursor=cursor)
+        return await uploads_service.search_user_games(user=current_user, title=title, limit=limit, cursor=cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=[{"msg": str(e)}]) from e
 
 
 @router.get("/games/{game_id}", response_model=GameGet)
 async def get_user_game(
     game_id: int,
-    current_user: CurrentUser,
-    uploads_service: UploadsServ,
+    current_user: ReadCurrentUser,
+    uploads_service: UploadsReadServ,
 ) -> GameGet:
     """Get specific game of current user by ID"""
     return await uploads_service.get_user_game(user=current_user, game_id=game_id)
@@ -0,0 +1,95 @@
+import re
+import struct
+import sys
+from array import array
+from collections import defaultdict
+from itertools import accumulate
+
+from src.uploads.subtitles import CueIndex
+
+TOKEN_RE = re.compile(r"\w+(?:['’]\w+)*")
+# Number of postings, item sizes of start and position deltas
+POSTINGS_HEADER = struct.Struct("<IBB")
+ITEM_TYPECODES = {array(typecode).itemsize: typecode for typecode in "BHIQ"}
+
+
+def tokenize(text: str) -> list[str]:
+    """Lower cased words of text, "ё" is folded into "е" the way Russian texts usually spell it"""
+    return [token.replace("’", "'") for token in TOKEN_RE.findall(text.casefold().replace("ё", "е"))]
+
+
+def build_postings(index: CueIndex) -> dict[str, bytes]:
+    """Encoded postings of every token of subtitle track.
+
+    Posting is (start of cue in milliseconds, position of the token in the track). Positions are counted through
+    the whole track, so words of a phrase have consecutive positions.
+    """
+    postings: defaultdict[str, list[tuple[int, int]]] = defaultdict(list)
+    position = 0
+    for i in range(len(index)):
+        cue = index.cue(i)
+        for token in tokenize(cue.text):
+            postings[token].append((cue.start, position))
+            position += 1
+    return {token: encode_postings(entries) for token, entries in postings.items()}
+
+
+def encode_postings(postings: list[tuple[int, int]]) -> bytes:
+    """Deltas of starts and of positions, both never decrease along the track.
+
+    Each of the two delta arrays is packed with the smallest item size that fits its largest delta, so a list is
+    decoded by `array.frombytes` and `accumulate` without a Python loop over postings.
+    """
+    starts, positions = zip(*postings, strict=True) if postings else ((), ())
+    start_deltas = _packed(_deltas(starts))
+    position_deltas = _packed(_deltas(positions))
+    header = POSTINGS_HEADER.pack(len(postings), start_deltas.itemsize, position_deltas.itemsize)
+    return header + _little_endian(start_deltas) + _little_endian(position_deltas)
+
+
+def decode_postings(data: bytes) -> tuple[list[int], list[int]]:
+    """Starts and positions of postings"""
+    count, start_size, position_size = POSTINGS_HEADER.unpack_from(data)
+    offset = POSTINGS_HEADER.size
+    start_deltas = _unpacked(data, offset, start_size, count)
+    position_deltas = _unpacked(data, offset + start_size * count, position_size, count)
+    return list(accumulate(start_deltas)), list(accumulate(position_deltas))
+
+
+def match_phrase(postings: list[tuple[list[int], list[int]]]) -> list[int]:
+    """Starts of cues where the phrase begins, given postings of its tokens in one track in phrase order"""
+    first_starts, first_positions = postings[0]
+    candidates = set(first_positions)
+    for offset, (_, positions) in enumerate(postings[1:], 1):
+        candidates.intersection_update(map((-offset).__add__, positions))
+        if not candidates:
+            return []
+    start_of = dict(zip(first_positions, first_starts, strict=True))
+    return sorted({start_of[position] for position in candidates})
+
+
+def _deltas(values: tuple[int, ...]) -> list[int]:
+    return [value - prev for prev, value in zip((0, *values), values, strict=False)]
+
+
+def _packed(values: list[int]) -> array:
+    largest = max(values, default=0)
+    for itemsize, typecode in ITEM_TYPECODES.items():
+        if largest < 1 << (8 * itemsize):
+            return array(typecode, values)
+    raise ValueError(f"Delta {largest} does not fit 8 bytes")
+
+
+def _unpacked(data: bytes, offset: int, itemsize: int, count: int) -> array:
+    values = array(ITEM_TYPECODES[itemsize])
+    values.frombytes(data[offset : offset + itemsize * count])
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
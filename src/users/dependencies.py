@@ -3,10 +3,21 @@ from typing import Annotated
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.core import get_session
+from src.database.core import get_read_session, get_session
+from src.repository import S3Repo
+from src.uploads.repository import VideoRepository
 from src.users.repository import UserRepository
 from src.users.service import UsersService
 
 
 async def user_service(session: Annotated[AsyncSession, Depends(get_session)]):
     return UsersService(repository=UserRepository(session=session))
+
+
+async def user_read_service(session: Annotated[AsyncSession, Depends(get_read_session)]):
+    return UsersService(repository=UserRepository(session=session))
+
+
+async def user_deletion_service(session: Annotated[AsyncSession, Depends(get_session)], s3_repository: S3Repo):
+    """Users service that can delete users with their videos, the only one that needs storage"""
+    return UsersService(repository=UserRepository(session=session), videos_repo=VideoRepository(session, s3_repository))
@@ -17,6 +17,8 @@ class LingoplayUsers(Base):
     email: Mapped[str] = mapped_column(unique=True, index=True)
     username: Mapped[str] = mapped_column(unique=True)
     password: Mapped[bytes] = mapped_column(LargeBinary)
+    # Kept by VideoRepository in the same transaction as videos, checked by `reconcile_video_counts` job
+    videos_count: Mapped[int] = mapped_column(default=0, server_default="0")
 
     token: Mapped["UserTokens"] = relationship(
         back_populates="user",
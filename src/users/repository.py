@@ -1,6 +1,7 @@
-from src.repository import AlchemyRepository
+from src.repository import AlchemyRepository, query_cache
 from src.users.models import LingoplayUsers
 
 
 class UserRepository(AlchemyRepository):
     model = LingoplayUsers
+    cache = query_cache
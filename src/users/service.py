@@ -6,8 +6,9 @@ from src.users.schemas import UserCreate
 
 
 class UsersService:
-    def __init__(self, repository: AbstractRepository):
+    def __init__(self, repository: AbstractRepository, videos_repo: AbstractRepository | None = None):
         self._repository = repository
+        self._videos_repo = videos_repo
 
     async def add(self, user: UserCreate) -> LingoplayUsers:
         user_dict = user.model_dump()
@@ -30,3 +31,8 @@ class UsersService:
     async def exists(self, **kwargs) -> bool:
         user = await self._repository.filter_or_(**kwargs, first=True)
         return user is not None
+
+    async def delete(self, user: LingoplayUsers):
+        """Deletes user with all videos. Video files are removed from storage in background, needs `videos_repo`"""
+        await self._videos_repo.delete_for_user(user.id)
+        await self._repository.delete_by(id=user.id)
@@ -1,9 +1,9 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, status
 
-from src.auth.dependencies import CurrentUser
-from src.users.dependencies import user_service
+from src.auth.dependencies import CurrentUser, ReadCurrentUser
+from src.users.dependencies import user_deletion_service, user_service
 from src.users.errors import UserAlreadyExistsError
 from src.users.schemas import UserCreate, UserRead
 from src.users.service import UsersService
@@ -25,6 +25,14 @@ async def create_user(user_in: UserCreate, user_service: Annotated[UsersService,
 
 
 @router.get("/current")
-async def current_user(current_user: CurrentUser) -> UserRead:
+async def current_user(current_user: ReadCurrentUser) -> UserRead:
     """Get a user."""
     return current_user
+
+
+@router.delete("/current", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_current_user(
+    current_user: CurrentUser, user_service: Annotated[UsersService, Depends(user_deletion_service)]
+):
+    """Delete current user with all videos."""
+    await user_service.delete(current_user)
@@ -1,6 +1,16 @@
+import asyncio
+from pathlib import Path
+
 import pytest
 from httpx import AsyncClient
-
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from src.auth.repository import AuthRepository
+from src.auth.service import AuthService
+from src.database.core import Base
+from src.main import app
+from src.repository import get_s3_repo
+from src.users.repository import UserRepository
 from src.users.schemas import UserLogin
 from tests.constants import TEST_USER_EMAIL, TEST_USER_PASSWORD
 
@@ -41,6 +51,16 @@ class TestAuthRoutes:
         assert current_user["email"] == self._test_user_email
         assert current_user["username"] == self._test_username
 
+    @pytest.mark.asyncio
+    async def test_current_user_does_not_need_storage(self, client: AsyncClient, logined_user_headers: dict):
+        async def unavailable_storage():
+            raise AssertionError("Storage is resolved for a request that does not use it")
+            yield
+
+        app.dependency_overrides[get_s3_repo] = unavailable_storage
+        response = await client.get("/users/current", headers=logined_user_headers)
+        assert response.status_code == 200, response.text
+
     @pytest.mark.asyncio
     async def test_create_existing_user(self, client: AsyncClient):
         user_data = {"email": self._test_user_email, "username": self._test_username, "password": self._test_password}
@@ -64,3 +84,33 @@ class TestAuthRoutes:
         payload = {"email": email, "password": password}
         response = await client.post("/auth/login", json=payload)
         assert response.status_code == code, response.text
+
+
+class TestSaveToken:
+    @pytest.mark.asyncio
+    async def test_concurrent_saves_keep_one_token_per_user(self, tmp_path: Path):
+        # In-memory test database is a single shared connection, concurrent saves need connections of their own
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'tokens.db'}")
+        session_maker = async_sessionmaker(engine, expire_on_commit=False)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+        users = await UserRepository(session_maker()).create_many(
+            [{"email": f"race-{i}@mail.ru", "username": f"race-{i}", "password": b"-"} for i in range(3)]
+        )
+
+        async def save(user_id: int, attempt: int):
+            service = AuthService(AuthRepository(session_maker()), UserRepository(session_maker()))
+            return await service.save_token(user_id, f"token-{user_id}-{attempt}")
+
+        try:
+            saved = await asyncio.gather(*(save(user.id, attempt) for attempt in range(4) for user in users))
+
+            tokens = AuthRepository(session_maker())
+            for user in users:
+                user_tokens = await tokens.filter(user_id=user.id)
+                assert len(user_tokens) == 1
+                assert user_tokens[0].refresh_token.startswith(f"token-{user.id}-")
+                assert {t.id for t in saved if t.user_id == user.id} == {user_tokens[0].id}
+        finally:
+            await engine.dispose()
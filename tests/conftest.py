@@ -3,7 +3,7 @@ import pytest_asyncio
 from fastapi import Response
 from httpx import ASGITransport, AsyncClient
 
-from src.database.core import get_session
+from src.database.core import get_read_session, get_session
 from src.main import app
 from src.repository import AbstractS3Repository, get_s3_repo
 from tests.fixtures.db import override_get_session
@@ -21,6 +21,7 @@ async def client(prepare_test_db, s3_test_repo: AbstractS3Repository):
         yield s3_test_repo
 
     app.dependency_overrides[get_session] = override_get_session
+    app.dependency_overrides[get_read_session] = override_get_session
     app.dependency_overrides[get_s3_repo] = override_s3_repo
     async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as c:
         yield c
@@ -38,8 +39,16 @@ class BaseTestClass:
     async def post(self, path: str, **kwargs) -> Response:
         return await self._client.post(f"{self.endpoint_prefix}{path}", headers=self._headers, **kwargs)
 
-    async def get(self, path: str, **kwargs) -> Response:
-        return await self._client.get(f"{self.endpoint_prefix}{path}", headers=self._headers, **kwargs)
+    async def get(self, path: str, headers: dict | None = None, **kwargs) -> Response:
+        headers = {**self._headers, **(headers or {})}
+        return await self._client.get(f"{self.endpoint_prefix}{path}", headers=headers, **kwargs)
+
+    async def patch(self, path: str, headers: dict | None = None, **kwargs) -> Response:
+        headers = {**self._headers, **(headers or {})}
+        return await self._client.patch(f"{self.endpoint_prefix}{path}", headers=headers, **kwargs)
+
+    async def delete(self, path: str, **kwargs) -> Response:
+        return await self._client.delete(f"{self.endpoint_prefix}{path}", headers=self._headers, **kwargs)
 
     def assert_response_ok(self, response: Response, expected_code: int = 200):
         assert response.status_code == expected_code, response.text
@@ -51,7 +51,7 @@ async def existing_video(
 ) -> AsyncGenerator[Videos, None]:
     """Создаёт тестовыую игру всеми тестами"""
     async for session in override_get_session():
-        video = Videos(title="pek", path="video.mp4", user_id=exsisting_user.id, game_id=existing_game.id)
+        video = Videos(title="pek", key="video.mp4", user_id=exsisting_user.id, game_id=existing_game.id)
         session.add(video)
         await session.commit()
         await session.refresh(video)
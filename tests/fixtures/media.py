@@ -0,0 +1,67 @@
+import struct
+
+from src.uploads import media
+
+
+def mp4_box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), box_type) + payload
+
+
+def mp4_ftyp() -> bytes:
+    return mp4_box(b"ftyp", b"isom" + bytes(4) + b"isomiso2avc1mp41")
+
+
+def mp4_mdat_header(size: int) -> bytes:
+    """Заголовок mdat с 64-битным размером, данные пишутся отдельно"""
+    return struct.pack(">I4sQ", 1, b"mdat", 16 + size)
+
+
+def mp4_mdia(handler: bytes, sample_entry: bytes) -> bytes:
+    hdlr = struct.pack(">B3xI4s12x", 0, 0, handler) + b"Handler\x00"
+    stsd = struct.pack(">B3xI", 0, 1) + mp4_box(sample_entry, bytes(78))
+    stbl = mp4_box(b"stbl", mp4_box(b"stsd", stsd) + mp4_box(b"stsz", bytes(1024)))
+    return mp4_box(b"mdia", mp4_box(b"hdlr", hdlr) + mp4_box(b"minf", stbl))
+
+
+def mp4_moov(duration: float, width: int, height: int, codec: bytes = b"avc1", timescale: int = 1000) -> bytes:
+    def track(handler: bytes, sample_entry: bytes, track_width: int, track_height: int) -> bytes:
+        tkhd = bytes(4 + 20 + 8 + 8 + 36) + struct.pack(">II", track_width << 16, track_height << 16)
+        return mp4_box(b"trak", mp4_box(b"tkhd", tkhd) + mp4_mdia(handler, sample_entry))
+
+    mvhd = struct.pack(">B3xIIII", 0, 0, 0, timescale, int(duration * timescale)) + bytes(80)
+    audio = track(b"soun", b"mp4a", 0, 0)
+    video = track(b"vide", codec, width, height)
+    return mp4_box(b"moov", mp4_box(b"mvhd", mvhd) + audio + video)
+
+
+def build_mp4(duration: float, width: int, height: int, codec: bytes = b"avc1", moov_at_end: bool = False) -> bytes:
+    moov = mp4_moov(duration, width, height, codec)
+    mdat = mp4_mdat_header(256) + bytes(256)
+    return mp4_ftyp() + (mdat + moov if moov_at_end else moov + mdat)
+
+
+def ebml(element_id: int, data: bytes = b"", unknown_size: bool = False) -> bytes:
+    id_bytes = element_id.to_bytes((element_id.bit_length() + 7) // 8, "big")
+    size = b"\x01" + b"\xff" * 7 if unknown_size else ((1 << 56) | len(data)).to_bytes(8, "big")
+    return id_bytes + size + data
+
+
+def webm_header(duration: float, width: int, height: int, codec: str = "V_VP9") -> bytes:
+    """EBML заголовок, Info и Tracks. Segment и Cluster неизвестного размера, как пишет MediaRecorder"""
+    info = ebml(media.MKV_TIMECODE_SCALE, (1_000_000).to_bytes(3, "big")) + ebml(
+        media.MKV_DURATION, struct.pack(">d", duration * 1000)
+    )
+    video = ebml(media.MKV_PIXEL_WIDTH, width.to_bytes(2, "big")) + ebml(media.MKV_PIXEL_HEIGHT, height.to_bytes(2, "big"))
+    audio_track = ebml(media.MKV_TRACK_TYPE, b"\x02") + ebml(media.MKV_CODEC_ID, b"A_OPUS")
+    video_track = (
+        ebml(media.MKV_TRACK_TYPE, b"\x01") + ebml(media.MKV_CODEC_ID, codec.encode()) + ebml(media.MKV_VIDEO, video)
+    )
+    tracks = ebml(media.MKV_TRACK_ENTRY, audio_track) + ebml(media.MKV_TRACK_ENTRY, video_track)
+
+    header = ebml(media.EBML_HEADER, ebml(media.EBML_DOC_TYPE, b"webm"))
+    segment = ebml(media.MKV_SEGMENT, unknown_size=True)
+    return header + segment + ebml(media.MKV_INFO, info) + ebml(media.MKV_TRACKS, tracks)
+
+
+def build_webm(duration: float, width: int, height: int, codec: str = "V_VP9") -> bytes:
+    return webm_header(duration, width, height, codec) + ebml(media.MKV_CLUSTER, unknown_size=True) + bytes(256)
@@ -1,16 +1,20 @@
-from collections.abc import AsyncGenerator
+import hashlib
+import os
+import shutil
+import uuid
+from collections.abc import AsyncGenerator, AsyncIterator
+from datetime import UTC, datetime
 from pathlib import Path
 
 import pytest  # noqa: F401
 import pytest_asyncio
 
-from src.repository import AbstractS3Repository
-from tests.constants import TEST_DATA_DIR
+from src.repository import AbstractS3Repository, FileStream, StoredObject, parse_byte_range
 
 
 @pytest_asyncio.fixture(scope="function")
-async def s3_test_repo() -> AsyncGenerator[AbstractS3Repository, None]:
-    repo = LocalFolderRepository(folder_path=TEST_DATA_DIR)
+async def s3_test_repo(tmp_path: Path) -> AsyncGenerator[AbstractS3Repository, None]:
+    repo = LocalFolderRepository(folder_path=tmp_path / "s3")
     yield repo
 
 
@@ -27,8 +31,46 @@ class LocalFolderRepository(AbstractS3Repository):
             raise FileNotFoundError(f"No such file: {file_path}")
         return file_path.read_bytes()
 
-    async def get_all(self) -> list[str]:
-        return [f.name for f in self.folder_path.iterdir() if f.is_file()]
+    async def stream_file(self, key: str, byte_range: str | None = None, chunk_size: int = 4) -> FileStream:
+        file_path = self.folder_path / key
+        size = file_path.stat().st_size
+        start, end = parse_byte_range(byte_range, size) if byte_range else (0, size - 1)
+
+        async def body():
+            with file_path.open("rb") as f:
+                f.seek(start)
+                remaining = end - start + 1
+                while remaining > 0 and (chunk := f.read(min(chunk_size, remaining))):
+                    remaining -= len(chunk)
+                    yield chunk
+
+        return FileStream(
+            body=body(),
+            content_length=end - start + 1,
+            content_range=f"bytes {start}-{end}/{size}" if byte_range else None,
+            etag=hashlib.md5(file_path.read_bytes()).hexdigest(),
+            last_modified=datetime.fromtimestamp(file_path.stat().st_mtime, UTC),
+        )
+
+    async def get_all(self, prefix: str = "") -> list[str]:
+        return [obj.key async for obj in self.iter_objects(prefix)]
+
+    async def iter_objects(self, prefix: str = "", page_size: int = 1000) -> AsyncIterator[StoredObject]:
+        """Обходит файлы по одному, как постраничный листинг S3. Незавершённые multipart загрузки пропускает"""
+        for root, dirs, files in os.walk(self.folder_path):
+            dirs[:] = sorted(d for d in dirs if d != ".multipart")
+            for name in sorted(files):
+                file_path = Path(root) / name
+                key = file_path.relative_to(self.folder_path).as_posix()
+                if not key.startswith(prefix):
+                    continue
+                stat = file_path.stat()
+                yield StoredObject(
+                    key=key,
+                    size=stat.st_size,
+                    etag=hashlib.md5(file_path.read_bytes()).hexdigest(),
+                    last_modified=datetime.fromtimestamp(stat.st_mtime, UTC),
+                )
 
     async def upload_file(self, file_obj, object_name: str) -> str:
         file_path = self.folder_path / object_name
@@ -40,13 +82,68 @@ class LocalFolderRepository(AbstractS3Repository):
         data = file_obj.read()
 
         file_path.write_bytes(data)
-        return str(file_path.resolve())
+        return self.object_url(object_name)
 
     async def delete_file(self, object_name: str):
         file_path = self.folder_path / object_name
         if file_path.exists():
             file_path.unlink()
 
+    async def delete_files(self, keys: list[str]) -> list[str]:
+        for key in keys:
+            await self.delete_file(key)
+        return []
+
+    async def head_file(self, key: str) -> dict | None:
+        file_path = self.folder_path / key
+        if not file_path.is_file():
+            return None
+        return {"size": file_path.stat().st_size, "etag": hashlib.md5(file_path.read_bytes()).hexdigest()}
+
+    async def generate_upload_url(self, key: str, expires_in: int = 0) -> str:
+        """Вместо presigned URL отдаёт путь, по которому тест сам положит файл"""
+        (self.folder_path / key).parent.mkdir(parents=True, exist_ok=True)
+        self._last_file_path = self.folder_path / key
+        return self.object_url(key)
+
+    async def create_multipart_upload(self, key: str) -> str:
+        upload_id = uuid.uuid4().hex
+        self._multipart_dir(upload_id).mkdir(parents=True)
+        return upload_id
+
+    async def generate_upload_part_urls(self, key: str, upload_id: str, parts_count: int, expires_in: int = 0):
+        return [str((self._multipart_dir(upload_id) / str(n)).resolve()) for n in range(1, parts_count + 1)]
+
+    async def upload_part(self, object_name: str, upload_id: str, part_number: int, body: bytes) -> dict:
+        (self._multipart_dir(upload_id) / str(part_number)).write_bytes(body)
+        return {"ETag": hashlib.md5(body).hexdigest(), "PartNumber": part_number}
+
+    async def complete_multipart_upload(self, key: str, upload_id: str, parts: list[dict] | None = None) -> bool:
+        parts_dir = self._multipart_dir(upload_id)
+        if not any(parts_dir.iterdir()):
+            return False
+
+        file_path = self.folder_path / key
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        with file_path.open("wb") as f:
+            for part in sorted(parts_dir.iterdir(), key=lambda p: int(p.name)):
+                f.write(part.read_bytes())
+        shutil.rmtree(parts_dir)
+        self._last_file_path = file_path
+        return True
+
+    async def abort_multipart_upload(self, key: str, upload_id: str):
+        shutil.rmtree(self._multipart_dir(upload_id), ignore_errors=True)
+
+    def object_url(self, key: str) -> str:
+        return str((self.folder_path / key).resolve())
+
+    def object_key(self, url: str) -> str:
+        return Path(url).relative_to(self.folder_path.resolve()).as_posix()
+
+    def _multipart_dir(self, upload_id: str) -> Path:
+        return self.folder_path / ".multipart" / upload_id
+
     @property
     def url(self) -> str:
         return str(self.folder_path.resolve())
@@ -0,0 +1,125 @@
+import asyncio
+import io
+from pathlib import Path
+
+import pytest
+
+from src import config
+from src.cache import DiskCache
+from src.repository import CachedS3Repository, create_storage_repository
+from tests.fixtures.s3 import LocalFolderRepository
+
+
+class CountingRepository(LocalFolderRepository):
+    """Локальное хранилище, которое считает чтения и отдаёт данные с задержкой, как сеть"""
+
+    def __init__(self, folder_path: Path):
+        super().__init__(folder_path)
+        self.fetches = 0
+
+    async def stream_file(self, key: str, byte_range: str | None = None, chunk_size: int = 4):
+        self.fetches += 1
+        await asyncio.sleep(0.01)
+        return await super().stream_file(key, byte_range, chunk_size)
+
+
+def make_repo(tmp_path: Path, max_bytes: int = 1024, **kwargs) -> tuple[CachedS3Repository, CountingRepository]:
+    origin = CountingRepository(tmp_path / "origin")
+    cache = DiskCache(tmp_path / "cache", max_bytes=max_bytes)
+    return CachedS3Repository(origin, cache, **kwargs), origin
+
+
+async def read(repo: CachedS3Repository, key: str, byte_range: str | None = None) -> bytes:
+    stream = await repo.stream_file(key, byte_range)
+    return b"".join([chunk async for chunk in stream.body])
+
+
+class TestCachedS3Repository:
+    @pytest.mark.asyncio
+    async def test_second_read_is_served_from_disk(self, tmp_path: Path):
+        repo, origin = make_repo(tmp_path)
+        await origin.upload_file(io.BytesIO(b"0123456789"), "v.mp4")
+
+        assert await read(repo, "v.mp4") == b"0123456789"
+        assert await read(repo, "v.mp4", "bytes=2-4") == b"234"
+        assert await repo.get_file("v.mp4") == b"0123456789"
+
+        assert origin.fetches == 1
+        assert (repo._cache.stats.hits, repo._cache.stats.misses) == (2, 1)
+
+    @pytest.mark.asyncio
+    async def test_range_miss_is_served_from_origin(self, tmp_path: Path):
+        repo, origin = make_repo(tmp_path)
+        await origin.upload_file(io.BytesIO(b"0123456789"), "v.mp4")
+
+        stream = await repo.stream_file("v.mp4", "bytes=2-4")
+        assert stream.content_range == "bytes 2-4/10"
+        assert b"".join([chunk async for chunk in stream.body]) == b"234"
+        assert await read(repo, "v.mp4", "bytes=5-6") == b"56"
+
+        await asyncio.gather(*repo._cache._background_fills.values())
+        assert await read(repo, "v.mp4", "bytes=7-") == b"789"
+        assert origin.fetches == 3
+        assert (repo._cache.stats.hits, repo._cache.stats.misses) == (1, 1)
+
+    @pytest.mark.asyncio
+    async def test_purged_files_are_not_served_from_cache(self, tmp_path: Path, monkeypatch):
+        monkeypatch.setattr(config, "STORAGE_BACKEND", "local")
+        monkeypatch.setattr(config, "LOCAL_STORAGE_DIR", tmp_path / "storage")
+        repo = create_storage_repository(None, DiskCache(tmp_path / "cache", max_bytes=1024))
+        assert isinstance(repo, CachedS3Repository)
+
+        await repo.upload_file(io.BytesIO(b"purged"), "v.mp4")
+        assert await read(repo, "v.mp4") == b"purged"
+        assert await repo.delete_files(["v.mp4"]) == []
+        with pytest.raises(FileNotFoundError):
+            await read(repo, "v.mp4")
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_fetch_once(self, tmp_path: Path):
+        repo, origin = make_repo(tmp_path)
+        await origin.upload_file(io.BytesIO(b"hot video"), "hot.mp4")
+
+        results = await asyncio.gather(*(read(repo, "hot.mp4") for _ in range(10)))
+
+        assert results == [b"hot video"] * 10
+        assert origin.fetches == 1
+
+    @pytest.mark.asyncio
+    async def test_changed_etag_is_refetched(self, tmp_path: Path):
+        repo, origin = make_repo(tmp_path, revalidate_after=0)
+        await origin.upload_file(io.BytesIO(b"old"), "v.mp4")
+        assert await read(repo, "v.mp4") == b"old"
+
+        assert await read(repo, "v.mp4") == b"old"
+        assert repo._cache.stats.revalidations == 1
+
+        await origin.upload_file(io.BytesIO(b"new"), "v.mp4")
+        assert await read(repo, "v.mp4") == b"new"
+        assert origin.fetches == 2
+
+    @pytest.mark.asyncio
+    async def test_least_recently_used_is_evicted(self, tmp_path: Path):
+        repo, origin = make_repo(tmp_path, max_bytes=10)
+        for key in ("a", "b", "c"):
+            await origin.upload_file(io.BytesIO(b"x" * 4), key)
+
+        await read(repo, "a")
+        await read(repo, "b")
+        await read(repo, "a")
+        await read(repo, "c")
+
+        assert repo._cache.get("b") is None
+        assert repo._cache.get("a") is not None
+        assert repo._cache.used_bytes == 8
+        assert repo._cache.stats.evictions == 1
+
+    @pytest.mark.asyncio
+    async def test_large_object_bypasses_cache(self, tmp_path: Path):
+        repo, origin = make_repo(tmp_path, max_object_size=4)
+        await origin.upload_file(io.BytesIO(b"too large"), "big.mp4")
+
+        assert await read(repo, "big.mp4") == b"too large"
+        assert await read(repo, "big.mp4") == b"too large"
+        assert origin.fetches == 2
+        assert repo._cache.used_bytes == 0
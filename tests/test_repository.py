@@ -0,0 +1,353 @@
+import io
+from pathlib import Path
+
+import pytest
+from botocore.exceptions import ClientError
+from sqlalchemy.orm.exc import DetachedInstanceError
+
+from src.cache import MemoryQueryCache
+from src.errors import BulkWriteError, PresignedUploadsNotSupportedError, StorageError, UniqueConstraintViolation
+from src.repository import LocalStorageRepository, S3Repository
+from src.uploads.repository import GameRow, GamesRepository
+from src.uploads.schemas import GameCreate
+from src.users.repository import UserRepository
+from tests.fixtures.db import async_session_maker
+
+
+class FakeS3Client:
+    """Минимальный S3 клиент в памяти для проверки multipart загрузки"""
+
+    def __init__(self, failing_parts: dict[int, int] | None = None):
+        self.failing_parts = failing_parts or {}
+        self.objects: dict[str, bytes] = {}
+        self.uploads: dict[str, dict[int, bytes]] = {}
+        self.aborted: list[str] = []
+        self.put_calls = 0
+        self.list_calls = 0
+        self.delete_calls: list[int] = []
+        self.undeletable: set[str] = set()
+
+    async def put_object(self, Bucket: str, Key: str, Body):
+        self.put_calls += 1
+        self.objects[Key] = Body.read()
+
+    async def create_multipart_upload(self, Bucket: str, Key: str):
+        upload_id = f"upload-{len(self.uploads) + 1}"
+        self.uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    async def upload_part(self, Bucket: str, Key: str, UploadId: str, PartNumber: int, Body: bytes):
+        if self.failing_parts.get(PartNumber, 0) > 0:
+            self.failing_parts[PartNumber] -= 1
+            raise ClientError({"Error": {"Code": "InternalError", "Message": "boom"}}, "UploadPart")
+        self.uploads[UploadId][PartNumber] = Body
+        return {"ETag": f'"etag-{PartNumber}"'}
+
+    async def complete_multipart_upload(self, Bucket: str, Key: str, UploadId: str, MultipartUpload: dict):
+        parts = self.uploads.pop(UploadId)
+        self.objects[Key] = b"".join(parts[p["PartNumber"]] for p in MultipartUpload["Parts"])
+
+    async def abort_multipart_upload(self, Bucket: str, Key: str, UploadId: str):
+        self.uploads.pop(UploadId, None)
+        self.aborted.append(UploadId)
+
+    async def delete_objects(self, Bucket: str, Delete: dict):
+        self.delete_calls.append(len(Delete["Objects"]))
+        errors = []
+        for obj in Delete["Objects"]:
+            if obj["Key"] in self.undeletable:
+                errors.append({"Key": obj["Key"], "Code": "AccessDenied"})
+            else:
+                self.objects.pop(obj["Key"], None)
+        return {"Errors": errors} if errors else {}
+
+    def get_paginator(self, operation_name: str):
+        return FakeListObjectsPaginator(self)
+
+
+class FakeListObjectsPaginator:
+    def __init__(self, client: FakeS3Client):
+        self.client = client
+
+    async def paginate(self, Bucket: str, Prefix: str, PaginationConfig: dict):
+        keys = sorted(key for key in self.client.objects if key.startswith(Prefix))
+        page_size = PaginationConfig["PageSize"]
+        for start in range(0, len(keys), page_size):
+            self.client.list_calls += 1
+            page = keys[start : start + page_size]
+            yield {"Contents": [{"Key": k, "Size": len(self.client.objects[k]), "ETag": f'"{k}"'} for k in page]}
+
+
+def make_repo(client: FakeS3Client, **kwargs) -> S3Repository:
+    return S3Repository(
+        client=client,
+        endpoint_url="http://s3.test",
+        bucket_name="bucket",
+        multipart_threshold=10,
+        multipart_chunk_size=4,
+        multipart_concurrency=2,
+        **kwargs,
+    )
+
+
+class TestS3MultipartUpload:
+    @pytest.mark.asyncio
+    async def test_small_file_uses_single_put(self):
+        client = FakeS3Client()
+        url = await make_repo(client).upload_file(io.BytesIO(b"tiny"), "a/b.mp4")
+
+        assert url == "http://s3.test/bucket/a/b.mp4"
+        assert client.put_calls == 1
+        assert client.objects["a/b.mp4"] == b"tiny"
+
+    @pytest.mark.asyncio
+    async def test_large_file_uploaded_in_parts(self):
+        client = FakeS3Client()
+        data = bytes(range(50))
+        await make_repo(client).upload_file(io.BytesIO(data), "big.mp4")
+
+        assert client.put_calls == 0
+        assert client.objects["big.mp4"] == data
+        assert client.uploads == {}
+
+    @pytest.mark.asyncio
+    async def test_failed_part_is_retried(self):
+        client = FakeS3Client(failing_parts={3: 1})
+        data = bytes(range(50))
+        await make_repo(client, multipart_max_attempts=2).upload_file(io.BytesIO(data), "retry.mp4")
+
+        assert client.objects["retry.mp4"] == data
+        assert client.aborted == []
+
+    @pytest.mark.asyncio
+    async def test_exhausted_retries_abort_upload(self):
+        client = FakeS3Client(failing_parts={2: 5})
+        await make_repo(client, multipart_max_attempts=2).upload_file(io.BytesIO(bytes(50)), "broken.mp4")
+
+        assert "broken.mp4" not in client.objects
+        assert client.aborted == ["upload-1"]
+        assert client.uploads == {}
+
+
+class TestS3ListObjects:
+    @pytest.mark.asyncio
+    async def test_follows_pages_past_first(self):
+        client = FakeS3Client()
+        client.objects = {f"1/videos/{i:04}.mp4": bytes(i) for i in range(25)}
+
+        objects = [obj async for obj in make_repo(client).iter_objects(page_size=10)]
+
+        assert [obj.key for obj in objects] == sorted(client.objects)
+        assert objects[7].size == 7
+        assert objects[7].etag == '"1/videos/0007.mp4"'
+        assert client.list_calls == 3
+
+    @pytest.mark.asyncio
+    async def test_prefix_filter_and_laziness(self):
+        client = FakeS3Client()
+        client.objects = {**{f"1/videos/{i}.mp4": b"" for i in range(5)}, "2/videos/a.mp4": b""}
+        repo = make_repo(client)
+
+        assert await repo.get_all(prefix="2/videos/") == ["2/videos/a.mp4"]
+
+        client.list_calls = 0
+        objects = repo.iter_objects(prefix="1/videos/", page_size=2)
+        await anext(objects)
+        await objects.aclose()
+        assert client.list_calls == 1
+
+
+class TestS3DeleteFiles:
+    @pytest.mark.asyncio
+    async def test_keys_are_deleted_in_batches_of_1000(self, caplog):
+        client = FakeS3Client()
+        client.objects = {f"k{i}": b"" for i in range(2500)}
+        client.undeletable = {"k7"}
+
+        failed = await make_repo(client).delete_files(list(client.objects))
+
+        assert failed == ["k7"]
+        assert client.delete_calls == [1000, 1000, 500]
+        assert list(client.objects) == ["k7"]
+        assert [r.getMessage() for r in caplog.records] == ["Failed to delete 1 objects, first 'k7': AccessDenied"]
+
+
+class TestLocalStorageRepository:
+    @pytest.mark.asyncio
+    async def test_upload_and_stream_range(self, tmp_path: Path):
+        repo = LocalStorageRepository(tmp_path, copy_chunk_size=3)
+        url = await repo.upload_file(io.BytesIO(b"0123456789"), "1/videos/a/a.mp4")
+
+        assert repo.object_key(url) == "1/videos/a/a.mp4"
+        assert [p.name for p in (tmp_path / "1/videos/a").iterdir()] == ["a.mp4"]
+
+        stream = await repo.stream_file("1/videos/a/a.mp4", "bytes=3-5", chunk_size=2)
+        assert b"".join([chunk async for chunk in stream.body]) == b"345"
+        assert (stream.path, stream.offset, stream.content_length) == (tmp_path / "1/videos/a/a.mp4", 3, 3)
+        assert stream.content_range == "bytes 3-5/10"
+        assert stream.content_type == "video/mp4"
+        assert stream.etag == (await repo.head_file("1/videos/a/a.mp4"))["etag"]
+
+    @pytest.mark.asyncio
+    async def test_multipart_upload(self, tmp_path: Path):
+        repo = LocalStorageRepository(tmp_path)
+        upload_id = await repo.create_multipart_upload("v.mp4")
+        parts = [await repo.upload_part("v.mp4", upload_id, n, chunk) for n, chunk in ((1, b"ab"), (2, b"cd"))]
+
+        assert [obj.key async for obj in repo.iter_objects()] == []
+        assert await repo.complete_multipart_upload("v.mp4", upload_id, parts)
+        assert await repo.get_file("v.mp4") == b"abcd"
+        assert [obj.key async for obj in repo.iter_objects()] == ["v.mp4"]
+
+    @pytest.mark.asyncio
+    async def test_rejects_keys_outside_root_and_presigned_uploads(self, tmp_path: Path):
+        repo = LocalStorageRepository(tmp_path / "storage")
+
+        with pytest.raises(StorageError):
+            await repo.upload_file(io.BytesIO(b"x"), "../escape.mp4")
+        with pytest.raises(PresignedUploadsNotSupportedError):
+            await repo.generate_upload_url("v.mp4")
+
+
+def user_rows(*names: str, password: bytes = b"-") -> list[dict]:
+    return [{"email": f"{name}@bulk.test", "username": f"bulk-{name}", "password": password} for name in names]
+
+
+class TestAlchemyBulkWrites:
+    @pytest.mark.asyncio
+    async def test_create_many_in_batches(self):
+        users = await UserRepository(async_session_maker()).create_many(user_rows("a", "b", "c", "d", "e"), batch_size=2)
+        assert sorted(u.username for u in users) == ["bulk-a", "bulk-b", "bulk-c", "bulk-d", "bulk-e"]
+        assert all(u.id for u in users)
+
+    @pytest.mark.asyncio
+    async def test_create_many_reports_rejected_rows(self):
+        repository = UserRepository(async_session_maker())
+        await repository.create_many(user_rows("taken"))
+
+        with pytest.raises(BulkWriteError) as e:
+            await repository.create_many(user_rows("f", "taken", "g", "f"), batch_size=3)
+
+        assert sorted(e.value.errors) == [1, 3]
+        assert isinstance(e.value.errors[1], UniqueConstraintViolation)
+        assert e.value.errors[1].value in ("taken@bulk.test", "bulk-taken")
+        assert await repository.filter(email="g@bulk.test") == []
+
+    @pytest.mark.asyncio
+    async def test_upsert_many(self):
+        repository = UserRepository(async_session_maker())
+        await repository.create_many(user_rows("h", "i"))
+
+        users = await repository.upsert_many(
+            [*user_rows("h", "j", password=b"new"), *user_rows("i", password=b"newer")],
+            conflict_fields=["email"],
+            update_fields=["password"],
+            batch_size=2,
+        )
+        assert sorted((u.username, u.password) for u in users) == [
+            ("bulk-h", b"new"),
+            ("bulk-i", b"newer"),
+            ("bulk-j", b"new"),
+        ]
+
+        users = await repository.upsert_many(user_rows("h", "k"), conflict_fields=["email"], update_fields=[])
+        assert [u.username for u in users] == ["bulk-k"]
+        assert (await repository.filter(email="h@bulk.test", first=True)).password == b"new"
+
+    @pytest.mark.asyncio
+    async def test_upsert_many_reports_rejected_rows_by_input_index(self):
+        repository = UserRepository(async_session_maker())
+        await repository.create_many(user_rows("upsert-taken"))
+        rows = [*user_rows("l", "l", "m"), {"email": "n@bulk.test", "username": "bulk-upsert-taken", "password": b"-"}]
+
+        with pytest.raises(BulkWriteError) as e:
+            await repository.upsert_many(rows, conflict_fields=["email"], update_fields=["password"], batch_size=2)
+
+        assert list(e.value.errors) == [3]
+        assert e.value.errors[3].value == "bulk-upsert-taken"
+
+
+class TestAlchemyQueryCache:
+    @pytest.mark.asyncio
+    async def test_repeated_reads_are_cached_until_write(self):
+        repository = UserRepository(async_session_maker())
+        repository.cache = cache = MemoryQueryCache(max_entries=10, ttl=60)
+        await repository.create_many(user_rows("cached"))
+
+        first = await repository.filter(email="cached@bulk.test", first=True)
+        second = await repository.filter(email="cached@bulk.test", first=True)
+        assert second is not first
+        assert second.username == "bulk-cached"
+        assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+        assert cache.used_bytes > 0
+
+        await repository.update_or_create(
+            {"email": "cached@bulk.test"}, {"username": "bulk-cached", "password": b"changed"}
+        )
+        assert (await repository.filter(email="cached@bulk.test", first=True)).password == b"changed"
+        await repository.delete_by(email="cached@bulk.test")
+        assert await repository.filter(email="cached@bulk.test", first=True) is None
+        assert (cache.stats.hits, cache.stats.misses) == (1, 3)
+
+    @pytest.mark.asyncio
+    async def test_games_are_invalidated_by_user_writes(self):
+        cache = MemoryQueryCache(max_entries=10, ttl=60)
+        games, users = GamesRepository(async_session_maker()), UserRepository(async_session_maker())
+        games.cache = users.cache = cache
+
+        [user] = await users.create_many(user_rows("player"))
+        game = await games.create_one(user, GameCreate(title="Cached game"))
+        assert [u.id for u in (await games.filter(id=game.id, first=True, load_users=True)).users] == [user.id]
+        await games.filter(id=game.id, first=True, load_users=True)
+        assert cache.stats.hits == 1
+
+        await users.delete_by(id=user.id)
+        assert (await games.filter(id=game.id, first=True, load_users=True)).users == []
+
+
+class TestListProjections:
+    @pytest.mark.asyncio
+    async def test_games_are_listed_without_users(self):
+        repository = GamesRepository(async_session_maker())
+        [user] = await UserRepository(async_session_maker()).create_many(user_rows("lister"))
+        game = await repository.create_one(user, GameCreate(title="Projected game"))
+
+        page = await repository.filter_page(limit=100)
+        assert GameRow(id=game.id, title="Projected game", videos_count=0) in page.items
+
+        game = await repository.filter(id=game.id, first=True)
+        with pytest.raises(DetachedInstanceError):
+            assert game.users
+        assert [u.id for u in (await repository.filter(id=game.id, first=True, load_users=True)).users] == [user.id]
+
+
+class TestMemoryQueryCache:
+    @pytest.mark.asyncio
+    async def test_least_recently_used_is_evicted(self):
+        cache = MemoryQueryCache(max_entries=2, ttl=60)
+        await cache.set("a", b"1", ("users",))
+        await cache.set("b", b"2", ("users",))
+        await cache.get("a")
+        await cache.set("c", b"3", ("games",))
+
+        assert await cache.get("b") is None
+        assert await cache.get("a") == b"1"
+        assert cache.stats.evictions == 1
+        assert cache.used_bytes == len("a1c3")
+
+    @pytest.mark.asyncio
+    async def test_expired_and_invalidated_entries_are_dropped(self):
+        cache = MemoryQueryCache(max_entries=10, ttl=0)
+        await cache.set("a", b"1", ("users",))
+        assert await cache.get("a") is None
+
+        cache.ttl = 60
+        await cache.set("b", b"2", ("games", "users"))
+        await cache.set("c", b"3", ("games",))
+        await cache.invalidate(("users",))
+
+        assert await cache.generations(("games", "users")) == (0, 1)
+        assert await cache.get("b") is None
+        assert await cache.get("c") == b"3"
+        assert len(cache) == 1
+        assert cache.stats.hit_ratio == 1 / 3
@@ -0,0 +1,56 @@
+from pathlib import Path
+
+import pytest
+
+from src.responses import FileRangeResponse
+
+
+async def call(response: FileRangeResponse, extensions: dict | None = None) -> list[dict]:
+    messages = []
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict):
+        if message["type"] == "http.response.zerocopysend":
+            f = message["file"]
+            f.seek(message["offset"])
+            message = {**message, "file": f.read(message["count"])}
+        messages.append(message)
+
+    scope = {"type": "http", "method": "GET", "extensions": extensions or {}}
+    await response(scope, receive, send)
+    return messages
+
+
+class TestFileRangeResponse:
+    @pytest.fixture
+    def video(self, tmp_path: Path) -> Path:
+        path = tmp_path / "video.mp4"
+        path.write_bytes(b"0123456789")
+        return path
+
+    @pytest.mark.asyncio
+    async def test_chunks_without_zero_copy_support(self, video: Path):
+        messages = await call(FileRangeResponse(video, offset=2, length=5, status_code=206, chunk_size=2))
+
+        assert messages[0]["status"] == 206
+        assert [m["body"] for m in messages[1:]] == [b"23", b"45", b"6"]
+        assert messages[-1]["more_body"] is False
+
+    @pytest.mark.asyncio
+    async def test_zerocopysend(self, video: Path):
+        messages = await call(FileRangeResponse(video, offset=4, length=3), {"http.response.zerocopysend": {}})
+
+        assert messages[1]["type"] == "http.response.zerocopysend"
+        assert messages[1]["file"] == b"456"
+
+    @pytest.mark.asyncio
+    async def test_pathsend_only_for_whole_file(self, video: Path):
+        extensions = {"http.response.pathsend": {}}
+
+        messages = await call(FileRangeResponse(video, offset=0, length=10), extensions)
+        assert messages[1] == {"type": "http.response.pathsend", "path": str(video)}
+
+        messages = await call(FileRangeResponse(video, offset=0, length=4), extensions)
+        assert messages[1]["body"] == b"0123"
@@ -0,0 +1,53 @@
+import io
+
+import pytest
+
+from src.uploads.media import FileMediaReader, VideoMetadata, probe
+from tests.fixtures.media import build_mp4, build_webm, mp4_box, mp4_ftyp, mp4_mdia
+
+
+class TestMediaProbe:
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("moov_at_end", [False, True])
+    async def test_mp4(self, moov_at_end: bool):
+        data = build_mp4(duration=12.5, width=1920, height=1080, codec=b"hvc1", moov_at_end=moov_at_end)
+
+        metadata = await probe(FileMediaReader(io.BytesIO(data)))
+
+        assert metadata == VideoMetadata(container="mp4", codec="hvc1", duration=12.5, width=1920, height=1080)
+
+    @pytest.mark.asyncio
+    async def test_webm(self):
+        data = build_webm(duration=61.0, width=1280, height=720)
+
+        metadata = await probe(FileMediaReader(io.BytesIO(data)))
+
+        assert metadata == VideoMetadata(container="webm", codec="V_VP9", duration=61.0, width=1280, height=720)
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("data", [b"", b"fake mp4 data", build_mp4(1, 2, 2)[:60]])
+    async def test_unknown_or_broken_file(self, data: bytes):
+        assert await probe(FileMediaReader(io.BytesIO(data))) == VideoMetadata()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "moov",
+        [
+            mp4_box(b"mvhd", b""),
+            mp4_box(b"trak", mp4_mdia(b"vide", b"avc1") + mp4_box(b"tkhd", b"")),
+        ],
+        ids=["mvhd", "tkhd"],
+    )
+    async def test_empty_header_box_at_end_of_file(self, moov: bytes):
+        data = mp4_ftyp() + mp4_box(b"moov", moov)
+
+        assert await probe(FileMediaReader(io.BytesIO(data))) == VideoMetadata()
+
+    @pytest.mark.asyncio
+    async def test_skips_media_data(self):
+        data = build_mp4(duration=1, width=2, height=2, moov_at_end=True)
+        reader = FileMediaReader(io.BytesIO(data), block_size=16)
+
+        await probe(reader)
+
+        assert reader.bytes_fetched < len(data)
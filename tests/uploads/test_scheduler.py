@@ -0,0 +1,98 @@
+import asyncio
+
+import jwt
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from src import config
+from src.uploads.errors import UploadLimitExceededError
+from src.uploads.scheduler import UploadScheduler, UploadSchedulerMiddleware
+
+
+class TestUploadScheduler:
+    @pytest.mark.asyncio
+    async def test_waits_for_byte_budget(self):
+        scheduler = UploadScheduler(max_inflight_bytes=100, max_per_user=10, queue_timeout=1)
+        await scheduler.acquire(1, 80)
+
+        waiting = asyncio.create_task(scheduler.acquire(2, 40))
+        await asyncio.sleep(0)
+        assert not waiting.done()
+        assert scheduler.queued == 1
+
+        scheduler.release(1, 80)
+        await waiting
+        assert scheduler.inflight_bytes == 40
+
+    @pytest.mark.asyncio
+    async def test_user_limit_does_not_block_others(self):
+        scheduler = UploadScheduler(max_inflight_bytes=100, max_per_user=1, queue_timeout=1)
+        await scheduler.acquire(1, 10)
+
+        blocked = asyncio.create_task(scheduler.acquire(1, 10))
+        await asyncio.sleep(0)
+        await asyncio.wait_for(scheduler.acquire(2, 10), 0.1)
+
+        assert not blocked.done()
+        scheduler.release(1, 10)
+        await blocked
+        assert scheduler.uploads_of(1) == 1
+
+    @pytest.mark.asyncio
+    async def test_large_upload_is_not_overtaken(self):
+        scheduler = UploadScheduler(max_inflight_bytes=100, max_per_user=10, queue_timeout=1)
+        await scheduler.acquire(1, 60)
+
+        large = asyncio.create_task(scheduler.acquire(2, 100))
+        await asyncio.sleep(0)
+        small = asyncio.create_task(scheduler.acquire(3, 10))
+        await asyncio.sleep(0)
+        assert not small.done()
+
+        scheduler.release(1, 60)
+        await large
+        assert not small.done()
+        scheduler.release(2, 100)
+        await small
+
+    @pytest.mark.asyncio
+    async def test_rejects_after_queue_timeout(self):
+        scheduler = UploadScheduler(max_inflight_bytes=100, max_per_user=1, queue_timeout=0.01, retry_after=7)
+        await scheduler.acquire(1, 10)
+
+        with pytest.raises(UploadLimitExceededError) as e:
+            await scheduler.acquire(1, 10)
+
+        assert e.value.retry_after == 7
+        assert scheduler.queued == 0
+        assert scheduler.uploads_of(1) == 1
+
+
+class TestUploadSchedulerMiddleware:
+    @pytest.mark.asyncio
+    async def test_upload_over_user_limit_gets_429(self):
+        release = asyncio.Event()
+
+        async def endpoint(scope, receive, send):
+            await release.wait()
+            await send({"type": "http.response.start", "status": 201, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        scheduler = UploadScheduler(max_inflight_bytes=1024, max_per_user=1, queue_timeout=0, retry_after=5)
+        app = UploadSchedulerMiddleware(endpoint, scheduler)
+        token = jwt.encode({"id": 1}, config.JWT_SECRET_KEY, algorithm="HS256")
+        headers = {"Authorization": f"Bearer {token}"}
+
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            first = asyncio.create_task(client.post("/uploads/videos", headers=headers, content=b"video"))
+            while not scheduler.uploads_of(1):
+                await asyncio.sleep(0)
+
+            rejected = await client.post("/uploads/videos", headers=headers, content=b"video")
+            release.set()
+            accepted = await first
+
+        assert rejected.status_code == 429
+        assert rejected.headers["Retry-After"] == "5"
+        assert accepted.status_code == 201
+        assert scheduler.inflight_bytes == 0
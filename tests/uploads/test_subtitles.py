@@ -0,0 +1,73 @@
+import random
+
+import pytest
+
+from src.uploads.errors import InvalidSubtitlesError
+from src.uploads.subtitles import Cue, CueIndex, parse_subtitles
+
+SRT = """1
+00:00:01,000 --> 00:00:04,000
+Привет, путник!
+
+2
+00:00:03,500 --> 00:00:06,250
+Осторожно,
+впереди дракон.
+"""
+
+VTT = """WEBVTT
+Kind: captions
+
+NOTE this cue has no hours
+
+intro
+00:01.000 --> 00:04.000 position:10%
+Hello there
+
+00:03.500 --> 00:06.250
+Watch out
+"""
+
+
+class TestParseSubtitles:
+    def test_srt(self):
+        assert parse_subtitles(SRT.encode()) == [
+            Cue(start=1000, end=4000, text="Привет, путник!"),
+            Cue(start=3500, end=6250, text="Осторожно,\nвпереди дракон."),
+        ]
+
+    def test_webvtt(self):
+        cues = parse_subtitles(VTT.replace("\n", "\r\n").encode())
+        assert [(c.start, c.end, c.text) for c in cues] == [(1000, 4000, "Hello there"), (3500, 6250, "Watch out")]
+
+    def test_cp1251_srt(self):
+        assert parse_subtitles(SRT.encode("cp1251"))[0].text == "Привет, путник!"
+
+    def test_not_subtitles(self):
+        with pytest.raises(InvalidSubtitlesError):
+            parse_subtitles(b"\x00\x00\x00\x18ftypmp42")
+
+
+class TestCueIndex:
+    def test_long_cue_overlapping_short_ones_is_found(self):
+        index = CueIndex.from_cues(
+            [Cue(0, 60_000, "music"), Cue(1000, 2000, "a"), Cue(3000, 4000, "b"), Cue(50_000, 51_000, "c")]
+        )
+
+        assert [c.text for c in index.overlapping(3500, 3500)] == ["music", "b"]
+        assert [c.text for c in index.overlapping(2000, 2999)] == ["music"]
+        assert index.overlapping(60_000, 70_000) == []
+
+    def test_matches_linear_scan(self):
+        rng = random.Random(15)
+        cues = []
+        for i in range(2000):
+            start = rng.randrange(0, 3_600_000)
+            cues.append(Cue(start, start + rng.choice([500, 2000, 5000, 120_000]), f"cue {i}"))
+        index = CueIndex.from_bytes(CueIndex.from_cues(cues).to_bytes())
+
+        for _ in range(200):
+            start = rng.randrange(0, 3_600_000)
+            end = start + rng.randrange(0, 10_000)
+            expected = sorted(c.text for c in cues if c.start <= end and c.end > start)
+            assert sorted(c.text for c in index.overlapping(start, end)) == expected
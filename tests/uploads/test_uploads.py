@@ -1,12 +1,28 @@
+import asyncio
+import hashlib
 import io
+from pathlib import Path
 
 import pytest
 from fastapi import Response
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
-from src.repository import AbstractS3Repository
-from src.uploads.models import Games, Videos
+from src import config
+from src.database import core
+from src.database.core import get_read_session
+from src.database.replica import last_writes
+from src.main import app
+from src.repository import AbstractS3Repository, LocalStorageRepository, encode_cursor, get_s3_repo
+from src.uploads.models import Games, StorageTombstones, VideoBlobs, Videos
+from src.uploads.repository import HashingReader, VideoRepository
 from src.uploads.schemas import GameCreate
+from src.uploads.tasks import cleanup_expired_upload_sessions, purge_deleted_files, reconcile_video_counts
 from tests.conftest import BaseTestClass
+from tests.fixtures.db import async_session_maker
+from tests.fixtures.media import build_mp4, build_webm
 
 
 class TestUploadsRoutes(BaseTestClass):
@@ -30,6 +46,301 @@ class TestUploadsRoutes(BaseTestClass):
         assert response.json()["message"] == "Видео загружено и начало обрабатываться"
         assert await s3_test_repo.get_file() == fake_video.getvalue()
 
+    @pytest.mark.asyncio
+    async def test_duplicate_content_is_stored_once(
+        self, setup, existing_game: Games, s3_test_repo: AbstractS3Repository, monkeypatch
+    ):
+        uploaded_keys = []
+        upload_file = s3_test_repo.upload_file
+
+        async def tracked_upload_file(file_obj, object_name: str):
+            uploaded_keys.append(object_name)
+            return await upload_file(file_obj, object_name)
+
+        monkeypatch.setattr(s3_test_repo, "upload_file", tracked_upload_file)
+
+        video_ids = []
+        for title in ("Original", "Reupload"):
+            response = await self.post(
+                "/videos",
+                files={"file": ("same.mp4", io.BytesIO(b"same gameplay bytes"), "video/mp4")},
+                data={"title": title, "game_id": str(existing_game.id)},
+            )
+            self.assert_response_ok(response, 201)
+            video_ids.append(next(v["id"] for v in self.get_json_list(await self.get("/videos")) if v["title"] == title))
+
+        async with async_session_maker() as session:
+            blob = (await session.execute(select(VideoBlobs).where(VideoBlobs.key == uploaded_keys[0]))).scalar_one()
+            assert blob.ref_count == 2
+        await purge_deleted_files(async_session_maker, s3_test_repo)
+        assert not Path(s3_test_repo.object_url(uploaded_keys[1])).exists()
+
+        for video_id in video_ids:
+            response = await self.get(f"/videos/{video_id}/stream")
+            assert response.content == b"same gameplay bytes"
+
+        listed = {v["id"]: v["path"] for v in self.get_json_list(await self.get("/videos"))}
+        path = (await self.get(f"/videos/{video_ids[1]}")).json()["path"]
+        assert path == listed[video_ids[1]] == s3_test_repo.object_url(uploaded_keys[0])
+        assert Path(path).read_bytes() == b"same gameplay bytes"
+
+    @pytest.mark.asyncio
+    async def test_failed_video_upload_leaves_no_file(
+        self, setup, existing_game: Games, s3_test_repo: AbstractS3Repository, monkeypatch
+    ):
+        async def upload(content: bytes, game_id: int) -> Response:
+            files = {"file": ("race.mp4", io.BytesIO(content), "video/mp4")}
+            return await self.post("/videos", files=files, data={"title": "Race", "game_id": str(game_id)})
+
+        async def stored_blobs() -> set[str]:
+            return {obj.key async for obj in s3_test_repo.iter_objects("blobs/")}
+
+        blobs = await stored_blobs()
+        self.assert_response_ok(await upload(b"race bytes", 999_999), 404)
+        assert await stored_blobs() == blobs
+
+        self.assert_response_ok(await upload(b"race bytes", existing_game.id), 201)
+        blobs = await stored_blobs()
+
+        # The same title uploaded concurrently passes the key check and fails on commit
+        monkeypatch.setattr(VideoRepository, "exists", lambda self, key: asyncio.sleep(0, False))
+        with pytest.raises(IntegrityError):
+            await upload(b"other race bytes", existing_game.id)
+        assert await stored_blobs() == blobs
+
+    @pytest.mark.asyncio
+    async def test_video_upload_extracts_metadata(self, setup, existing_game: Games):
+        data = build_mp4(duration=90, width=1280, height=720, moov_at_end=True)
+
+        response = await self.post(
+            "/videos",
+            files={"file": ("gameplay.mp4", io.BytesIO(data), "video/mp4")},
+            data={"title": "WithMetadata", "game_id": str(existing_game.id)},
+        )
+        self.assert_response_ok(response, 201)
+
+        video = next(v for v in self.get_json_list(await self.get("/videos")) if v["title"] == "WithMetadata")
+        assert (video["container"], video["codec"], video["duration"]) == ("mp4", "avc1", 90)
+        assert (video["width"], video["height"], video["size"]) == (1280, 720, len(data))
+
+    @pytest.mark.asyncio
+    async def test_presigned_upload_extracts_metadata(self, setup, existing_game: Games):
+        data = build_webm(duration=30, width=640, height=360)
+        payload = {"title": "PresignedWebm", "game_id": existing_game.id, "filename": "clip.webm", "size": len(data)}
+        ticket = (await self.post("/videos/presigned", json=payload)).json()
+        Path(ticket["upload_url"]).write_bytes(data)
+
+        response = await self.post(f"/videos/{ticket['video_id']}/complete")
+        self.assert_response_ok(response)
+        video = response.json()
+        assert (video["container"], video["codec"], video["duration"]) == ("webm", "V_VP9", 30)
+        assert (video["width"], video["height"], video["size"]) == (640, 360, len(data))
+
+    @pytest.mark.asyncio
+    async def test_presigned_video_upload(self, setup, existing_game: Games):
+        payload = {"title": "Presigned", "game_id": existing_game.id, "filename": "clip.mp4", "size": 4}
+        response = await self.post("/videos/presigned", json=payload)
+        self.assert_response_ok(response, 201)
+        ticket = response.json()
+        assert ticket["upload_url"] and ticket["part_urls"] is None
+
+        response = await self.post(f"/videos/{ticket['video_id']}/complete")
+        self.assert_response_ok(response, 409)
+
+        Path(ticket["upload_url"]).write_bytes(b"data")
+        response = await self.post(f"/videos/{ticket['video_id']}/complete")
+        self.assert_response_ok(response)
+        assert response.json()["status"] == "uploaded"
+
+    @pytest.mark.asyncio
+    async def test_presigned_multipart_video_upload(
+        self, setup, existing_game: Games, s3_test_repo: AbstractS3Repository, monkeypatch
+    ):
+        monkeypatch.setattr(config, "S3_MULTIPART_THRESHOLD", 1)
+        monkeypatch.setattr(config, "S3_MULTIPART_CHUNK_SIZE", 2)
+
+        payload = {"title": "PresignedParts", "game_id": existing_game.id, "filename": "clip.mp4", "size": 5}
+        response = await self.post("/videos/presigned", json=payload)
+        self.assert_response_ok(response, 201)
+        ticket = response.json()
+        assert ticket["part_size"] == 2 and len(ticket["part_urls"]) == 3
+
+        for url, chunk in zip(ticket["part_urls"], [b"ab", b"cd", b"e"], strict=True):
+            Path(url).write_bytes(chunk)
+
+        response = await self.post(f"/videos/{ticket['video_id']}/complete")
+        self.assert_response_ok(response)
+        assert await s3_test_repo.get_file() == b"abcde"
+
+    @pytest.mark.asyncio
+    async def test_resumable_video_upload(
+        self, setup, existing_game: Games, s3_test_repo: AbstractS3Repository, monkeypatch
+    ):
+        monkeypatch.setattr(config, "UPLOAD_SESSION_MIN_CHUNK_SIZE", 2)
+
+        payload = {"title": "Resumable", "game_id": existing_game.id, "filename": "clip.mp4", "size": 5}
+        response = await self.post("/videos/resumable", json=payload)
+        self.assert_response_ok(response, 201)
+        upload_id = response.json()["id"]
+
+        response = await self.patch(f"/videos/resumable/{upload_id}", headers={"Upload-Offset": "0"}, content=b"ab")
+        self.assert_response_ok(response)
+        assert response.json()["offset"] == 2
+
+        # Повтор уже принятого куска после обрыва связи
+        response = await self.patch(f"/videos/resumable/{upload_id}", headers={"Upload-Offset": "0"}, content=b"ab")
+        self.assert_response_ok(response, 409)
+        assert response.headers["Upload-Offset"] == "2"
+
+        response = await self.get(f"/videos/resumable/{upload_id}")
+        self.assert_response_ok(response)
+        assert response.headers["Upload-Offset"] == "2"
+
+        response = await self.patch(f"/videos/resumable/{upload_id}", headers={"Upload-Offset": "2"}, content=b"c")
+        self.assert_response_ok(response, 400)
+
+        response = await self.patch(f"/videos/resumable/{upload_id}", headers={"Upload-Offset": "2"}, content=b"cde")
+        self.assert_response_ok(response)
+        assert response.json()["completed"] is True
+        assert await s3_test_repo.get_file() == b"abcde"
+
+        response = await self.get(f"/videos/{response.json()['video_id']}")
+        assert response.json()["status"] == "uploaded"
+
+    @pytest.mark.asyncio
+    async def test_expired_upload_sessions_are_cleaned_up(
+        self, setup, existing_game: Games, s3_test_repo: AbstractS3Repository, monkeypatch
+    ):
+        monkeypatch.setattr(config, "UPLOAD_SESSION_TTL_SECONDS", -1)
+
+        payload = {"title": "Abandoned", "game_id": existing_game.id, "filename": "clip.mp4", "size": 5}
+        response = await self.post("/videos/resumable", json=payload)
+        self.assert_response_ok(response, 201)
+        upload_id = response.json()["id"]
+
+        assert await cleanup_expired_upload_sessions(async_session_maker, s3_test_repo) >= 1
+
+        response = await self.get(f"/videos/resumable/{upload_id}")
+        self.assert_response_ok(response, 404)
+        response = await self.get("/videos")
+        assert all(v["title"] != "Abandoned" for v in self.get_json_list(response))
+
+    @pytest.mark.asyncio
+    async def test_stream_video_ranges(self, setup, existing_game: Games):
+        payload = {"title": "Streamed", "game_id": existing_game.id, "filename": "clip.mp4", "size": 10}
+        ticket = (await self.post("/videos/presigned", json=payload)).json()
+        Path(ticket["upload_url"]).write_bytes(b"0123456789")
+        self.assert_response_ok(await self.post(f"/videos/{ticket['video_id']}/complete"))
+
+        response = await self.get(f"/videos/{ticket['video_id']}/stream")
+        self.assert_response_ok(response)
+        assert response.content == b"0123456789"
+        assert response.headers["Accept-Ranges"] == "bytes"
+        assert "ETag" in response.headers and "Last-Modified" in response.headers
+
+        response = await self.get(f"/videos/{ticket['video_id']}/stream", headers={"Range": "bytes=2-5"})
+        self.assert_response_ok(response, 206)
+        assert response.content == b"2345"
+        assert response.headers["Content-Range"] == "bytes 2-5/10"
+
+        response = await self.get(f"/videos/{ticket['video_id']}/stream", headers={"Range": "bytes=-3"})
+        self.assert_response_ok(response, 206)
+        assert response.content == b"789"
+
+        response = await self.get(f"/videos/{ticket['video_id']}/stream", headers={"Range": "bytes=20-"})
+        self.assert_response_ok(response, 416)
+
+    @pytest.mark.asyncio
+    async def test_deleted_video_file_is_purged_when_unreferenced(
+        self, setup, existing_game: Games, s3_test_repo: AbstractS3Repository
+    ):
+        video_ids = []
+        for title in ("ToDelete", "ToDeleteCopy"):
+            response = await self.post(
+                "/videos",
+                files={"file": ("same.mp4", io.BytesIO(b"bytes to delete"), "video/mp4")},
+                data={"title": title, "game_id": str(existing_game.id)},
+            )
+            self.assert_response_ok(response, 201)
+            video_ids.append(next(v["id"] for v in self.get_json_list(await self.get("/videos")) if v["title"] == title))
+        blob_path = Path((await self.get(f"/videos/{video_ids[0]}")).json()["path"])
+
+        self.assert_response_ok(await self.delete(f"/videos/{video_ids[0]}"), 204)
+        self.assert_response_ok(await self.delete(f"/videos/{video_ids[0]}"), 404)
+        await purge_deleted_files(async_session_maker, s3_test_repo)
+        assert blob_path.exists()
+
+        self.assert_response_ok(await self.delete(f"/videos/{video_ids[1]}"), 204)
+        assert blob_path.exists()
+        assert await purge_deleted_files(async_session_maker, s3_test_repo) == 1
+        assert not blob_path.exists()
+
+        async with async_session_maker() as session:
+            assert (await session.execute(select(StorageTombstones))).scalars().all() == []
+            assert (await session.execute(select(VideoBlobs).where(VideoBlobs.ref_count <= 0))).first() is None
+
+    @pytest.mark.asyncio
+    async def test_deleted_account_files_are_purged(self, client, existing_game: Games, s3_test_repo: AbstractS3Repository):
+        user = {"email": "leaving@mail.ru", "username": "leaving", "password": "secret123"}
+        self.assert_response_ok(await client.post("/auth/registrate", json=user), 201)
+        login = await client.post("/auth/login", json={"email": user["email"], "password": user["password"]})
+        headers = {"Authorization": f"Bearer {login.json()['token']}"}
+
+        stored = []
+        for i in range(3):
+            response = await client.post(
+                "/uploads/videos",
+                headers=headers,
+                files={"file": ("clip.mp4", io.BytesIO(f"account video {i}".encode()), "video/mp4")},
+                data={"title": f"Leaving{i}", "game_id": str(existing_game.id)},
+            )
+            self.assert_response_ok(response, 201)
+            stored.append(s3_test_repo._last_file_path)
+
+        self.assert_response_ok(await client.delete("/users/current", headers=headers), 204)
+        login = await client.post("/auth/login", json={"email": user["email"], "password": user["password"]})
+        self.assert_response_ok(login, 401)
+        assert all(path.exists() for path in stored)
+
+        assert await purge_deleted_files(async_session_maker, s3_test_repo) == 3
+        assert not any(path.exists() for path in stored)
+
+    @pytest.mark.asyncio
+    async def test_local_storage_backend(self, setup, existing_game: Games, tmp_path: Path):
+        local_repo = LocalStorageRepository(tmp_path)
+
+        async def override_s3_repo():
+            yield local_repo
+
+        app.dependency_overrides[get_s3_repo] = override_s3_repo
+
+        response = await self.post(
+            "/videos",
+            files={"file": ("local.mp4", io.BytesIO(b"0123456789"), "video/mp4")},
+            data={"title": "LocalBackend", "game_id": str(existing_game.id)},
+        )
+        self.assert_response_ok(response, 201)
+        video = next(v for v in self.get_json_list(await self.get("/videos")) if v["title"] == "LocalBackend")
+
+        response = await self.get(f"/videos/{video['id']}/stream", headers={"Range": "bytes=4-"})
+        self.assert_response_ok(response, 206)
+        assert response.content == b"456789"
+        assert response.headers["Content-Range"] == "bytes 4-9/10"
+
+        payload = {"title": "LocalPresigned", "game_id": existing_game.id, "filename": "clip.mp4", "size": 4}
+        self.assert_response_ok(await self.post("/videos/presigned", json=payload), 501)
+        assert all(v["title"] != "LocalPresigned" for v in self.get_json_list(await self.get("/videos")))
+
+    @pytest.mark.asyncio
+    async def test_storage_cache_stats_when_disabled(self, setup):
+        response = await self.get("/storage/cache")
+        self.assert_response_ok(response)
+        assert response.json()["enabled"] is False
+
+        response = await self.get("/storage/query-cache")
+        self.assert_response_ok(response)
+        assert response.json()["enabled"] is False
+
     @pytest.mark.asyncio
     async def test_add_game(self, setup):
         response = await self.post(
@@ -37,11 +348,68 @@ class TestUploadsRoutes(BaseTestClass):
             json=GameCreate(title="Persona 5 Royal").model_dump(),
         )
         self.assert_response_ok(response, 201)
+        assert "set-cookie" not in response.headers
 
         response = await self.get("/games")
         self.assert_response_ok(response)
         assert "Persona 5 Royal" in response.text
 
+    @pytest.mark.asyncio
+    async def test_user_reads_own_writes_from_any_client(self, setup, monkeypatch):
+        # Reads of the replica without tables fail, so a successful read was served by the primary
+        replica_engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        monkeypatch.setattr(core, "new_session", async_session_maker)
+        monkeypatch.setattr(core, "new_read_session", async_sessionmaker(replica_engine))
+        monkeypatch.setattr(last_writes, "_written_at", {})
+        app.dependency_overrides.pop(get_read_session)
+
+        async def read_games() -> Response:
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as other_client:
+                return await other_client.get(f"{self.endpoint_prefix}/games", headers=self._headers)
+
+        with pytest.raises(OperationalError):
+            await read_games()
+
+        self.assert_response_ok(await self.post("/games", json={"title": "Written elsewhere"}), 201)
+        response = await read_games()
+        self.assert_response_ok(response)
+        assert "Written elsewhere" in response.text
+        await replica_engine.dispose()
+
+    @pytest.mark.asyncio
+    async def test_video_counts(self, setup, existing_game: Games, s3_test_repo: AbstractS3Repository):
+        async def counts() -> tuple[int, int]:
+            games = (await self.get("/games", params={"limit": 200})).json()
+            game = next(g for g in games["list"] if g["id"] == existing_game.id)
+            return game["videos_count"], games["user_videos_count"]
+
+        # Fixture videos are inserted without counters
+        await reconcile_video_counts(async_session_maker, s3_test_repo)
+        async with async_session_maker() as session:
+            stmt = select(func.count()).select_from(Videos).where(Videos.game_id == existing_game.id)
+            game_videos = await session.scalar(stmt)
+        before = await counts()
+        assert before[0] == game_videos
+
+        response = await self.post(
+            "/videos",
+            files={"file": ("counted.mp4", io.BytesIO(b"counted video"), "video/mp4")},
+            data={"title": "Counted", "game_id": str(existing_game.id)},
+        )
+        self.assert_response_ok(response, 201)
+        assert await counts() == (before[0] + 1, before[1] + 1)
+
+        videos = self.get_json_list(await self.get("/videos", params={"limit": 200}))
+        video_id = next(v["id"] for v in videos if v["title"] == "Counted")
+        self.assert_response_ok(await self.delete(f"/videos/{video_id}"), 204)
+        assert await counts() == before
+
+        async with async_session_maker() as session:
+            await session.execute(update(Games).where(Games.id == existing_game.id).values(videos_count=100))
+            await session.commit()
+        assert await reconcile_video_counts(async_session_maker, s3_test_repo) == 1
+        assert await counts() == before
+
     @pytest.mark.asyncio
     async def test_get_users_videos(self, setup, existing_video: Videos):
         response = await self.get("/videos")
@@ -49,10 +417,58 @@ class TestUploadsRoutes(BaseTestClass):
         assert existing_video.title in self.get_json_list(response)[0].get("title", "")
 
     @pytest.mark.asyncio
-    async def test_get_users_video(self, setup, existing_video: Videos):
+    async def test_get_users_video(self, setup, existing_video: Videos, s3_test_repo: AbstractS3Repository):
         response = await self.get(f"/videos/{existing_video.id}")
         self.assert_response_ok(response)
         assert response.json()["id"] == existing_video.id
+        assert response.json()["path"] == s3_test_repo.object_url(existing_video.key)
+
+    @pytest.mark.asyncio
+    async def test_video_subtitles_cues(self, setup, existing_video: Videos):
+        srt = "1\n00:00:01,000 --> 00:00:04,000\nПривет\n\n2\n00:00:05,000 --> 00:00:07,500\nПока\n"
+
+        response = await self.post(
+            f"/videos/{existing_video.id}/subtitles",
+            files={"file": ("ru.srt", io.BytesIO(srt.encode()), "application/x-subrip")},
+            data={"language": "ru"},
+        )
+        self.assert_response_ok(response, 201)
+        assert response.json()["cues_count"] == 2
+
+        response = await self.get(f"/videos/{existing_video.id}/cues", params={"from": 3.5, "to": 5})
+        self.assert_response_ok(response)
+        assert self.get_json_list(response) == [
+            {"start": 1.0, "end": 4.0, "text": "Привет"},
+            {"start": 5.0, "end": 7.5, "text": "Пока"},
+        ]
+
+        response = await self.get(f"/videos/{existing_video.id}/cues", params={"from": 0, "to": 1, "language": "en"})
+        self.assert_response_ok(response, 404)
+
+        response = await self.post(
+            f"/videos/{existing_video.id}/subtitles",
+            files={"file": ("ru.srt", io.BytesIO(b"not subtitles"), "application/x-subrip")},
+        )
+        self.assert_response_ok(response, 400)
+
+    @pytest.mark.asyncio
+    async def test_vocabulary_search(self, setup, existing_video: Videos):
+        srt = "1\n00:00:01,000 --> 00:00:02,000\nНе открывай дверь\n\n2\n00:00:05,000 --> 00:00:06,000\nОткрывай!\n"
+        response = await self.post(
+            f"/videos/{existing_video.id}/subtitles",
+            files={"file": ("ru.srt", io.BytesIO(srt.encode()), "application/x-subrip")},
+        )
+        self.assert_response_ok(response, 201)
+
+        response = await self.get("/vocabulary", params={"q": "открывай"})
+        self.assert_response_ok(response)
+        assert self.get_json_list(response) == [
+            {"video_id": existing_video.id, "start": 1.0},
+            {"video_id": existing_video.id, "start": 5.0},
+        ]
+
+        response = await self.get("/vocabulary", params={"q": "открывай дверь"})
+        assert self.get_json_list(response) == [{"video_id": existing_video.id, "start": 1.0}]
 
     @pytest.mark.asyncio
     async def test_get_all_games(self, setup, existing_game: Games):
@@ -60,6 +476,43 @@ class TestUploadsRoutes(BaseTestClass):
         self.assert_response_ok(response)
         assert any(existing_game.title in g["title"] for g in self.get_json_list(response))
 
+    @pytest.mark.asyncio
+    async def test_games_pages(self, setup):
+        for title in ["Pagination C", "Pagination A", "Pagination B"]:
+            self.assert_response_ok(await self.post("/games", json={"title": title}), 201)
+
+        titles, cursor = [], None
+        while True:
+            params = {"all": True, "limit": 2} | ({"cursor": cursor} if cursor else {})
+            response = await self.get("/games", params=params)
+            self.assert_response_ok(response)
+            titles += [g["title"] for g in self.get_json_list(response)]
+            if not (cursor := response.json()["next_cursor"]):
+                break
+        assert [t for t in titles if t.startswith("Pagination")] == ["Pagination A", "Pagination B", "Pagination C"]
+        assert titles == sorted(titles)
+
+        self.assert_response_ok(await self.get("/games", params={"cursor": "not-a-cursor"}), 400)
+        self.assert_response_ok(await self.get("/games", params={"all": True, "cursor": encode_cursor([1, 2])}), 400)
+        self.assert_response_ok(await self.get("/videos", params={"limit": 0}), 422)
+
+    @pytest.mark.asyncio
+    async def test_search_games(self, setup):
+        for title in ["The Witcher", "Witcher 3: Wild Hunt", "Ведьмак", "100% Orange Juice"]:
+            self.assert_response_ok(await self.post("/games", json={"title": title}), 201)
+
+        response = await self.get("/games", params={"all": True, "title": "witcher", "limit": 1})
+        self.assert_response_ok(response)
+        assert len(self.get_json_list(response)) == 1
+        assert response.json()["next_cursor"] is None
+
+        response = await self.get("/games", params={"all": True, "title": "WITCHER 3"})
+        assert [g["title"] for g in self.get_json_list(response)] == ["Witcher 3: Wild Hunt"]
+        response = await self.get("/games", params={"all": True, "title": "ВЕДЬМ"})
+        assert [g["title"] for g in self.get_json_list(response)] == ["Ведьмак"]
+        response = await self.get("/games", params={"all": True, "title": "0%"})
+        assert [g["title"] for g in self.get_json_list(response)] == ["100% Orange Juice"]
+
     @pytest.mark.asyncio
     async def test_get_filtered_games_by_title(self, setup, existing_game: Games):
         response = await self.get(f"/games?title={existing_game.title}")
@@ -71,3 +524,20 @@ class TestUploadsRoutes(BaseTestClass):
         response = await self.get(f"/games/{existing_game.id}")
         self.assert_response_ok(response)
         assert response.json()["id"] == existing_game.id
+
+
+@pytest.mark.parametrize(
+    "reads",
+    [[-1], [4, 100], [10, "rewind", 6, 100], [3], []],
+    ids=["whole", "chunks", "reread", "partial", "unread"],
+)
+def test_hashing_reader(reads: list):
+    data = bytes(range(256)) * 10
+    reader = HashingReader(io.BytesIO(data))
+    for read in reads:
+        if read == "rewind":
+            reader.seek(0)
+        else:
+            reader.read(read)
+
+    assert reader.hexdigest() == hashlib.sha256(data).hexdigest()
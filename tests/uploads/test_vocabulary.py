@@ -0,0 +1,32 @@
+from src.uploads.subtitles import Cue, CueIndex
+from src.uploads.vocabulary import build_postings, decode_postings, encode_postings, match_phrase, tokenize
+
+
+class TestVocabulary:
+    def test_tokenize(self):
+        assert tokenize("Ёжик, don’t RUN!") == ["ежик", "don't", "run"]
+
+    def test_postings_round_trip(self):
+        postings = [(0, 0), (1500, 3), (1500, 4), (3_600_000, 1_000_000)]
+        data = encode_postings(postings)
+
+        assert decode_postings(data) == ([0, 1500, 1500, 3_600_000], [0, 3, 4, 1_000_000])
+        assert decode_postings(encode_postings([])) == ([], [])
+
+    def test_small_deltas_take_one_byte(self):
+        data = encode_postings([(i * 100, i * 2) for i in range(100)])
+        assert len(data) == 6 + 100 + 100
+
+    def test_phrase_is_matched_by_consecutive_positions(self):
+        index = CueIndex.from_cues(
+            [
+                Cue(1000, 2000, "Open the door"),
+                Cue(3000, 4000, "the door is open"),
+                Cue(5000, 6000, "door, the end"),
+            ]
+        )
+        postings = {token: decode_postings(data) for token, data in build_postings(index).items()}
+
+        assert match_phrase([postings["the"], postings["door"]]) == [1000, 3000]
+        assert match_phrase([postings["door"]]) == [1000, 3000, 5000]
+        assert match_phrase([postings["door"], postings["open"]]) == []